@@ -68,13 +68,104 @@ import os
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+    }
+}
+# get_best_content 후보 캐시 유지 시간(초) — 변경 시 시그널로 즉시 무효화됨
+CANDIDATE_CACHE_TIMEOUT = 300
+# 후보가 이보다 많은 이름은 fallback 없는 최선 1개 조회만 capability 컬럼으로 SQL 에서 후보를 줄임 (목록 캐시는 그대로)
+CANDIDATE_CACHE_MAX_ROWS = 500
+# 콘텐츠별 의존성 전이 폐쇄 캐시 유지 시간(초) — ContentDependency 변경 시 시그널이 epoch 를 폐기해 즉시 무효화됨
+DEPENDENCY_CACHE_TIMEOUT = 3600
+# 의존성 저장(사이클 검사~INSERT) 전역 잠금 대기/만료 시간(초)
+DEPENDENCY_LOCK_TIMEOUT = 10
+# 디바이스 프로파일별 기본 점수 메모 (프로세스 LRU 항목 수) — 카탈로그 epoch 가 바뀌면 자연히 미사용
+SCORE_MEMO_SIZE = 50_000
+DEVICE_PROFILE_CACHE_SIZE = 10_000
+# 벡터 점수용 컴파일된 카탈로그 (이름, epoch, 후보 id) 별 프로세스 LRU 항목 수
+COMPILED_CATALOG_CACHE_SIZE = 1_000
+
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = REDIS_URL
 CELERY_TASK_TIME_LIMIT = 600
 CELERY_TASK_SOFT_TIME_LIMIT = 600
+# 완료 이벤트 유실 대비 주기 보정 (celery beat)
+CELERY_BEAT_SCHEDULE = {
+    'reconcile-downloads': {
+        'task': 'content.tasks.reconcile_downloads',
+        'schedule': 30.0,
+    },
+    'reap-stale-downloads': {
+        'task': 'content.tasks.reap_stale_downloads',
+        'schedule': 30.0,
+    },
+    'cleanup-stale-uploads': {
+        'task': 'content.tasks.cleanup_stale_uploads',
+        'schedule': 3600.0,
+    },
+}
+
+# 변환 시 원본을 읽어 variant 로 쓰는 chunk 크기 (워커 메모리 사용량 상한)
+CONVERSION_CHUNK_SIZE = 1024 * 1024
 
 # 동시 실행할 다운로드 작업 최대 개수
 DOWNLOAD_CONCURRENCY_LIMIT = 3
+# 디스패치 방식: 'redis' (sorted set + Lua 슬롯 예약) / 'db' (기존 방식, 단일 프로세스 개발용)
+DOWNLOAD_SCHEDULER = os.getenv("DOWNLOAD_SCHEDULER", "redis")
+DOWNLOAD_SCHEDULER_REDIS_URL = REDIS_URL
+# Redis 스케줄러 정책: 'fifo' (priority → requested_at, 개수 제한만) / 'weighted' (아래 값 사용)
+DOWNLOAD_SCHEDULING_POLICY = os.getenv("DOWNLOAD_SCHEDULING_POLICY", "weighted")
+# weighted: 대용량 job(예산/limit 초과)의 동시 진행 bytes 예산 (0 이면 무제한)
+# 4GB / limit 3 → 2GB 급 job 은 최대 2개까지만 동시에, 나머지 슬롯은 작은 job 몫 (bench_scheduling 참고)
+DOWNLOAD_BYTE_BUDGET = 4 * 1024 * 1024 * 1024
+# weighted: 우선순위 1단계 = 이만큼(초) 먼저 요청한 것과 같음 (free tier 기아 방지)
+DOWNLOAD_AGING_SECONDS = 300
+# weighted: 크기 / 이 값(초) 만큼 뒤로 미룸 (같은 tier 안에서 짧은 job 우선)
+DOWNLOAD_SHORT_JOB_BYTES_PER_SECOND = 10 * 1024 * 1024
+# 처리 중 job 의 lease 길이(초) — 진행률 저장마다 연장, 만료되면 reap_stale_downloads 가 회수
+DOWNLOAD_LEASE_SECONDS = 60
+# Redis 스케줄러가 예약(reserve)한 뒤 이 시간(초)이 지나도 claim 되지 않은 job 은 reconcile 이 슬롯 반환 후 재등록
+DOWNLOAD_RESERVE_GRACE_SECONDS = 300
+# 실패한 job 재시도 대기(초) — 재시도마다 2배 (0 이면 즉시 재시도)
+DOWNLOAD_RETRY_DELAY = 10
+
+# download_direct 전송을 Nginx 에 위임 (X-Accel-Redirect → /protected/, Range/If-Range 도 Nginx 가 처리)
+DOWNLOAD_X_ACCEL_REDIRECT = os.getenv("DOWNLOAD_X_ACCEL_REDIRECT", "false").lower() == "true"
+
+# 분할 다운로드용 chunk manifest 의 chunk 크기 (바꾸면 기존 manifest 는 다음 요청 때 다시 생성)
+MANIFEST_CHUNK_SIZE = 4 * 1024 * 1024
+# 같은 blob 의 manifest 를 한 워커만 만들도록 잡는 잠금 유지 시간(초)
+MANIFEST_BUILD_LOCK_SECONDS = 600
+
+# 서명 다운로드 URL: 비밀키 / 유효 시간(초, 검증 시 DB 를 보지 않으므로 발급 후 회수 수단 — 짧게 유지) / Nginx secure_link(/signed/) 로 발급할지
+# 비밀키가 알려진 기본값(change-me, django-insecure- 키)이면 DEBUG 가 아닐 때 발급 거부 (utils.signing)
+DOWNLOAD_LINK_SECRET = os.getenv("DOWNLOAD_LINK_SECRET", SECRET_KEY)
+DOWNLOAD_LINK_TTL = 300
+DOWNLOAD_SIGNED_URL_NGINX = os.getenv("DOWNLOAD_SIGNED_URL_NGINX", "false").lower() == "true"
+
+# 버전 간 delta patch: 덮어쓸 때 보관할 이전 버전 수 / patch 가 새 파일의 이 비율 이상이면 만들지 않음
+DELTA_KEEP_VERSIONS = 3
+DELTA_MAX_RATIO = 0.8
+
+# 변환 후 미리 만들어 둘 압축 사이드카 (zstd/br 은 zstandard/brotli 패키지가 설치된 경우만)
+# 원본보다 PRECOMPRESS_MIN_SAVING 비율 이상 줄어야 보관
+PRECOMPRESS_ENCODINGS = ['gzip', 'zstd', 'br']
+PRECOMPRESS_MIN_SAVING = 0.1
+
+# 다운로드 진행률: chunk 크기 / chunk 당 시뮬레이션 지연(초)
+DOWNLOAD_READ_CHUNK_SIZE = 32 * 1024
+DOWNLOAD_SIMULATED_DELAY = 0.2
+# 진행률은 percent 가 바뀌었거나 INTERVAL 초가 지났을 때만 저장/브로드캐스트 (100% 는 항상)
+DOWNLOAD_PROGRESS_COALESCE = True
+DOWNLOAD_PROGRESS_INTERVAL = 1.0
+# 같은 클라이언트 그룹의 진행률 이벤트를 최대 N개 / N초 단위로 묶어 group_send
+DOWNLOAD_BROADCAST_MAX_BATCH = 20
+DOWNLOAD_BROADCAST_FLUSH_INTERVAL = 0.5
+# 브로드캐스터가 (워커 프로세스마다) 보관하는 콘텐츠별 다운로드 URL 최대 개수
+DOWNLOAD_BROADCAST_URL_CACHE_SIZE = 10_000
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
@@ -89,6 +180,8 @@ MIDDLEWARE = [
 
 # 개발용 설정
 CORS_ALLOW_ALL_ORIGINS = True
+# 목록 페이지네이션/조건부 GET 헤더를 프론트에서 읽을 수 있도록 노출
+CORS_EXPOSE_HEADERS = ['Link', 'ETag', 'Last-Modified']
 
 ROOT_URLCONF = 'backend.urls'
 
@@ -170,6 +263,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# 재개 가능한 업로드의 권장 chunk 크기 (staging 파일은 MEDIA_ROOT/staging 에 기록)
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+# chunk 1개 기록에 허용하는 시간(초) — 이 시간 안에 끝나지 않은 요청의 기록 권한은 다음 요청이 가져감
+UPLOAD_CHUNK_LOCK_SECONDS = 300
+# 이 시간(초) 동안 chunk 가 오지 않은 미완료 업로드는 버려진 것으로 보고 staging 파일과 함께 삭제
+UPLOAD_SESSION_TTL = 24 * 3600
+
+# 업로드/변환 파일은 내용 기준으로 중복 제거 (blobs/ 에 한 번만 저장, uploads/ 는 하드링크)
+STORAGES = {
+    "default": {"BACKEND": "content.storage.DedupFileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
@@ -179,4 +285,19 @@ CHANNEL_LAYERS = {
     },
 }
 
-SITE_DOMAIN = "http://localhost:8000" # 배포시 실제 도메인으로 변경 -> os.environ.get("SITE_DOMAIN", "https://도메인명.com")
\ No newline at end of file
+SITE_DOMAIN = "http://localhost:8000" # 배포시 실제 도메인으로 변경 -> os.environ.get("SITE_DOMAIN", "https://도메인명.com")
+
+# 테스트 실행 시(manage.py test) 외부 Redis 없이 동작하도록 대체
+import sys
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+if TESTING:
+    CELERY_TASK_ALWAYS_EAGER = True
+    DOWNLOAD_SIMULATED_DELAY = 0
+    DOWNLOAD_SCHEDULER = 'db'
+    DOWNLOAD_LINK_SECRET = 'test-download-link-secret'
+    CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    }
+    CHANNEL_LAYERS = {
+        "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+    }
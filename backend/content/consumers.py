@@ -26,3 +26,8 @@ class DownloadConsumer(AsyncJsonWebsocketConsumer):
             "content_id":  event.get("content_id"),
             "download_url": event.get("download_url"),
         })
+
+    # 같은 클라이언트의 여러 진행률 이벤트를 한 번에 받은 경우 — 프론트에는 개별 메시지로 전달
+    async def download_progress_batch(self, event):
+        for item in event["events"]:
+            await self.download_progress(item)
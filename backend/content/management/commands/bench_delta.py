@@ -0,0 +1,147 @@
+import gzip
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from content.utils.delta import apply_patch, make_patch
+
+MB = 1024 * 1024
+
+
+def _asset_pack(rng, scale):
+    """
+    에셋 팩(압축된 텍스처/오디오 묶음): 2개 교체 + 1개 추가 삽입 + 인덱스 헤더 변경
+    """
+    assets = [rng.randbytes(rng.randint(20_000, 400_000) * scale) for _ in range(40)]
+    new = list(assets)
+    new[5] = rng.randbytes(len(assets[5]))
+    new[30] = rng.randbytes(len(assets[30]) // 2)
+    new.insert(12, rng.randbytes(80_000 * scale))
+
+    def pack(items):
+        index = json.dumps([len(a) for a in items]).encode()
+        return len(index).to_bytes(4, 'big') + index + b''.join(items)
+
+    return pack(assets), pack(new)
+
+
+def _native_library(rng, scale):
+    """
+    네이티브 라이브러리/실행 파일: 앞부분 코드 추가로 뒤가 전부 밀리고, 흩어진 상수/주소 수백 곳 변경
+    """
+    words = [rng.randbytes(4) for _ in range(4096)]  # 자주 쓰이는 명령어 조합 (부분 압축 가능)
+    old = bytearray(b''.join(rng.choice(words) for _ in range(1_000_000 * scale)))
+    new = bytearray(old[:100_000] + rng.randbytes(6_000) + old[100_000:])
+    for _ in range(300):
+        pos = rng.randrange(len(new) - 4)
+        new[pos:pos + 4] = rng.randbytes(4)
+    return bytes(old), bytes(new)
+
+
+def _level_data(rng, scale):
+    """
+    JSON 레벨/설정 데이터: 1% 레코드 값 수정 + 일부 추가/삭제
+    """
+    records = [
+        {'id': i, 'name': f"entity_{i}", 'hp': rng.randint(1, 1000), 'pos': [rng.random(), rng.random()]}
+        for i in range(20_000 * scale)
+    ]
+    old = json.dumps(records, indent=1).encode()
+    for record in rng.sample(records, len(records) // 100):
+        record['hp'] = rng.randint(1, 1000)
+    del records[500:520]
+    records[9000:9000] = [{'id': -i, 'name': f"new_{i}", 'hp': 1, 'pos': [0, 0]} for i in range(50)]
+    return old, json.dumps(records, indent=1).encode()
+
+
+def _reencoded_video(rng, scale):
+    """
+    다시 인코딩한 영상: 내용 전체가 바뀜 (patch 이득 없음 → 실제 파이프라인은 만들지 않음)
+    """
+    size = 8 * MB * scale
+    return rng.randbytes(size), rng.randbytes(size)
+
+
+PAIRS = [
+    ('asset pack (2 replaced, 1 added)', _asset_pack),
+    ('native library (shifted + 300 edits)', _native_library),
+    ('level data JSON (1% edited)', _level_data),
+    ('re-encoded video', _reencoded_video),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "버전 간 delta patch 크기 측정: 현실적인 에셋 쌍(또는 --old/--new 실제 파일)에 대해 "
+        "전체 / gzip / patch 전송량과 절감률, patch 생성·적용 시간 비교"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--old', help='이전 버전 파일 (--new 와 함께 지정하면 해당 쌍만 측정)')
+        parser.add_argument('--new', help='새 버전 파일')
+        parser.add_argument('--scale', type=int, default=1, help='합성 에셋 크기 배수')
+        parser.add_argument('--seed', type=int, default=11)
+
+    def handle(self, *args, **options):
+        max_ratio = getattr(settings, 'DELTA_MAX_RATIO', 0.8)
+        self.stdout.write(f"{'pair':<40} {'full':>9} {'gzip':>9} {'patch':>9} {'saved':>7} {'vs gzip':>8} "
+                          f"{'diff s':>7} {'apply s':>7}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            if options['old'] or options['new']:
+                if not (options['old'] and options['new']):
+                    raise CommandError('--old 와 --new 를 함께 지정하세요')
+                pairs = [(os.path.basename(options['new']), options['old'], options['new'])]
+            else:
+                rng = random.Random(options['seed'])
+                pairs = []
+                for label, make in PAIRS:
+                    old, new = make(rng, options['scale'])
+                    paths = []
+                    for suffix, data in (('old', old), ('new', new)):
+                        path = os.path.join(tmp, f"{len(pairs)}.{suffix}")
+                        with open(path, 'wb') as f:
+                            f.write(data)
+                        paths.append(path)
+                    pairs.append((label, *paths))
+
+            totals = {'full': 0, 'shipped': 0}
+            for label, old_path, new_path in pairs:
+                full, gz, patch, diff_s, apply_s = self._measure(old_path, new_path)
+                # 파이프라인과 같은 기준: patch 가 너무 크면 만들지 않고 전체 다운로드
+                shipped = patch if patch < full * max_ratio else full
+                totals['full'] += full
+                totals['shipped'] += shipped
+                self.stdout.write(
+                    f"{label:<40} {full / MB:>8.2f}M {gz / MB:>8.2f}M {patch / MB:>8.2f}M "
+                    f"{(1 - shipped / full) * 100:>6.1f}% {(1 - shipped / gz) * 100:>7.1f}% "
+                    f"{diff_s:>7.2f} {apply_s:>7.2f}"
+                )
+
+        self.stdout.write(
+            f"합계: 전체 {totals['full'] / MB:.1f}MB → 전송 {totals['shipped'] / MB:.1f}MB "
+            f"({(1 - totals['shipped'] / totals['full']) * 100:.1f}% 절감)"
+        )
+
+    def _measure(self, old_path, new_path):
+        full = os.path.getsize(new_path)
+        with open(new_path, 'rb') as f:
+            gz = len(gzip.compress(f.read(), 6))
+
+        patch = io.BytesIO()
+        started = time.perf_counter()
+        make_patch(old_path, new_path, patch)
+        diff_s = time.perf_counter() - started
+
+        patch.seek(0)
+        out = io.BytesIO()
+        started = time.perf_counter()
+        apply_patch(old_path, patch, out)  # sha256 검증 포함
+        apply_s = time.perf_counter() - started
+        return full, gz, len(patch.getvalue()), diff_s, apply_s
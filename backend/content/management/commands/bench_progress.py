@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from content.models import Content, DownloadJob
+from content.tasks import process_download_job
+from content.utils.broadcast import get_broadcaster, reset_broadcaster
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "process_download_job 1건 실행 시 DB 쓰기/채널 메시지 수 비교 (병합 전/후). "
+        "임시 MEDIA_ROOT 와 롤백 트랜잭션 안에서 실행되므로 실제 데이터는 남지 않음"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=64)
+        parser.add_argument('--chunk-kb', type=int, default=32)
+
+    def handle(self, *args, **options):
+        media_root = tempfile.mkdtemp()
+        size = options['size_mb'] * 1024 * 1024
+        try:
+            with override_settings(
+                MEDIA_ROOT=media_root,
+                DOWNLOAD_SIMULATED_DELAY=0,
+                DOWNLOAD_READ_CHUNK_SIZE=options['chunk_kb'] * 1024,
+                CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+                CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+            ):
+                self.stdout.write(f"파일 {options['size_mb']}MB, chunk {options['chunk_kb']}KB")
+                self.stdout.write(
+                    f"{'mode':>10} {'job writes':>11} {'events':>7} {'group_send':>11} {'time(s)':>8}"
+                )
+                # before: chunk 마다 저장 + 이벤트마다 group_send / after: percent 병합 + 그룹 배치 전송
+                for label, coalesce, max_batch in (('before', False, 1), ('after', True, None)):
+                    writes, events, messages, elapsed = self._run(size, coalesce, max_batch)
+                    self.stdout.write(f"{label:>10} {writes:>11} {events:>7} {messages:>11} {elapsed:>8.2f}")
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def _run(self, size, coalesce, max_batch):
+        reset_broadcaster()
+        try:
+            with transaction.atomic(), override_settings(
+                DOWNLOAD_PROGRESS_COALESCE=coalesce,
+                DOWNLOAD_BROADCAST_MAX_BATCH=max_batch or 20,
+            ):
+                with mock.patch('content.signals.convert_content.delay'):
+                    content = Content.objects.create(
+                        name='bench-progress', type='original', meta_info={},
+                        file=ContentFile(os.urandom(1024) * (size // 1024), name='bench.bin'),
+                    )
+                job = DownloadJob.objects.create(content=content, client_id='bench')
+
+                broadcaster = get_broadcaster()
+                layer = broadcaster.channel_layer
+                with CaptureQueriesContext(connection) as ctx, \
+                        mock.patch.object(broadcaster, 'publish', wraps=broadcaster.publish) as published, \
+                        mock.patch.object(layer, 'group_send', wraps=layer.group_send) as sent:
+                    start = time.perf_counter()
+                    process_download_job.apply(args=[job.id])
+                    elapsed = time.perf_counter() - start
+
+                writes = sum(
+                    1 for q in ctx.captured_queries
+                    if q['sql'].startswith('UPDATE') and 'content_downloadjob' in q['sql']
+                )
+                raise _Rollback((writes, published.call_count, sent.call_count, elapsed))
+        except _Rollback as result:
+            return result.args[0]
+        finally:
+            reset_broadcaster()
@@ -0,0 +1,146 @@
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from content.utils.scheduler import POLICY_FIFO, POLICY_WEIGHTED, RedisDownloadScheduler, get_redis
+
+MB = 1024 * 1024
+
+# (비율, 최소 MB, 최대 MB) — 대부분 작은 파일 + 소수의 대용량
+SIZE_MIX = [(0.90, 1, 20), (0.08, 100, 300), (0.02, 1024, 2048)]
+# tier → priority, 비율
+TIER_MIX = [('free', 0, 0.6), ('standard', 1, 0.3), ('premium', 2, 0.1)]
+
+
+@dataclass
+class SimJob:
+    id: int
+    tier: str
+    priority: int
+    size_bytes: int
+    arrival: float
+    requested_at: object = None
+
+
+class Command(BaseCommand):
+    help = (
+        "혼합 크기 다운로드 워크로드를 실제 스케줄러(Redis Lua)로 시뮬레이션해 정책별 완료 시간(mean/p99) 비교. "
+        "대역폭은 실행 중인 job 끼리 균등 분배(job 당 상한 있음)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=2000)
+        parser.add_argument('--load', type=float, default=0.85, help='평균 도착 bytes / 전체 대역폭')
+        parser.add_argument('--bandwidth-mb', type=float, default=100, help='전체 대역폭 (MB/s)')
+        parser.add_argument('--per-job-mb', type=float, default=40, help='job 당 최대 속도 (MB/s)')
+        parser.add_argument('--limit', type=int, default=3)
+        parser.add_argument('--budget-mb', type=int, default=None, help='기본값 DOWNLOAD_BYTE_BUDGET')
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument(
+            '--redis-url', default=None,
+            help='지정하지 않으면 fakeredis(설치된 경우) 또는 DOWNLOAD_SCHEDULER_REDIS_URL 사용',
+        )
+
+    def handle(self, *args, **options):
+        if options['budget_mb'] is None:
+            options['budget_mb'] = getattr(settings, 'DOWNLOAD_BYTE_BUDGET', 0) // MB
+        client = self._client(options['redis_url'])
+        jobs = self._workload(options)
+        total = sum(job.size_bytes for job in jobs)
+        self.stdout.write(
+            f"jobs {len(jobs)}, 총 {total / MB / 1024:.1f}GB, load {options['load']}, "
+            f"대역폭 {options['bandwidth_mb']}MB/s, limit {options['limit']}, budget {options['budget_mb']}MB"
+        )
+        self.stdout.write(
+            f"{'policy':>9} {'mean(s)':>9} {'p50(s)':>8} {'p99(s)':>9} "
+            f"{'small p99':>10} {'free p99':>9} {'premium p99':>12} {'makespan':>9}"
+        )
+        for policy in (POLICY_FIFO, POLICY_WEIGHTED):
+            prefix = f"bench-scheduling:{uuid.uuid4().hex}"
+            scheduler = RedisDownloadScheduler(
+                client=client, limit=options['limit'], prefix=prefix, policy=policy,
+                byte_budget=options['budget_mb'] * MB,
+            )
+            try:
+                done, makespan = self._simulate(scheduler, jobs, options)
+            finally:
+                client.delete(*scheduler.keys)
+
+            waits = np.array([done[job.id] - job.arrival for job in jobs])
+            small = np.array([job.size_bytes <= 20 * MB for job in jobs])
+            tiers = np.array([job.tier for job in jobs])
+            self.stdout.write(
+                f"{policy:>9} {waits.mean():>9.1f} {np.percentile(waits, 50):>8.1f} "
+                f"{np.percentile(waits, 99):>9.1f} {np.percentile(waits[small], 99):>10.1f} "
+                f"{np.percentile(waits[tiers == 'free'], 99):>9.1f} "
+                f"{np.percentile(waits[tiers == 'premium'], 99):>12.1f} {makespan:>9.1f}"
+            )
+
+    def _client(self, url):
+        if url:
+            import redis
+            return redis.Redis.from_url(url)
+        try:
+            import fakeredis
+        except ImportError:
+            return get_redis()
+        return fakeredis.FakeRedis()
+
+    def _workload(self, options):
+        rng = random.Random(options['seed'])
+        jobs = []
+        for job_id in range(1, options['jobs'] + 1):
+            _, low, high = rng.choices(SIZE_MIX, weights=[w for w, _, _ in SIZE_MIX])[0]
+            tier, priority, _ = rng.choices(TIER_MIX, weights=[w for _, _, w in TIER_MIX])[0]
+            jobs.append(SimJob(job_id, tier, priority, int(rng.uniform(low, high) * MB), 0.0))
+
+        # 평균 도착 bytes/s 가 대역폭 * load 가 되도록 포아송 도착
+        mean_size = sum(job.size_bytes for job in jobs) / len(jobs)
+        rate = options['load'] * options['bandwidth_mb'] * MB / mean_size
+        epoch = timezone.now()
+        t = 0.0
+        for job in jobs:
+            t += rng.expovariate(rate)
+            job.arrival = t
+            job.requested_at = epoch + timedelta(seconds=t)
+        return jobs
+
+    def _simulate(self, scheduler, jobs, options):
+        """
+        이벤트 기반 시뮬레이션: 도착 → enqueue/reserve, 완료 → release/reserve
+        """
+        bandwidth = options['bandwidth_mb'] * MB
+        per_job = options['per_job_mb'] * MB
+        by_id = {job.id: job for job in jobs}
+        remaining = {}
+        done = {}
+        now = 0.0
+        next_arrival = 0
+
+        while next_arrival < len(jobs) or remaining:
+            speed = min(per_job, bandwidth / len(remaining)) if remaining else 0
+            until_done = min(remaining.values()) / speed if remaining else float('inf')
+            until_arrival = jobs[next_arrival].arrival - now if next_arrival < len(jobs) else float('inf')
+            step = min(until_done, until_arrival)
+
+            now += step
+            for job_id in remaining:
+                remaining[job_id] -= speed * step
+
+            if until_arrival <= until_done:
+                scheduler.enqueue(jobs[next_arrival])
+                next_arrival += 1
+            for job_id in [job_id for job_id, left in remaining.items() if left <= 1]:
+                del remaining[job_id]
+                done[job_id] = now
+                scheduler.release(job_id)
+
+            for job_id in scheduler.reserve():
+                remaining[job_id] = by_id[job_id].size_bytes
+        return done, now
@@ -0,0 +1,93 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from content.utils.candidates import Candidate
+from content.utils.score import compute_compatibility_score, penalty_from_counts, weighted_score
+from content.utils.vector_score import CompiledCatalog
+
+CHIPSETS = ['snapdragon888', 'snapdragon865', 'exynos2100', 'exynos990', 'dimensity1200', 'a15bionic']
+RESOLUTIONS = ['720p', '1080p', '1440p', '2160p']
+DEVICE = {'chipset': 'snapdragon865', 'memory': 6, 'resolution': '1080p'}
+
+
+def make_candidates(n, rng):
+    return [
+        Candidate(
+            id=i,
+            name='bench',
+            type=rng.choice(['high', 'normal', 'low']),
+            version='1.0.0',
+            meta_info={
+                'required_chipset': rng.choice(CHIPSETS),
+                'min_memory': rng.randint(2, 12),
+                'resolution': rng.choice(RESOLUTIONS),
+            },
+            file_name=f'uploads/bench_{i}.bin',
+        )
+        for i in range(n)
+    ]
+
+
+def scalar_rank(candidates, counts):
+    scored = [
+        (
+            weighted_score(
+                compute_compatibility_score(DEVICE, c.meta_info),
+                penalty_from_counts(*counts.get(c.id, (0, 0))),
+            ),
+            c,
+        )
+        for c in candidates
+    ]
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return scored
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class Command(BaseCommand):
+    help = "스칼라 점수 계산과 NumPy 벡터 점수 계산(CompiledCatalog) 성능 비교"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,1000,100000')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        repeat = options['repeat']
+
+        # scalar: 후보별 점수+정렬 / compile: meta_info → 배열 / rank: 컴파일된 카탈로그로 정렬된 (score, 후보) 리스트까지
+        # cold = compile + rank (카탈로그가 바뀐 뒤 첫 요청), warm = rank 만 (score_cache 에 컴파일 결과가 있을 때)
+        self.stdout.write(
+            f"{'N':>8} {'scalar(ms)':>12} {'compile(ms)':>12} {'rank(ms)':>10} {'cold(ms)':>10} "
+            f"{'cold x':>8} {'warm x':>8}"
+        )
+        for n in (int(x) for x in options['sizes'].split(',')):
+            candidates = make_candidates(n, rng)
+            counts = {c.id: (rng.randint(1, 10), rng.randint(0, 5)) for c in candidates[::3]}
+            counts = {k: (t, min(f, t)) for k, (t, f) in counts.items()}
+
+            catalog = CompiledCatalog(candidates)
+            expected = [(s, c.id) for s, c in scalar_rank(candidates, counts)]
+            actual = [(s, c.id) for s, c in catalog.rank(DEVICE, counts)]
+            if expected != actual:
+                raise AssertionError(f"N={n}: 벡터 결과가 스칼라 결과와 다릅니다")
+
+            scalar = best_of(lambda: scalar_rank(candidates, counts), repeat)
+            compile_ = best_of(lambda: CompiledCatalog(candidates), repeat)
+            ranked = best_of(lambda: catalog.rank(DEVICE, counts), repeat)
+            cold = best_of(lambda: CompiledCatalog(candidates).rank(DEVICE, counts), repeat)
+            self.stdout.write(
+                f"{n:>8} {scalar * 1e3:>12.3f} {compile_ * 1e3:>12.3f} {ranked * 1e3:>10.3f} {cold * 1e3:>10.3f} "
+                f"{scalar / cold:>7.1f}x {scalar / ranked:>7.1f}x"
+            )
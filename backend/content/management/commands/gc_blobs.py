@@ -0,0 +1,15 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "참조(하드링크)가 남아있지 않은 blob 과 오래된 업로드 임시 파일을 정리합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tmp-max-age', type=int, default=3600, help="임시 파일 보존 시간(초)")
+
+    def handle(self, *args, **options):
+        if not hasattr(default_storage, 'collect_garbage'):
+            raise CommandError("기본 storage 가 DedupFileSystemStorage 가 아닙니다.")
+        blobs, tmps = default_storage.collect_garbage(tmp_max_age=options['tmp_max_age'])
+        self.stdout.write(self.style.SUCCESS(f"blob {blobs}개, 임시 파일 {tmps}개 삭제"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from content.utils.stats import rebuild_download_stats
+
+
+class Command(BaseCommand):
+    help = "DownloadHistory 원본으로부터 DownloadStats 롤업 테이블을 재생성합니다."
+
+    def handle(self, *args, **options):
+        count = rebuild_download_stats()
+        self.stdout.write(self.style.SUCCESS(f"DownloadStats {count}건 재생성 완료"))
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def backfill_stats(apps, schema_editor):
+    DownloadHistory = apps.get_model('content', 'DownloadHistory')
+    DownloadStats = apps.get_model('content', 'DownloadStats')
+    rows = (
+        DownloadHistory.objects
+        .values('content_id', 'client_id')
+        .annotate(
+            total=Count('id'),
+            failed=Count('id', filter=Q(success=False)),
+            last_success_at=Max('timestamp', filter=Q(success=True)),
+        )
+        .order_by()
+    )
+    DownloadStats.objects.bulk_create([DownloadStats(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0005_downloadjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DownloadStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.CharField(max_length=255)),
+                ('total', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('last_success_at', models.DateTimeField(blank=True, null=True)),
+                ('content', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='download_stats', to='content.content')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('content', 'client_id'), name='uniq_download_stats')],
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0007_content_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='content',
+            name='file',
+            field=models.FileField(max_length=255, upload_to='uploads/'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:49
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0008_content_file_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('version', models.CharField(default='1.0.0', max_length=20)),
+                ('type', models.CharField(choices=[('original', 'Original'), ('high', 'High'), ('normal', 'Normal'), ('low', 'Low')], default='original', max_length=20)),
+                ('meta_info', models.JSONField()),
+                ('filename', models.CharField(max_length=255)),
+                ('total_size', models.BigIntegerField()),
+                ('offset', models.BigIntegerField(default=0)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('status', models.CharField(choices=[('uploading', 'Uploading'), ('completing', 'Completing'), ('complete', 'Complete')], default='uploading', max_length=20)),
+                ('writer', models.UUIDField(blank=True, null=True)),
+                ('writer_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('content', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='content.content')),
+            ],
+        ),
+    ]
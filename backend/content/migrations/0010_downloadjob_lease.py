@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0009_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='downloadjob',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='downloadjob',
+            name='worker_id',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0010_downloadjob_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='downloadjob',
+            name='size_bytes',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0011_downloadjob_size_bytes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_version', models.CharField(max_length=20)),
+                ('to_version', models.CharField(max_length=20)),
+                ('file', models.FileField(max_length=255, upload_to='deltas/')),
+                ('size', models.BigIntegerField()),
+                ('target_size', models.BigIntegerField()),
+                ('target_sha256', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('content', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deltas', to='content.content')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('content', 'from_version', 'to_version'), name='uniq_content_delta')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ContentVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=20)),
+                ('file', models.FileField(max_length=255, upload_to='versions/')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('content', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='content.content')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('content', 'version'), name='uniq_content_version')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0012_content_versions_deltas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='content',
+            name='encodings',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0013_content_encodings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='content',
+            name='chipset_family',
+            field=models.CharField(blank=True, default='', max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='min_memory',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='resolution_height',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+import re
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+DIGITS_RE = re.compile(r'\d+')
+
+
+def _capabilities(meta):
+    # utils.capabilities.extract_capabilities 와 같은 규칙 (마이그레이션은 앱 코드 변경과 무관하게 고정)
+    meta = meta or {}
+    chipset = meta.get('required_chipset', '')
+    min_memory = meta.get('min_memory', 0)
+    resolution = meta.get('resolution')
+    numbers = DIGITS_RE.findall(resolution) if isinstance(resolution, str) else []
+    return {
+        'chipset_family': chipset.split('8')[0] if isinstance(chipset, str) else None,
+        'min_memory': float(min_memory) if isinstance(min_memory, (int, float)) else 0.0,
+        'resolution_height': int(numbers[-1]) if numbers else None,
+    }
+
+
+def backfill(apps, schema_editor):
+    Content = apps.get_model('content', 'Content')
+    batch = []
+    for content in Content.objects.only('id', 'meta_info').iterator(chunk_size=BATCH_SIZE):
+        for field, value in _capabilities(content.meta_info).items():
+            setattr(content, field, value)
+        batch.append(content)
+        if len(batch) >= BATCH_SIZE:
+            Content.objects.bulk_update(batch, ['chipset_family', 'min_memory', 'resolution_height'])
+            batch = []
+    if batch:
+        Content.objects.bulk_update(batch, ['chipset_family', 'min_memory', 'resolution_height'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0014_content_capabilities'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
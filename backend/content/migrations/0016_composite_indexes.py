@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0015_backfill_content_capabilities'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['name', 'type'], name='content_name_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='downloadhistory',
+            index=models.Index(fields=['content', 'client_id', 'success', 'timestamp'], name='history_content_client_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='downloadhistory',
+            index=models.Index(fields=['client_id', '-timestamp'], name='history_client_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='downloadjob',
+            index=models.Index(fields=['status', '-priority', 'requested_at'], name='downloadjob_queue_idx'),
+        ),
+    ]
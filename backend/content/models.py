@@ -1,9 +1,14 @@
-from django.db import models
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import models, transaction
 
 # Create your models here.
 class Content(models.Model):
     name = models.CharField(max_length=100)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # 카탈로그 ETag/Last-Modified 계산용
     meta_info = models.JSONField()
     
     class ContentType(models.TextChoices):
@@ -20,7 +25,14 @@ class Content(models.Model):
     
     version = models.CharField(max_length=20, default='1.0.0')
     type = models.CharField(max_length=20, choices=ContentType.choices, default=ContentType.ORIGINAL)
-    file = models.FileField(upload_to='uploads/')
+    file = models.FileField(upload_to='uploads/', max_length=255)  # uploads/<sha256>/<파일명>
+    # meta_info 에서 뽑은 타입 컬럼 (utils.capabilities, pre_save 에서 채움) — SQL 사전 필터용
+    # 조회는 항상 name 으로 좁힌 뒤 컬럼으로 점수 범위를 계산하므로 content_name_type_idx 만 사용 (컬럼별 인덱스 없음)
+    chipset_family = models.CharField(max_length=100, null=True, blank=True, default='')
+    min_memory = models.FloatField(default=0)
+    resolution_height = models.IntegerField(null=True, blank=True)
+    # 미리 압축해 둔 사이드카 {encoding: 크기} (utils.precompress) — 파일이 바뀌면 비우고 다시 생성
+    encodings = models.JSONField(default=dict, blank=True)
     parent = models.ForeignKey(
         'self',
         null=True,
@@ -41,9 +53,50 @@ class Content(models.Model):
         default=ConversionStatus.PENDING
     )
 
+    class Meta:
+        indexes = [
+            # 이름별 후보 조회 (get_best_content, 변환 variant 조회)
+            models.Index(fields=['name', 'type'], name='content_name_type_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} [{self.type}] v{self.version}"
     
+class ContentVersion(models.Model):
+    """
+    덮어쓰기 전 버전 파일 보관 (delta patch 의 기준) — DELTA_KEEP_VERSIONS 개까지만 유지
+    file 은 이전 dedup 링크를 그대로 넘겨받아 blob 을 복사하지 않음
+    """
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='versions')
+    version = models.CharField(max_length=20)
+    file = models.FileField(upload_to='versions/', max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content', 'version'], name='uniq_content_version'),
+        ]
+
+
+class ContentDelta(models.Model):
+    """
+    from_version → to_version 바이너리 patch (utils.delta)
+    """
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='deltas')
+    from_version = models.CharField(max_length=20)
+    to_version = models.CharField(max_length=20)
+    file = models.FileField(upload_to='deltas/', max_length=255)
+    size = models.BigIntegerField()
+    target_size = models.BigIntegerField()
+    target_sha256 = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content', 'from_version', 'to_version'], name='uniq_content_delta'),
+        ]
+
+
 class DownloadJob(models.Model):
     STATUS_PENDING    = 'pending'
     STATUS_INPROGRESS = 'in_progress'
@@ -69,9 +122,20 @@ class DownloadJob(models.Model):
     priority     = models.IntegerField(default=0)
     attempts     = models.IntegerField(default=0)
     percent      = models.IntegerField(default=0)
+    # 요청 시점의 파일 크기 — weighted 스케줄링(bytes 예산/짧은 job 우선)에 사용
+    size_bytes   = models.BigIntegerField(default=0)
+    # 처리 중인 워커와 lease 만료 시각 — heartbeat 가 갱신, 만료되면 reaper 가 pending 으로 회수
+    worker_id        = models.CharField(max_length=255, blank=True, default='')
+    lease_expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # 실패 후 재시도 대기 — 이 시각 전에는 디스패치하지 않음 (재시도마다 DOWNLOAD_RETRY_DELAY 의 2배씩)
+    not_before = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['-priority', 'requested_at']
+        indexes = [
+            # 스케줄러: 상태별 대기열을 우선순위/요청 순으로
+            models.Index(fields=['status', '-priority', 'requested_at'], name='downloadjob_queue_idx'),
+        ]
 
 
 
@@ -81,6 +145,96 @@ class DownloadHistory(models.Model):
     success = models.BooleanField(default=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # rebuild_download_stats 의 (content, client_id) GROUP BY — 집계 컬럼까지 담아 테이블을 읽지 않음
+            models.Index(fields=['content', 'client_id', 'success', 'timestamp'], name='history_content_client_idx'),
+            # 클라이언트별 최근 이력 (get_download_history)
+            models.Index(fields=['client_id', '-timestamp'], name='history_client_time_idx'),
+        ]
+
+class DownloadStats(models.Model):
+    """
+    (content, client_id) 별 다운로드 집계 — DownloadHistory 를 매번 세지 않기 위한 롤업
+    process_download_job 에서 기록 시 함께 갱신, rebuild_download_stats 로 재생성
+    """
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='download_stats')
+    client_id = models.CharField(max_length=255)
+    total = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    last_success_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content', 'client_id'], name='uniq_download_stats'),
+        ]
+
+class ContentDependencyQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        save()/시그널을 거치지 않으므로 여기서 같은 잠금 안에서 사이클 검사 (앞선 항목까지 포함한 그래프 기준)
+        커밋 후 전이 폐쇄 캐시 무효화
+        """
+        from .utils.dependencies import check_dependency, dependency_lock, invalidate_closure, load_graph
+
+        objs = list(objs)
+        with dependency_lock(), transaction.atomic():
+            graph = load_graph()
+            for obj in objs:
+                check_dependency(obj.content_id, obj.required_id, graph)
+                graph.setdefault(obj.content_id, []).append(obj.required_id)
+            created = super().bulk_create(objs, *args, **kwargs)
+            transaction.on_commit(invalidate_closure)
+        return created
+
+
 class ContentDependency(models.Model):
     content = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='dependencies')
     required = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='required_by')
+
+    objects = ContentDependencyQuerySet.as_manager()
+
+    def clean(self):
+        # 사이클이 생기는 의존성은 저장 전에 거부 (pre_save 시그널에서도 같은 검사)
+        from .utils.dependencies import check_dependency
+        check_dependency(self.content_id, self.required_id)
+
+    def save(self, *args, **kwargs):
+        # pre_save 의 사이클 검사와 INSERT 를 잠금 안에서 한 트랜잭션으로 — 동시 저장이 서로의 의존성을 못 보고 통과하지 않도록
+        from .utils.dependencies import dependency_lock
+
+        with dependency_lock(), transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class UploadSession(models.Model):
+    """
+    재개 가능한 청크 업로드 세션: 생성 → offset 위치에 PUT 반복 → complete 시 Content 생성/갱신
+    받은 바이트는 staging 파일에 바로 기록, offset 은 지금까지 연속으로 받은 바이트 수
+    """
+    class Status(models.TextChoices):
+        UPLOADING  = 'uploading'
+        COMPLETING = 'completing'  # complete 요청 1건이 점유해 Content 생성 중
+        COMPLETE   = 'complete'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=100)
+    version = models.CharField(max_length=20, default='1.0.0')
+    type = models.CharField(max_length=20, choices=Content.ContentType.choices, default=Content.ContentType.ORIGINAL)
+    meta_info = models.JSONField()
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)  # 클라이언트가 알려준 전체 해시 (선택)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.UPLOADING)
+    # chunk 기록 중인 요청의 토큰과 만료 시각 — offset 위치 기록은 한 번에 한 요청만 (만료되면 다른 요청이 가져감)
+    writer = models.UUIDField(null=True, blank=True)
+    writer_expires_at = models.DateTimeField(null=True, blank=True)
+    content = models.ForeignKey(Content, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def staging_path(self):
+        # blob 으로 옮길 때 같은 볼륨이 되도록 MEDIA_ROOT 아래에 둠
+        return Path(settings.MEDIA_ROOT) / 'staging' / f"{self.id}.part"
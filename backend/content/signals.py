@@ -1,10 +1,59 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import Content
-from .tasks import convert_content
+from .models import Content, ContentDelta, ContentDependency, ContentVersion
+from .tasks import build_content_manifest, convert_content
+from .utils.candidates import invalidate_candidates
+from .utils.capabilities import apply_capabilities
+from .utils.dependencies import check_dependency, invalidate_closure
+
+@receiver(pre_save, sender=Content)
+def extract_capabilities(sender, instance, raw=False, **kwargs):
+    # meta_info → 타입 컬럼 (업로드/변환/수정 모두) — update_fields 로 저장할 때는 CAPABILITY_FIELDS 도 함께 넘길 것
+    if not raw:
+        apply_capabilities(instance)
 
 @receiver(post_save, sender=Content)
 def trigger_conversion(sender, instance, created, **kwargs):
     # 원본 업로드 시 자동 변환 트리거
     if created and instance.type == 'original':
-        convert_content.delay(instance.id)
\ No newline at end of file
+        convert_content.delay(instance.id)
+
+@receiver(post_save, sender=Content)
+def refresh_manifest(sender, instance, update_fields=None, **kwargs):
+    # 파일이 (바뀌었을 수 있는) 저장 후 chunk manifest 재생성 — 커밋 이후에 워커가 읽도록
+    if instance.file and (update_fields is None or 'file' in update_fields):
+        transaction.on_commit(lambda: build_content_manifest.delay(instance.id))
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def invalidate_candidate_cache(sender, instance, **kwargs):
+    # 카탈로그 변경 시 이름별 후보 캐시 무효화
+    invalidate_candidates(instance.name)
+
+@receiver(post_delete, sender=Content)
+def delete_content_file(sender, instance, **kwargs):
+    # 링크 삭제 → 마지막 참조였다면 storage 가 blob 까지 정리
+    if instance.file:
+        instance.file.delete(save=False)
+
+
+@receiver(post_delete, sender=ContentVersion)
+@receiver(post_delete, sender=ContentDelta)
+def delete_version_file(sender, instance, **kwargs):
+    # 보관 버전/patch 가 정리(prune, content 삭제 cascade)되면 파일도 삭제
+    if instance.file:
+        instance.file.delete(save=False)
+
+
+@receiver(pre_save, sender=ContentDependency)
+def reject_dependency_cycle(sender, instance, raw=False, **kwargs):
+    # admin/ORM 어디서 저장하든 사이클이 생기면 DependencyCycleError (fixture 로드는 제외)
+    if not raw:
+        check_dependency(instance.content_id, instance.required_id)
+
+@receiver(post_save, sender=ContentDependency)
+@receiver(post_delete, sender=ContentDependency)
+def invalidate_dependency_closure(sender, instance, **kwargs):
+    # 의존성이 바뀌면 캐시된 전이 폐쇄를 버림 — 커밋 후에 버려야 그 사이 조회가 이전 그래프로 다시 캐시하지 않음
+    transaction.on_commit(invalidate_closure)
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+import time
+
+from django.core.files.storage import FileSystemStorage
+
+from .utils.manifest import MANIFEST_SUFFIX, manifest_name
+from .utils.paths import BLOB_DIR, DIGEST_RE, blob_name, link_digest
+from .utils.precompress import SUFFIXES, sibling_names
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DedupFileSystemStorage(FileSystemStorage):
+    """
+    content-addressed 저장소
+    - 업로드를 스트리밍하면서 sha256 을 계산, 실제 바이트는 blobs/<aa>/<sha256> 에 한 번만 저장
+    - FileField 이름은 uploads/<sha256>/<파일명> 형태의 하드링크 → 기존 경로/X-Accel-Redirect 그대로 동작
+    - blob 의 참조 수 = 하드링크 수 - 1, 마지막 링크가 삭제되면 blob 도 삭제(GC)
+    - 압축/manifest 사이드카는 blob 옆(blobs/<aa>/<sha256>.gz 등) — 같은 blob 의 링크끼리 공유, blob 과 함께 삭제
+    """
+    blob_dir = BLOB_DIR
+
+    def blob_name(self, digest):
+        return blob_name(digest)
+
+    def _tmp_dir(self):
+        path = self.path(posixpath.join(self.blob_dir, 'tmp'))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _save(self, name, content):
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir())
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            return self._link(tmp_path, digest.hexdigest(), name)
+        finally:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+
+    def save_file(self, name, path, digest=None):
+        """
+        같은 볼륨의 로컬 파일(업로드 staging 등)을 복사 없이 하드링크로 저장 — digest 를 알면 다시 읽지도 않음
+        path 는 호출한 쪽이 정리 (blob 이 같은 inode 를 가리키므로 이후 path 에 쓰면 안 됨)
+        """
+        name = self.get_available_name(self.generate_filename(name))
+        return self._link(path, digest or file_sha256(path), name)
+
+    def _link(self, src_path, digest, name):
+        """
+        src_path 를 blobs/<sha256> 로(이미 있으면 기존 blob 재사용), name 위치에 uploads/<sha256>/<파일명> 링크 생성
+        """
+        blob_path = self.path(self.blob_name(digest))
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        name = posixpath.join(posixpath.dirname(name), digest, posixpath.basename(name))
+
+        while True:
+            # blob 이 없을 때만 임시 파일이 blob 이 됨 (있으면 기존 blob 재사용)
+            try:
+                os.link(src_path, blob_path)
+            except FileExistsError:
+                pass
+
+            full_path = self.path(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            try:
+                os.link(blob_path, full_path)
+            except FileNotFoundError:
+                continue  # 그 사이 blob 이 GC 됨 → 임시 파일로 다시 생성
+            except FileExistsError:
+                name = self.get_available_name(name)
+                continue
+            break
+
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return name
+
+    def digest(self, name):
+        """
+        uploads/<sha256>/<파일명> 에서 sha256 추출 (dedup 이전에 저장된 파일이면 None)
+        """
+        return link_digest(name)
+
+    def delete(self, name):
+        digest = self.digest(name) if name else None
+        super().delete(name)
+        if name and not digest:
+            # dedup 이전 파일은 파일 옆 사이드카(chunk manifest, 압축본) 정리 — blob 기준 사이드카는 blob 이 지워질 때
+            for sidecar in [manifest_name(name), *sibling_names(name)]:
+                super().delete(sidecar)
+        if digest:
+            self._collect(digest)
+
+    def _blob_sidecars(self, digest):
+        return [f"{self.blob_name(digest)}{suffix}" for suffix in [*SUFFIXES.values(), MANIFEST_SUFFIX]]
+
+    def _collect(self, digest):
+        blob_path = self.path(self.blob_name(digest))
+        try:
+            if os.stat(blob_path).st_nlink > 1:
+                return
+            os.remove(blob_path)
+        except FileNotFoundError:
+            pass
+        for sidecar in self._blob_sidecars(digest):
+            super().delete(sidecar)
+
+    def collect_garbage(self, tmp_max_age=3600):
+        """
+        참조가 없는 blob 과 오래된 임시 파일 정리 (비정상 종료 등으로 남은 것)
+        blob 이 없는 사이드카(삭제와 동시에 압축/해시한 경우)도 함께 정리
+        반환: (삭제한 blob 수, 삭제한 임시 파일 수)
+        """
+        blobs = tmps = 0
+        root = self.path(self.blob_dir)
+        tmp_dir = self._tmp_dir()
+        now = time.time()
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                    if dirpath == tmp_dir:
+                        if now - st.st_mtime > tmp_max_age:
+                            os.remove(path)
+                            tmps += 1
+                    elif DIGEST_RE.match(filename) and st.st_nlink <= 1:
+                        os.remove(path)
+                        self._collect(filename)
+                        blobs += 1
+                    elif filename.endswith((*SUFFIXES.values(), MANIFEST_SUFFIX)) and DIGEST_RE.match(filename.split('.')[0]):
+                        if not os.path.exists(os.path.join(dirpath, filename.split('.')[0])):
+                            os.remove(path)
+                except FileNotFoundError:
+                    continue
+        return blobs, tmps
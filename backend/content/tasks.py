@@ -1,98 +1,326 @@
+from datetime import timedelta
+from django.db.models import F, Q
 from django.utils import timezone
+import logging
+import socket
 import time
-from celery import shared_task
-from .models import Content, DownloadJob
+from celery import chord, group, shared_task
+from .models import Content, DownloadJob, UploadSession
 import os
-from django.core.files.base import ContentFile
+from django.core.cache import cache
+from django.core.files.base import File
 from django.conf import settings
+from .utils.candidates import invalidate_candidates
+from .utils.capabilities import CAPABILITY_FIELDS
+from .utils.metrics import incr
+from .utils.paths import sidecar_base
+from .utils.scheduler import enqueue_download, get_scheduler, release_download, retry_ready, use_redis_scheduler
+from .utils.versions import archive_version, build_deltas
+
+logger = logging.getLogger(__name__)
+CONVERSION_TARGETS = ['high', 'normal', 'low']
+
+
+class _ChunkedFile(File):
+    # storage 가 chunks() 로 읽어 가는 크기 — 파일 크기와 무관하게 메모리 사용량 고정
+    DEFAULT_CHUNK_SIZE = getattr(settings, 'CONVERSION_CHUNK_SIZE', 1024 * 1024)
+
 
 @shared_task(bind=True, retry_backoff=True, max_retries=3)
 def convert_content(self, content_id):
+    """
+    원본 → high/normal/low 변환을 variant 별 서브태스크(group)로 병렬 실행,
+    모두 끝나면 finish_conversion(chord 콜백)이 원본 상태를 확정
+    """
     orig = Content.objects.get(pk=content_id)
     orig.conversion_status = Content.ConversionStatus.IN_PROGRESS
     orig.save()
 
     try:
-        # 원본 파일 읽기
-        with open(orig.file.path, 'rb') as f:
-            data = f.read()
+        children = []
+        for t in CONVERSION_TARGETS:
+            # type 별 variant 는 하나만 두고 버전이 바뀌면 재사용 (재시도 시 중복 생성 방지,
+            # 이전 버전 파일은 convert_variant 가 보관해 delta patch 기준으로 사용)
+            child = orig.variants.filter(type=t).order_by('-id').first()
+            if child is None:
+                child = Content.objects.create(
+                    parent=orig,
+                    type=t,
+                    version=orig.version,
+                    name=orig.name,
+                    meta_info=orig.meta_info,
+                    conversion_status=Content.ConversionStatus.PENDING,
+                )
+            children.append(child)
 
-        base, ext = os.path.splitext(os.path.basename(orig.file.name))
-        targets = ['high', 'normal', 'low']
-
-        for t in targets:
-            child = Content.objects.create(
-                name=orig.name,
-                version=orig.version,
-                type=t,
-                meta_info=orig.meta_info,
-                parent=orig, # ← 부모 연결
-                conversion_status=Content.ConversionStatus.PENDING
-            )
-            child.file.save(f"{base}_{t}{ext}", ContentFile(data))
-
-        orig.conversion_status = Content.ConversionStatus.SUCCESS
-        orig.save()
+        chord(
+            group(convert_variant.s(orig.id, child.id) for child in children),
+            finish_conversion.s(orig.id),
+        ).delay()
     except Exception as e:
         orig.conversion_status = Content.ConversionStatus.FAILED
         orig.save()
         raise self.retry(exc=e)
-    
-@shared_task(bind=True, max_retries=3, default_retry_delay=5)
+
+
+@shared_task(bind=True, retry_backoff=True, max_retries=3)
+def convert_variant(self, orig_id, child_id):
+    """
+    원본을 고정 크기 chunk 로 스트리밍하며 variant 파일 생성. 결과: {'id', 'type', 'status'}
+    """
+    orig = Content.objects.get(pk=orig_id)
+    child = Content.objects.get(pk=child_id)
+    child.conversion_status = Content.ConversionStatus.IN_PROGRESS
+    child.save(update_fields=['conversion_status'])
+
+    try:
+        old_file, old_version = child.file.name, child.version
+        base, ext = os.path.splitext(os.path.basename(orig.file.name))
+        with orig.file.open('rb') as src:
+            child.file.save(f"{base}_{child.type}{ext}", _ChunkedFile(src), save=False)
+        child.version = orig.version
+        child.meta_info = orig.meta_info
+        child.encodings = {}  # 새 파일의 압축 사이드카는 finish_conversion 이후 생성
+        child.conversion_status = Content.ConversionStatus.SUCCESS
+        child.save(update_fields=[
+            'file', 'version', 'meta_info', *CAPABILITY_FIELDS, 'encodings', 'conversion_status', 'updated_at',
+        ])
+        if old_file and old_file != child.file.name:
+            archive_version(child, old_version, old_file)
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e)
+        # 재시도 소진: 실패로 기록하고 chord 는 계속 진행
+        child.conversion_status = Content.ConversionStatus.FAILED
+        child.save(update_fields=['conversion_status', 'updated_at'])
+
+    return {'id': child.id, 'type': child.type, 'status': child.conversion_status}
+
+
+@shared_task
+def finish_conversion(results, orig_id):
+    orig = Content.objects.get(pk=orig_id)
+    ok = all(r['status'] == Content.ConversionStatus.SUCCESS for r in results)
+    orig.conversion_status = Content.ConversionStatus.SUCCESS if ok else Content.ConversionStatus.FAILED
+    orig.save()
+    invalidate_candidates(orig.name)
+    # 압축 사이드카 + 보관된 이전 버전 → 새 버전 patch 생성 (원본 + 성공한 variant)
+    # 압축은 blob 단위 — 원본과 바이트가 같은 variant 는 같은 blob 이라 한 번만 (precompress_content 가 함께 기록)
+    content_ids = [orig.id, *(r['id'] for r in results if r['status'] == Content.ConversionStatus.SUCCESS)]
+    files = dict(Content.objects.filter(pk__in=content_ids).values_list('id', 'file'))
+    compressed = set()
+    for content_id in content_ids:
+        blob = sidecar_base(files.get(content_id) or '')
+        if blob and blob not in compressed:
+            compressed.add(blob)
+            precompress_content.delay(content_id)
+        build_content_deltas.delay(content_id)
+    return results
+
+
+@shared_task
+def build_content_manifest(content_id):
+    """
+    업로드/변환으로 파일이 바뀐 뒤 chunk manifest 미리 생성 (이미 최신이면 건너뜀)
+    manifest 는 blob 기준 — 같은 blob 을 다른 워커가 해시 중이면 건너뜀 (변환 직후 원본/variant 가 동시에 요청)
+    """
+    from .utils.manifest import get_manifest, manifest_name
+
+    content = Content.objects.filter(pk=content_id).only('id', 'file').first()
+    if not content or not content.file:
+        return None
+    lock = f"content:manifest:build:{manifest_name(content.file.name)}"
+    if not cache.add(lock, content_id, getattr(settings, 'MANIFEST_BUILD_LOCK_SECONDS', 600)):
+        return None
+    try:
+        manifest = get_manifest(content.file.name, content.file.storage)
+    except FileNotFoundError:
+        return None
+    finally:
+        cache.delete(lock)
+    return len(manifest['chunks'])
+
+@shared_task
+def precompress_content(content_id):
+    """
+    압축 가능한 파일이면 gzip(+zstd/br) 사이드카를 만들고 크기를 encodings 에 기록
+    사이드카는 blob 기준이라 같은 blob 을 가리키는 다른 콘텐츠에도 함께 기록
+    """
+    from .utils.precompress import precompress
+
+    content = Content.objects.filter(pk=content_id).only('id', 'file').first()
+    if not content or not content.file:
+        return {}
+    file_name = content.file.name
+    try:
+        encodings = precompress(file_name, content.file.storage)
+    except FileNotFoundError:
+        return {}
+    # 압축하는 사이 파일이 바뀌었으면 기록하지 않음 (새 파일은 다음 변환에서 다시 생성)
+    digest = content.file.storage.digest(file_name)
+    same_file = Q(file__contains=f"/{digest}/") if digest else Q(pk=content_id, file=file_name)
+    Content.objects.filter(same_file).update(encodings=encodings)
+    return encodings
+
+
+@shared_task
+def build_content_deltas(content_id):
+    """
+    보관된 이전 버전들 → 현재 버전 바이너리 patch 생성. 반환: 새로 만든 patch 수
+    """
+    content = Content.objects.filter(pk=content_id).first()
+    if not content or not content.file:
+        return 0
+    try:
+        return len(build_deltas(content))
+    except FileNotFoundError:
+        return 0
+
+class LeaseLost(Exception):
+    """
+    lease 가 만료돼 reaper 가 job 을 회수함 — 이 워커는 더 이상 해당 job 을 갱신하면 안 됨
+    """
+
+
+def _lease_deadline():
+    return timezone.now() + timedelta(seconds=getattr(settings, 'DOWNLOAD_LEASE_SECONDS', 60))
+
+
+def _retry_delay(attempts):
+    # 재시도 대기(초): DOWNLOAD_RETRY_DELAY, 이후 재시도마다 2배
+    return getattr(settings, 'DOWNLOAD_RETRY_DELAY', 10) * 2 ** max(attempts - 1, 0)
+
+
+@shared_task(bind=True, max_retries=3)
 def process_download_job(self, job_id):
-    from .utils.broadcast import broadcast_download
-    from .models import DownloadHistory
+    """
+    다운로드 1건 처리. 끝나면(성공/실패/재시도 소진) 슬롯을 반환하고 곧바로 schedule_downloads 로 빈 슬롯을 채움
+    실패 시 attempts 를 올려 pending 으로 되돌리고 스케줄러가 다시 꺼내도록 함 (max_retries 초과 시 failed)
+    처리 중에는 worker_id 로 소유권을 잡고 진행률 저장 때마다 lease 를 연장(heartbeat)
+    """
+    from .utils.broadcast import get_broadcaster
+    from .utils.progress import ProgressThrottle
+    from .utils.stats import record_download
 
-    job = DownloadJob.objects.select_related("content").get(pk=job_id)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{self.request.id}"
 
-    if job.status != DownloadJob.STATUS_PENDING:
+    # pending → in_progress 전환은 조건부 UPDATE 로 (같은 job 이 두 번 디스패치돼도 한 워커만 처리)
+    claimed = DownloadJob.objects.filter(pk=job_id, status=DownloadJob.STATUS_PENDING).update(
+        status=DownloadJob.STATUS_INPROGRESS, started_at=timezone.now(),
+        worker_id=worker_id, lease_expires_at=_lease_deadline(),
+    )
+    if not claimed:
+        # 이미 처리됐거나 다른 워커가 가져간 job — 예약해 둔 슬롯만 돌려주고 다시 채움
+        if use_redis_scheduler():
+            release_download(job_id)
+            schedule_downloads.delay()
         return
 
-    job.status = DownloadJob.STATUS_INPROGRESS
-    job.started_at = timezone.now()
-    job.save()
+    job = DownloadJob.objects.select_related("content").get(pk=job_id)
+    owned = DownloadJob.objects.filter(
+        pk=job.id, worker_id=worker_id, status=DownloadJob.STATUS_INPROGRESS
+    )
 
     request_id = f"{job.content.name}-{job.id}"
     client_id = job.client_id
     content = job.content
-    total_size = content.file.size
+
+    broadcaster = get_broadcaster()
+
+    def report(progress, status=None, flush=False):
+        # 진행률 저장 = heartbeat. 소유권을 잃었으면(reaper 회수) 즉시 중단
+        job.percent = progress
+        if not owned.update(percent=progress, lease_expires_at=_lease_deadline()):
+            raise LeaseLost(job.id)
+        broadcaster.publish(request_id, content, client_id, progress, status=status, flush=flush)
+
+    chunk_size = getattr(settings, 'DOWNLOAD_READ_CHUNK_SIZE', 1024 * 32)
+    delay = getattr(settings, 'DOWNLOAD_SIMULATED_DELAY', 0.2)
+    throttle = ProgressThrottle()
 
     try:
+        # 파일이 사라졌으면(storage 정리 등) 여기서 실패 → 아래에서 실패 기록 + 슬롯 반환
+        total_size = content.file.size
         with content.file.open('rb') as f:
             sent = 0
             while True:
-                chunk = f.read(1024 * 32)  # 32KB씩 읽음
+                chunk = f.read(chunk_size)
                 if not chunk:
                     break
                 sent += len(chunk)
                 progress = int((sent / total_size) * 100)
-                job.percent = progress
-                job.save(update_fields=['percent'])
-                broadcast_download(request_id, content.name, client_id, progress, content.id)
-                time.sleep(0.2)  # 시뮬레이션용 지연
+                # percent 가 바뀌었거나 일정 시간이 지났을 때만 저장/전송
+                if throttle.should_emit(progress):
+                    report(progress)
+                if delay:
+                    time.sleep(delay)  # 시뮬레이션용 지연
+
+        if throttle.finish():
+            report(100)
 
         job.status = DownloadJob.STATUS_SUCCESS
         job.finished_at = timezone.now()
-        job.save()
+        if not owned.update(status=job.status, finished_at=job.finished_at, lease_expires_at=None):
+            raise LeaseLost(job.id)
 
-        DownloadHistory.objects.create(
-            content=content,
-            client_id=client_id,
-            success=True
-        )
+        record_download(content, client_id, success=True)
 
-    except Exception as e:
-        job.status = DownloadJob.STATUS_FAILED
-        job.save()
+    except LeaseLost:
+        # job 은 이미 다른 워커 몫 — 상태/통계/슬롯 모두 건드리지 않음
+        logger.warning("download job %s lease lost by %s", job.id, worker_id)
+        incr('lease_lost')
+        return
 
-        DownloadHistory.objects.create(
-            content=content,
-            client_id=client_id,
-            success=False
-        )
+    except Exception:
+        logger.exception("download job %s failed (attempt %s)", job.id, job.attempts + 1)
+        job.attempts += 1
+        job.percent = 0
+        retry_delay = 0
+        if job.attempts <= self.max_retries:
+            # 바로 다시 꺼내지 않도록 대기 후 재시도 (지속적인 오류로 시도 횟수를 한 번에 소진하지 않게)
+            job.status = DownloadJob.STATUS_PENDING
+            job.started_at = None
+            retry_delay = _retry_delay(job.attempts)
+            job.not_before = timezone.now() + timedelta(seconds=retry_delay) if retry_delay else None
+        else:
+            job.status = DownloadJob.STATUS_FAILED
+            job.finished_at = timezone.now()
+        if not owned.update(
+            status=job.status, attempts=job.attempts, percent=0, started_at=job.started_at,
+            finished_at=job.finished_at, worker_id='', lease_expires_at=None, not_before=job.not_before,
+        ):
+            logger.warning("download job %s lease lost by %s", job.id, worker_id)
+            incr('lease_lost')
+            return
 
-        broadcast_download(request_id, content.name, client_id, 0, content.id)
-        raise self.retry(exc=e)
+        record_download(content, client_id, success=False)
+
+        broadcaster.publish(request_id, content, client_id, 0, flush=True)
+
+    finally:
+        # 어떤 경로로 끝나든(lease 상실 포함) 버퍼에 남은 진행률 이벤트 전송
+        broadcaster.flush()
+
+    # 성공/실패와 무관하게 슬롯 반환 → 재시도 대상은 대기열에 다시 넣고 → 빈 슬롯 즉시 채우기
+    release_download(job.id)
+    if job.status == DownloadJob.STATUS_PENDING:
+        if job.not_before:
+            requeue_download.apply_async((job.id,), countdown=retry_delay)
+        else:
+            enqueue_download(job)
+    schedule_downloads.delay()
+
+
+@shared_task
+def requeue_download(job_id):
+    """
+    재시도 대기가 끝난 job 을 대기열에 다시 넣고 빈 슬롯 채우기 (유실돼도 reconcile 의 sync_pending 이 보정)
+    """
+    job = DownloadJob.objects.filter(pk=job_id, status=DownloadJob.STATUS_PENDING).first()
+    if job is None:
+        return
+    enqueue_download(job)
+    schedule_downloads.delay()
 
 @shared_task
 def schedule_downloads():
@@ -100,6 +328,15 @@ def schedule_downloads():
     진행중인(in_progress) 작업 수를 세고,
     빈 슬롯만큼 pending 작업을 우선순위 순으로 꺼내어 처리 태스크 예약하기.
     """
+    if use_redis_scheduler():
+        # Redis 스케줄러: 슬롯 예약(Lua)이 원자적이라 동시에 호출돼도 초과/중복 디스패치 없음
+        scheduler = get_scheduler()
+        if not scheduler.queued_count():
+            scheduler.sync_pending()
+        for job_id in scheduler.reserve():
+            process_download_job.delay(job_id)
+        return
+
     limit  = getattr(settings, "DOWNLOAD_CONCURRENCY_LIMIT", 3)
     active = DownloadJob.objects.filter(status=DownloadJob.STATUS_INPROGRESS).count()
     slots  = max(limit - active, 0)
@@ -108,8 +345,76 @@ def schedule_downloads():
 
     pending = (
         DownloadJob.objects
-        .filter(status=DownloadJob.STATUS_PENDING)
+        .filter(retry_ready(), status=DownloadJob.STATUS_PENDING)
         .order_by("-priority", "requested_at")[:slots]
     )
     for job in pending:
-        process_download_job.delay(job.id)
\ No newline at end of file
+        process_download_job.delay(job.id)
+
+
+@shared_task
+def reconcile_downloads():
+    """
+    주기 실행(celery beat) 보정 — 완료 이벤트가 유실돼도(워커 강제 종료 등) 슬롯이 놀지 않도록
+    끝난 job 이 점유한 슬롯 회수 + pending 재등록 후 schedule_downloads
+    """
+    if use_redis_scheduler():
+        get_scheduler().reconcile()
+    schedule_downloads.delay()
+
+
+@shared_task
+def reap_stale_downloads():
+    """
+    lease 가 만료된 in_progress job(워커 사망 등)을 pending 으로 되돌리고 attempts 증가
+    재시도 한도를 넘긴 job 은 failed. 회수한 슬롯 수는 metrics 'reclaimed_slots' 에 누적
+    """
+    now_ = timezone.now()
+    lease = timedelta(seconds=getattr(settings, 'DOWNLOAD_LEASE_SECONDS', 60))
+    # lease 필드 도입 전부터 in_progress 였던 행은 started_at 기준
+    expired = Q(lease_expires_at__lt=now_) | Q(lease_expires_at__isnull=True, started_at__lt=now_ - lease)
+    stale = (
+        DownloadJob.objects
+        .filter(expired, status=DownloadJob.STATUS_INPROGRESS)
+        .values_list('id', 'attempts')
+    )
+    max_retries = process_download_job.max_retries
+
+    reclaimed = []
+    for job_id, attempts in stale:
+        status = DownloadJob.STATUS_PENDING if attempts + 1 <= max_retries else DownloadJob.STATUS_FAILED
+        # 조회 이후 heartbeat 가 들어왔으면 만료 조건에서 빠져 갱신되지 않음
+        updated = DownloadJob.objects.filter(expired, pk=job_id, status=DownloadJob.STATUS_INPROGRESS).update(
+            status=status, attempts=F('attempts') + 1, percent=0, worker_id='', lease_expires_at=None,
+            started_at=None if status == DownloadJob.STATUS_PENDING else F('started_at'),
+            finished_at=now_ if status == DownloadJob.STATUS_FAILED else None,
+        )
+        if updated:
+            reclaimed.append(job_id)
+            release_download(job_id)
+
+    if reclaimed:
+        logger.warning("reclaimed %d download slots from expired leases: %s", len(reclaimed), reclaimed)
+        incr('reclaimed_slots', len(reclaimed))
+        for job in DownloadJob.objects.filter(pk__in=reclaimed, status=DownloadJob.STATUS_PENDING):
+            enqueue_download(job)
+        schedule_downloads.delay()
+    return len(reclaimed)
+
+
+@shared_task
+def cleanup_stale_uploads():
+    """
+    UPLOAD_SESSION_TTL 동안 갱신되지 않은(버려진) 미완료 업로드 세션과 staging 파일 삭제. 삭제한 세션 수 반환
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'UPLOAD_SESSION_TTL', 24 * 3600))
+    stale = UploadSession.objects.filter(updated_at__lt=cutoff).exclude(status=UploadSession.Status.COMPLETE)
+    removed = 0
+    for session in stale.iterator():
+        # 행을 먼저 지움 — 그 사이 chunk 가 들어와 갱신된 세션은 남기고, 지운 뒤 온 chunk 는 점유 실패(409)
+        if UploadSession.objects.filter(id=session.id, updated_at__lt=cutoff).delete()[0]:
+            session.staging_path.unlink(missing_ok=True)
+            removed += 1
+    if removed:
+        logger.info("removed %d abandoned upload sessions", removed)
+    return removed
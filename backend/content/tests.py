@@ -1,3 +1,1945 @@
-from django.test import TestCase
+import base64
+import gzip
+import hashlib
+import importlib
+import io
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+import tracemalloc
+import unittest
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import redis
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from rest_framework.test import APIClient
+
+from .models import Content, ContentDelta, ContentDependency, ContentVersion, DownloadHistory, DownloadJob, DownloadStats, UploadSession
+from . import views
+from .tasks import cleanup_stale_uploads, process_download_job, reap_stale_downloads, reconcile_downloads, requeue_download, schedule_downloads
+from .utils.paths import rel_media_path
+from .utils.progress import ProgressThrottle
+from .utils.broadcast import DownloadBroadcaster, get_broadcaster
+from .utils.candidates import Candidate, _cache_key, _large_key, get_candidates, get_scoring_candidates
+from .utils.capabilities import extract_capabilities, prefilter_candidates
+from .utils.delta import apply_patch, make_patch
+from .utils.dependencies import LOCK_KEY as DEPENDENCY_LOCK_KEY, DependencyCycleError, missing_dependencies, resolve_dependencies
+from .utils.fallback import get_fallback_content
+from .utils.load_balancer import select_best_content
+from .utils.manifest import load_manifest, manifest_name
+from .utils import manifest as manifest_module
+from .utils import precompress as precompress_module
+from .utils.precompress import available_encodings, encoded_name, negotiate
+from .utils.scheduler import RedisDownloadScheduler
+from .utils.signing import nginx_secure_link, signed_download_url
+from .utils.score import get_dependent_contents, get_final_score, get_final_scores
+from .utils.stats import rebuild_download_stats, record_download
+from .utils.metrics import get_counters
+from .utils.score import compute_compatibility_score, get_download_counts, penalty_from_counts, rank_contents, weighted_score
+from .utils.score_cache import SCORING_COUNTERS, clear_memo, device_profile, rank_many
+from .utils.vector_score import CompiledCatalog
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401 — fakeredis 가 스케줄러 Lua 스크립트(EVAL)를 실행할 때 필요
+except ImportError:  # 테스트 전용 의존성 (requirements-dev.txt)
+    fakeredis = None
+
+
+def fake_redis(test):
+    # 운영 기본값이 redis 스케줄러라 Lua 경로 테스트는 건너뛰지 않고 실패시킴
+    if fakeredis is None:
+        test.fail('fakeredis/lupa 미설치: pip install -r requirements-dev.txt')
+    return fakeredis.FakeRedis()
+
+MB = 1024 * 1024
+
+DEVICE = {'chipset': 'snapdragon888', 'memory': 8, 'resolution': '1080p'}
+
+
+def make_content(name='game', type='high', version='1.0.0', **meta):
+    meta_info = {'required_chipset': 'snapdragon888', 'min_memory': 4, 'resolution': '1080p'}
+    meta_info.update(meta)
+    return Content.objects.create(
+        name=name, type=type, version=version, meta_info=meta_info,
+        file=f'uploads/{name}_{type}.bin',
+    )
+
+
+class BatchedScoringTests(TestCase):
+    def _count_queries(self, contents):
+        with CaptureQueriesContext(connection) as ctx:
+            get_final_scores(contents, DEVICE, 'client-1')
+        return len(ctx.captured_queries)
+
+    def test_query_count_independent_of_variant_count(self):
+        few = [make_content(name='few', type=t) for t in ('high', 'normal')]
+        many = [make_content(name='many', type='low', version=f'1.0.{i}') for i in range(20)]
+        for c in many[:5]:
+            record_download(c, 'client-1', success=False)
+
+        self.assertEqual(self._count_queries(few), 1)
+        self.assertEqual(self._count_queries(many), 1)
+
+    def test_matches_per_content_scoring(self):
+        contents = [
+            make_content(type='high'),
+            make_content(type='normal', min_memory=8),
+            make_content(type='low', resolution='720p', required_chipset='exynos2100'),
+        ]
+        record_download(contents[0], 'client-1', success=False)
+        record_download(contents[0], 'client-1', success=True)
+        record_download(contents[1], 'client-2', success=False)
+
+        batched = {c.id: s for s, c in get_final_scores(contents, DEVICE, 'client-1')}
+        for c in contents:
+            self.assertEqual(batched[c.id], get_final_score(c, DEVICE, 'client-1'))
+
+    def test_get_best_content_query_count_is_constant(self):
+        for t in ('high', 'normal'):
+            make_content(name='small', type=t)
+        for i in range(12):
+            make_content(name='large', type='low', version=f'1.0.{i}')
+
+        client = APIClient()
+        counts = []
+        for name in ('small', 'large'):
+            with CaptureQueriesContext(connection) as ctx:
+                resp = client.post('/api/get-content/', {
+                    'device_info': DEVICE, 'requested_content': name, 'client_id': 'client-1',
+                }, format='json')
+            self.assertEqual(resp.status_code, 200)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class DownloadStatsTests(TestCase):
+    def test_record_download_updates_rollup(self):
+        content = make_content()
+        record_download(content, 'client-1', success=True)
+        record_download(content, 'client-1', success=False)
+        record_download(content, 'client-1', success=False)
+
+        stats = DownloadStats.objects.get(content=content, client_id='client-1')
+        self.assertEqual((stats.total, stats.failed), (3, 2))
+        self.assertIsNotNone(stats.last_success_at)
+        self.assertEqual(DownloadHistory.objects.filter(content=content).count(), 3)
+
+    def test_rebuild_matches_incremental_rollup(self):
+        a, b = make_content(type='high'), make_content(type='low')
+        record_download(a, 'client-1', success=True)
+        record_download(a, 'client-2', success=False)
+        record_download(b, 'client-1', success=False)
+        before = set(DownloadStats.objects.values_list('content_id', 'client_id', 'total', 'failed'))
+
+        DownloadStats.objects.all().delete()
+        self.assertEqual(rebuild_download_stats(), 3)
+        after = set(DownloadStats.objects.values_list('content_id', 'client_id', 'total', 'failed'))
+        self.assertEqual(before, after)
+
+
+class ContentCatalogTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        patcher = mock.patch('content.signals.convert_content.delay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for i in range(5):
+            orig = make_content(name=f'asset{i}', type='original')
+            for t in ('high', 'low'):
+                child = make_content(name=f'asset{i}', type=t)
+                child.parent = orig
+                child.save()
+
+    def _get(self, url, **headers):
+        return self.client.get(url, **headers)
+
+    def test_keyset_pages_cover_catalog_with_fixed_query_count(self):
+        seen, url, query_counts = [], '/api/contents/?limit=2', []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self._get(url)
+            self.assertEqual(resp.status_code, 200)
+            query_counts.append(len(ctx.captured_queries))
+            seen.extend(item['id'] for item in resp.json())
+            self.assertTrue(all(len(item['variants']) == 2 for item in resp.json()))
+            link = resp.headers.get('Link')
+            url = link[1:link.index('>')] if link else None
+
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+        self.assertEqual(len(set(query_counts)), 1)
+
+    def test_conditional_get_returns_304_until_catalog_changes(self):
+        first = self._get('/api/contents/')
+        etag = first.headers['ETag']
+        self.assertIn('Last-Modified', first.headers)
+
+        self.assertEqual(self._get('/api/contents/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        orig = Content.objects.filter(type='original').first()
+        orig.conversion_status = Content.ConversionStatus.SUCCESS
+        orig.save()
+        self.assertEqual(self._get('/api/contents/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_invalid_cursor_is_rejected(self):
+        self.assertEqual(self._get('/api/contents/?cursor=%%%').status_code, 400)
+
+
+class CandidateCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.orig = make_content(name='cached', type='original')
+        self.high = make_content(name='cached', type='high')
+
+    def test_cached_candidates_skip_database(self):
+        self.assertEqual([c.id for c in get_candidates('cached')], [self.high.id])
+        with self.assertNumQueries(0):
+            candidates = get_candidates('cached')
+        self.assertEqual(candidates[0].meta_info['min_memory'], 4)
+        self.assertEqual(candidates[0].file_name, self.high.file.name)
+
+    def test_save_and_delete_invalidate(self):
+        get_candidates('cached')
+        low = make_content(name='cached', type='low')
+        self.assertEqual({c.id for c in get_candidates('cached')}, {self.high.id, low.id})
+
+        low.version = '2.0.0'
+        low.save()
+        self.assertIn('2.0.0', [c.version for c in get_candidates('cached')])
+
+        low.delete()
+        self.high.delete()
+        self.assertEqual([c.id for c in get_candidates('cached')], [self.orig.id])
+
+    def test_fallback_uses_cached_candidate_url(self):
+        low = make_content(name='cached', type='low', min_memory=16)
+        resp = APIClient().post('/api/get-content/', {
+            'device_info': DEVICE, 'requested_content': 'cached',
+            'client_id': 'client-1', 'failed_content_id': self.high.id,
+        }, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['id'], low.id)
+        self.assertTrue(resp.json()['download_url'].endswith(low.file.url))
+
+
+class VectorScoringTests(TestCase):
+    METAS = [
+        {'required_chipset': 'snapdragon888', 'min_memory': 4, 'resolution': '1080p'},
+        {'required_chipset': 'snapdragon865', 'min_memory': 6, 'resolution': '720p'},
+        {'required_chipset': 'exynos2100', 'min_memory': 8, 'resolution': '1440p'},
+        {'required_chipset': '888', 'min_memory': 7, 'resolution': 'hd720'},
+        {'required_chipset': 'dimensity1200', 'min_memory': 2},
+        {},
+    ]
+    DEVICES = [
+        DEVICE,
+        {'chipset': 'snapdragon865', 'memory': 6, 'resolution': '720p'},
+        {'chipset': 'exynos2100', 'memory': 4, 'resolution': '1080p'},
+        {'memory': 2},
+    ]
+
+    def test_matches_scalar_scores_exactly(self):
+        candidates = [
+            Candidate(i, 'v', 'high', '1.0.0', meta, f'uploads/{i}.bin')
+            for i, meta in enumerate(self.METAS * 3)
+        ]
+        counts = {0: (4, 1), 3: (2, 2), 7: (10, 3)}
+        catalog = CompiledCatalog(candidates)
+
+        for device in self.DEVICES:
+            expected = [
+                weighted_score(
+                    compute_compatibility_score(device, c.meta_info),
+                    penalty_from_counts(*counts.get(c.id, (0, 0))),
+                )
+                for c in candidates
+            ]
+            self.assertEqual(catalog.scores(device, counts).tolist(), expected)
+
+            ranked = sorted(zip(expected, candidates), key=lambda x: x[0], reverse=True)
+            self.assertEqual(
+                [(s, c.id) for s, c in catalog.rank(device, counts)],
+                [(s, c.id) for s, c in ranked],
+            )
+
+    def test_catalog_is_compiled_once_per_epoch(self):
+        cache.clear()
+        clear_memo()
+        contents = [make_content(name='big', type='low', version=f'1.0.{i}', min_memory=i % 10) for i in range(70)]
+        with mock.patch('content.utils.vector_score.CompiledCatalog', wraps=CompiledCatalog) as compiled:
+            for device in self.DEVICES:
+                ranked = rank_contents(contents, device, {})
+                rank_many({'big': get_candidates('big')}, device, {})
+            # 캐시된 카탈로그를 써도 결과에는 호출한 쪽의 객체가 담김
+            self.assertIsInstance(ranked[0][1], Content)
+            # Content 목록과 Candidate 목록은 id 가 같아 한 번만 컴파일
+            self.assertEqual(compiled.call_count, 1)
+
+            contents.append(make_content(name='big', type='low', version='2.0.0'))  # epoch 변경
+            rank_contents(contents, DEVICE, {})
+            self.assertEqual(compiled.call_count, 2)
+
+
+class BatchContentResolutionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.names = [f'asset{i}' for i in range(6)]
+        self.ids = {}
+        for name in self.names:
+            self.ids[name] = [
+                make_content(name=name, type='high').id,
+                make_content(name=name, type='low', min_memory=2).id,
+            ]
+        record_download(Content.objects.get(id=self.ids['asset0'][1]), 'client-1', success=True)
+
+    def _batch(self, names, **extra):
+        return self.client.post('/api/get-contents/', {
+            'device_info': DEVICE, 'requested_contents': names, 'client_id': 'client-1', **extra,
+        }, format='json')
+
+    def test_items_match_single_endpoint(self):
+        failed = {'asset1': self.ids['asset1'][0]}
+        resp = self._batch(self.names + ['missing'], failed_content_ids=failed)
+        self.assertEqual(resp.status_code, 200)
+
+        for item in resp.json()['results']:
+            body = {
+                'device_info': DEVICE, 'requested_content': item['requested_content'],
+                'client_id': 'client-1',
+            }
+            if item['requested_content'] in failed:
+                body['failed_content_id'] = failed[item['requested_content']]
+            single = self.client.post('/api/get-content/', body, format='json')
+            self.assertEqual(item['status'], single.status_code)
+            self.assertEqual(item['data'], single.json())
+
+    def test_query_count_is_fixed(self):
+        counts = []
+        for names in (self.names[:2], self.names):
+            cache.clear()
+            failed = {name: self.ids[name][0] for name in names}
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self._batch(names, failed_content_ids=failed).status_code, 200)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_rejects_invalid_request(self):
+        self.assertEqual(self._batch('asset0').status_code, 400)
+        self.assertEqual(self._batch([]).status_code, 400)
+
+
+class MediaTestCase(TestCase):
+    """
+    MEDIA_ROOT 를 임시 디렉터리로 바꿔 실제 파일을 다루는 테스트용
+    """
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def upload_original(self, name='asset', data=b'original-bytes', filename='asset.bin', **meta):
+        meta_info = {'required_chipset': 'snapdragon888', 'min_memory': 4, 'resolution': '1080p'}
+        meta_info.update(meta)
+        return Content.objects.create(
+            name=name, type='original', meta_info=meta_info,
+            file=SimpleUploadedFile(filename, data),
+        )
+
+
+class ConversionPipelineTests(MediaTestCase):
+    def test_variants_are_streamed_copies_with_per_variant_status(self):
+        orig = self.upload_original(data=b'x' * 300_000)
+        orig.refresh_from_db()
+        self.assertEqual(orig.conversion_status, Content.ConversionStatus.SUCCESS)
+
+        variants = list(orig.variants.order_by('type'))
+        self.assertEqual(sorted(v.type for v in variants), ['high', 'low', 'normal'])
+        for v in variants:
+            self.assertEqual(v.conversion_status, Content.ConversionStatus.SUCCESS)
+            with v.file.open('rb') as f:
+                self.assertEqual(f.read(), b'x' * 300_000)
+
+    def test_failed_variant_marks_original_failed(self):
+        with mock.patch('content.tasks.convert_variant.max_retries', 0), \
+                mock.patch('content.tasks._ChunkedFile', side_effect=OSError('disk full')):
+            orig = self.upload_original()
+        orig.refresh_from_db()
+        self.assertEqual(orig.conversion_status, Content.ConversionStatus.FAILED)
+        self.assertTrue(all(
+            v.conversion_status == Content.ConversionStatus.FAILED for v in orig.variants.all()
+        ))
+        # 파일이 없는 variant 는 후보에서 제외되고 원본이 선택됨
+        self.assertEqual([c.id for c in get_candidates('asset')], [orig.id])
+
+    def test_peak_memory_does_not_grow_with_file_size(self):
+        with mock.patch('content.signals.convert_content.delay'):
+            orig = self.upload_original(data=os.urandom(16 * 1024 * 1024))
+        from .tasks import convert_content
+
+        tracemalloc.start()
+        try:
+            convert_content.apply(args=[orig.id])
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, 4 * 1024 * 1024)
+
+
+class DedupStorageTests(MediaTestCase):
+    def _blob_path(self, content):
+        storage = content.file.storage
+        return storage.path(storage.blob_name(storage.digest(content.file.name)))
+
+    def test_identical_uploads_share_one_blob(self):
+        with mock.patch('content.signals.convert_content.delay'):
+            a = self.upload_original(name='a', data=b'same-bytes')
+            b = self.upload_original(name='b', data=b'same-bytes')
+
+        self.assertNotEqual(a.file.name, b.file.name)
+        self.assertEqual(self._blob_path(a), self._blob_path(b))
+        self.assertEqual(os.stat(a.file.path).st_ino, os.stat(b.file.path).st_ino)
+        self.assertEqual(os.stat(self._blob_path(a)).st_nlink, 3)
+        self.assertEqual(rel_media_path(a.file.path), a.file.name)
+
+        blob = self._blob_path(a)
+        a.delete()
+        self.assertTrue(os.path.exists(blob))
+        b.delete()
+        self.assertFalse(os.path.exists(blob))
+
+    def test_conversion_variants_reference_original_blob(self):
+        orig = self.upload_original(data=b'y' * 100_000)
+        variants = list(orig.variants.all())
+        self.assertEqual(len(variants), 3)
+        self.assertTrue(all(self._blob_path(v) == self._blob_path(orig) for v in variants))
+        self.assertEqual(os.stat(self._blob_path(orig)).st_nlink, 5)
+
+    def test_overwriting_original_releases_previous_blob(self):
+        # 같은 버전으로 덮어쓰면 이전 파일은 보관하지 않음 (버전이 바뀌면 DeltaUpdateTests 참고)
+        orig = self.upload_original(data=b'v1')
+        old_blob = self._blob_path(orig)
+        for v in orig.variants.all():
+            v.delete()
+
+        resp = APIClient().post('/api/upload-content/', {
+            'name': 'asset', 'version': '1.0.0', 'file': SimpleUploadedFile('asset.bin', b'v2'),
+        }, format='multipart')
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(os.path.exists(old_blob))
+        orig.refresh_from_db()
+        with orig.file.open('rb') as f:
+            self.assertEqual(f.read(), b'v2')
+
+    def test_gc_removes_unreferenced_blobs(self):
+        storage = default_storage
+        name = storage.save('uploads/orphan.bin', ContentFile(b'orphan'))
+        blob = storage.path(storage.blob_name(storage.digest(name)))
+        os.remove(storage.path(name))  # 링크만 사라진 상태 (비정상 종료 등)
+
+        self.assertEqual(storage.collect_garbage(), (1, 0))
+        self.assertFalse(os.path.exists(blob))
+
+
+class ResumableUploadTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        patcher = mock.patch('content.signals.convert_content.delay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _create(self, data, **extra):
+        resp = self.client.post('/api/uploads/', {
+            'name': 'big', 'filename': 'big.bin', 'size': len(data), 'version': '1.0.0',
+            'chipset': 'snapdragon888', 'min_memory': 4, 'resolution': '1080p', **extra,
+        }, format='json')
+        self.assertEqual(resp.status_code, 201)
+        return resp.json()['upload_id']
+
+    def _put(self, upload_id, data, start, total, **headers):
+        end = start + len(data) - 1
+        return self.client.generic(
+            'PUT', f'/api/uploads/{upload_id}/', data, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{total}', **headers,
+        )
+
+    def _upload(self, data, chunk=1000, **extra):
+        upload_id = self._create(data, **extra)
+        for start in range(0, len(data), chunk):
+            self.assertEqual(self._put(upload_id, data[start:start + chunk], start, len(data)).status_code, 200)
+        return upload_id, self.client.post(f'/api/uploads/{upload_id}/complete/')
+
+    def test_resume_after_rejected_chunks(self):
+        data = os.urandom(2500)
+        upload_id = self._create(data, sha256=hashlib.sha256(data).hexdigest())
+
+        self.assertEqual(self._put(upload_id, data[:1000], 0, 2500).status_code, 200)
+        # 순서가 어긋난 chunk → 현재 offset 과 함께 409
+        skipped = self._put(upload_id, data[2000:], 2000, 2500)
+        self.assertEqual((skipped.status_code, skipped.json()['offset']), (409, 1000))
+        # 손상된 chunk → 버려지고 offset 유지
+        corrupt = self._put(upload_id, data[1000:2000], 1000, 2500, HTTP_X_CHUNK_SHA256='0' * 64)
+        self.assertEqual(corrupt.status_code, 400)
+        self.assertEqual(self.client.get(f'/api/uploads/{upload_id}/').json()['offset'], 1000)
+        # 완료 전 complete 는 거부
+        self.assertEqual(self.client.post(f'/api/uploads/{upload_id}/complete/').status_code, 409)
+
+        self.assertEqual(self._put(upload_id, data[1000:2000], 1000, 2500).status_code, 200)
+        self.assertEqual(self._put(upload_id, data[2000:], 2000, 2500).status_code, 200)
+        resp = self.client.post(f'/api/uploads/{upload_id}/complete/')
+        self.assertEqual(resp.status_code, 200)
+
+        content = Content.objects.get(id=resp.json()['id'])
+        self.assertEqual((content.name, content.type, content.meta_info['min_memory']), ('big', 'original', 4))
+        with content.file.open('rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertFalse(UploadSession.objects.get(id=upload_id).staging_path.exists())
+
+    def test_chunk_in_flight_blocks_same_offset(self):
+        data = os.urandom(2000)
+        upload_id = self._create(data)
+        self.assertEqual(self._put(upload_id, data[:1000], 0, 2000).status_code, 200)
+
+        # 다른 요청이 offset 1000 을 기록 중 → 같은 위치 chunk 는 쓰지 않고 409
+        in_flight = UploadSession.objects.filter(id=upload_id)
+        in_flight.update(writer=uuid.uuid4(), writer_expires_at=timezone.now() + timedelta(seconds=60))
+        blocked = self._put(upload_id, b'x' * 1000, 1000, 2000)
+        self.assertEqual((blocked.status_code, blocked.json()['offset']), (409, 1000))
+        self.assertEqual(UploadSession.objects.get(id=upload_id).staging_path.stat().st_size, 1000)
+
+        # 점유가 만료되면(기록하던 요청이 죽음) 다음 요청이 가져감
+        in_flight.update(writer_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self._put(upload_id, data[1000:], 1000, 2000).status_code, 200)
+        session = UploadSession.objects.get(id=upload_id)
+        self.assertEqual((session.offset, session.writer), (2000, None))
+
+    def test_complete_overwrites_existing_original(self):
+        _, first = self._upload(b'a' * 1500)
+        _, second = self._upload(b'b' * 1500, version='2.0.0')
+        self.assertEqual(first.json()['id'], second.json()['id'])
+        self.assertIn('업데이트', second.json()['message'])
+
+        content = Content.objects.get(id=second.json()['id'])
+        self.assertEqual(content.version, '2.0.0')
+        with content.file.open('rb') as f:
+            self.assertEqual(f.read(), b'b' * 1500)
+
+    def test_complete_links_staging_without_copy_or_rehash(self):
+        data = os.urandom(5000)
+        upload_id = self._create(data)
+        for start in range(0, len(data), 1000):
+            self._put(upload_id, data[start:start + 1000], start, len(data))
+        staging_inode = UploadSession.objects.get(id=upload_id).staging_path.stat().st_ino
+
+        with mock.patch('content.views.file_sha256') as rehash:
+            resp = self.client.post(f'/api/uploads/{upload_id}/complete/')
+        self.assertEqual(resp.status_code, 200)
+        rehash.assert_not_called()  # chunk 를 받으며 계산한 전체 해시 사용
+
+        content = Content.objects.get(id=resp.json()['id'])
+        self.assertIn(hashlib.sha256(data).hexdigest(), content.file.name)
+        self.assertEqual(os.stat(content.file.path).st_ino, staging_inode)
+
+    def test_complete_rehashes_once_without_running_digest(self):
+        data = os.urandom(3000)
+        upload_id = self._create(data, sha256=hashlib.sha256(data).hexdigest())
+        for start in range(0, len(data), 1000):
+            self._put(upload_id, data[start:start + 1000], start, len(data))
+        views._upload_digests.clear()  # 다른 프로세스가 chunk 를 받은 경우
+        resp = self.client.post(f'/api/uploads/{upload_id}/complete/')
+        self.assertEqual(resp.status_code, 200)
+        with Content.objects.get(id=resp.json()['id']).file.open('rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_concurrent_complete_is_claimed_once(self):
+        data = b'd' * 1000
+        upload_id = self._create(data)
+        self._put(upload_id, data, 0, len(data))
+        # 다른 complete 요청이 이미 점유
+        UploadSession.objects.filter(id=upload_id).update(status=UploadSession.Status.COMPLETING)
+        self.assertEqual(self.client.post(f'/api/uploads/{upload_id}/complete/').status_code, 409)
+        self.assertFalse(Content.objects.filter(name='big').exists())
+
+    def test_abandoned_sessions_are_cleaned_up(self):
+        stale_id = self._create(b'e' * 2000)
+        self._put(stale_id, b'e' * 1000, 0, 2000)
+        live_id = self._create(b'f' * 2000)
+        stale = UploadSession.objects.get(id=stale_id)
+        UploadSession.objects.filter(id=stale_id).update(updated_at=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(cleanup_stale_uploads(), 1)
+        self.assertFalse(stale.staging_path.exists())
+        self.assertFalse(UploadSession.objects.filter(id=stale_id).exists())
+        self.assertTrue(UploadSession.objects.get(id=live_id).staging_path.exists())
+        # 지워진 세션에 뒤늦게 온 chunk 는 기록하지 않음
+        self.assertEqual(self._put(stale_id, b'e' * 1000, 1000, 2000).status_code, 404)
+
+    def test_sha256_mismatch_is_rejected(self):
+        _, resp = self._upload(b'c' * 10, sha256='f' * 64)
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(Content.objects.filter(name='big').exists())
+
+
+class ProgressCoalescingTests(MediaTestCase):
+    def test_throttle_emits_on_change_interval_and_final(self):
+        now = [0.0]
+        throttle = ProgressThrottle(interval=5, coalesce=True, clock=lambda: now[0])
+        self.assertTrue(throttle.should_emit(0))
+        self.assertFalse(throttle.should_emit(0))
+        self.assertTrue(throttle.should_emit(1))
+        now[0] = 6
+        self.assertTrue(throttle.should_emit(1))
+        self.assertTrue(throttle.finish())
+        self.assertFalse(throttle.finish())
+
+    @override_settings(DOWNLOAD_READ_CHUNK_SIZE=1024, DOWNLOAD_PROGRESS_INTERVAL=3600)
+    def test_download_job_persists_once_per_percent(self):
+        with mock.patch('content.signals.convert_content.delay'):
+            content = self.upload_original(data=b'z' * 1024 * 500)
+        job = DownloadJob.objects.create(content=content, client_id='client-1')
+
+        broadcaster = get_broadcaster()
+        with mock.patch.object(broadcaster, 'publish') as sent, \
+                CaptureQueriesContext(connection) as ctx:
+            process_download_job.apply(args=[job.id])
+
+        percents = [c.args[3] for c in sent.call_args_list]
+        self.assertEqual(percents, sorted(set(percents)))
+        self.assertEqual(percents[-1], 100)
+        self.assertLessEqual(len(percents), 101)
+        percent_writes = [q for q in ctx.captured_queries if 'SET "percent" = ' in q['sql']]
+        self.assertEqual(len(percent_writes), len(percents))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.percent), (DownloadJob.STATUS_SUCCESS, 100))
+
+
+class DownloadBroadcasterTests(TestCase):
+    def setUp(self):
+        self.layer = get_channel_layer()
+        self.channel = async_to_sync(self.layer.new_channel)()
+        async_to_sync(self.layer.group_add)('downloads_client-1', self.channel)
+        self.content = make_content()
+
+    def test_batches_group_events_into_one_send(self):
+        broadcaster = DownloadBroadcaster(self.layer, max_batch=10, flush_interval=3600)
+        with mock.patch.object(self.layer, 'group_send', wraps=self.layer.group_send) as sent, \
+                self.assertNumQueries(0):
+            for percent in (10, 50, 100):
+                broadcaster.publish('game-1', self.content, 'client-1', percent)
+        self.assertEqual(sent.call_count, 1)
+
+        message = async_to_sync(self.layer.receive)(self.channel)
+        self.assertEqual(message['type'], 'download.progress_batch')
+        self.assertEqual([e['percent'] for e in message['events']], [10, 50, 100])
+        self.assertEqual(message['events'][-1]['status'], 'success')
+        self.assertEqual(message['events'][0]['download_url'], f'/api/download-direct/{self.content.id}/')
+        broadcaster.close()
+
+    def test_single_event_keeps_progress_message_shape(self):
+        broadcaster = DownloadBroadcaster(self.layer)
+        broadcaster.publish('game-1', self.content, 'client-1', 0, flush=True)
+        message = async_to_sync(self.layer.receive)(self.channel)
+        self.assertEqual((message['type'], message['percent']), ('download.progress', 0))
+        broadcaster.close()
+
+    @override_settings(DOWNLOAD_BROADCAST_URL_CACHE_SIZE=2)
+    def test_per_group_state_does_not_grow(self):
+        broadcaster = DownloadBroadcaster(self.layer)
+        contents = [self.content] + [make_content(version=f'2.0.{i}') for i in range(3)]
+        for i, content in enumerate(contents):
+            broadcaster.publish(f'game-{i}', content, f'client-{i}', 100)
+        self.assertEqual(len(broadcaster._urls), 2)
+
+        # 다 보낸 그룹은 다음 flush 때 정리, 이벤트가 남은 그룹은 전송 후 유지
+        broadcaster.publish('game-9', self.content, 'client-9', 10)
+        broadcaster.flush()
+        self.assertEqual(set(broadcaster._last_flush), {'downloads_client-9'})
+        broadcaster.flush()
+        self.assertEqual(broadcaster._last_flush, {})
+        broadcaster.close()
+
+
+class RedisSchedulerTests(TestCase):
+    def setUp(self):
+        self.redis = fake_redis(self)
+        self.content = make_content()
+
+    def make_job(self, client_id, priority=0, ago=0, size_bytes=0):
+        job = DownloadJob.objects.create(
+            content=self.content, client_id=client_id, priority=priority, size_bytes=size_bytes
+        )
+        # requested_at 은 auto_now_add 라 생성 후 덮어씀
+        job.requested_at = timezone.now() - timedelta(seconds=ago)
+        DownloadJob.objects.filter(pk=job.pk).update(requested_at=job.requested_at)
+        return job
+
+    def test_reserve_orders_by_priority_then_requested_at(self):
+        scheduler = RedisDownloadScheduler(client=self.redis, limit=3, policy='fifo')
+        old_low = self.make_job('a', priority=0, ago=30)
+        new_high = self.make_job('b', priority=5, ago=0)
+        old_high = self.make_job('c', priority=5, ago=10)
+        new_low = self.make_job('d', priority=0, ago=0)
+        for job in (old_low, new_high, old_high, new_low):
+            scheduler.enqueue(job)
+
+        self.assertEqual(scheduler.reserve(), [old_high.id, new_high.id, old_low.id])
+        self.assertEqual(scheduler.reserve(), [])  # 슬롯 가득
+        scheduler.release(old_high.id)
+        self.assertEqual(scheduler.reserve(), [new_low.id])
+
+    @override_settings(DOWNLOAD_AGING_SECONDS=300, DOWNLOAD_SHORT_JOB_BYTES_PER_SECOND=MB)
+    def test_weighted_policy_prefers_short_jobs_and_ages_low_tiers(self):
+        scheduler = RedisDownloadScheduler(client=self.redis, limit=4, policy='weighted', byte_budget=0)
+        big = self.make_job('a', priority=1, size_bytes=100 * MB)
+        small = self.make_job('b', priority=1, size_bytes=MB)
+        fresh_premium = self.make_job('c', priority=2)
+        starving_free = self.make_job('d', priority=0, ago=15 * 60)  # 2 tier * 300s 보다 오래 대기
+        for job in (big, small, fresh_premium, starving_free):
+            scheduler.enqueue(job)
+
+        self.assertEqual(scheduler.reserve(), [starving_free.id, fresh_premium.id, small.id, big.id])
+
+    def test_weighted_policy_enforces_byte_budget(self):
+        scheduler = RedisDownloadScheduler(client=self.redis, limit=3, policy='weighted', byte_budget=512 * MB)
+        first = self.make_job('a', ago=30, size_bytes=300 * MB)
+        second = self.make_job('b', ago=20, size_bytes=300 * MB)
+        huge = self.make_job('c', ago=10, size_bytes=2048 * MB)
+        small = self.make_job('d', ago=0, size_bytes=MB)
+        for job in (first, second, huge, small):
+            scheduler.enqueue(job)
+
+        # 300 + 300 > 512 → 대용량은 대기, 뒤의 작은 job 만 먼저 실행
+        self.assertEqual(scheduler.reserve(), [first.id, small.id])
+        self.assertEqual(scheduler.active_bytes(), 300 * MB)
+        scheduler.release(small.id)
+        scheduler.release(first.id)
+        self.assertEqual(scheduler.reserve(), [second.id])
+        scheduler.release(second.id)
+        # 예산보다 큰 job 은 혼자일 때만 실행
+        self.assertEqual(scheduler.reserve(), [huge.id])
+        self.assertEqual(scheduler.active_bytes(), 512 * MB)
+        scheduler.release(huge.id)
+        self.assertFalse(scheduler.release(huge.id))
+        self.assertEqual(scheduler.active_bytes(), 0)
+
+    def test_enqueue_skips_dispatched_job(self):
+        scheduler = RedisDownloadScheduler(client=self.redis, limit=1)
+        job = self.make_job('a')
+        self.assertTrue(scheduler.enqueue(job))
+        self.assertEqual(scheduler.reserve(), [job.id])
+        self.assertFalse(scheduler.enqueue(job))
+        self.assertEqual(scheduler.queued_count(), 0)
+
+    def test_concurrent_reserve_never_exceeds_limit_or_double_dispatches(self):
+        limit = 4
+        jobs = [self.make_job(f'client-{i}', priority=i % 3) for i in range(200)]
+        RedisDownloadScheduler(client=self.redis, limit=limit).sync_pending()
+
+        dispatched, lock = [], threading.Lock()
+        peak = [0]
+
+        def worker():
+            scheduler = RedisDownloadScheduler(client=self.redis, limit=limit)
+            while True:
+                ids = scheduler.reserve()
+                if not ids:
+                    if not scheduler.queued_count():
+                        return
+                    continue
+                with lock:
+                    dispatched.extend(ids)
+                    peak[0] = max(peak[0], scheduler.active_count())
+                for job_id in ids:
+                    scheduler.release(job_id)
+
+        threads = [threading.Thread(target=worker) for _ in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(sorted(dispatched), sorted(job.id for job in jobs))
+        self.assertLessEqual(peak[0], limit)
+
+    @override_settings(DOWNLOAD_SCHEDULER='redis')
+    def test_download_job_survives_redis_outage(self):
+        down = mock.patch.object(
+            RedisDownloadScheduler, 'enqueue', side_effect=redis.ConnectionError('redis down'),
+        )
+        with mock.patch('content.utils.scheduler.get_redis', return_value=self.redis), down, \
+                self.assertLogs('content.views', 'ERROR'):
+            res = APIClient().get(f'/api/download/{self.content.id}/', {'client_id': 'client-1'})
+        self.assertEqual(res.status_code, 200)
+        job = DownloadJob.objects.get(id=res.data['job_id'])
+        self.assertEqual(job.status, DownloadJob.STATUS_PENDING)
+
+        # 복구 후 reconcile 이 DB 의 pending job 을 대기열에 다시 채워 디스패치
+        with mock.patch('content.utils.scheduler.get_redis', return_value=self.redis), \
+                mock.patch('content.tasks.process_download_job.delay') as dispatch:
+            reconcile_downloads()
+        dispatch.assert_called_once_with(job.id)
+
+    @override_settings(DOWNLOAD_SCHEDULER='redis', DOWNLOAD_CONCURRENCY_LIMIT=2)
+    def test_download_job_view_dispatches_through_redis(self):
+        with mock.patch('content.utils.scheduler.get_redis', return_value=self.redis), \
+                mock.patch('content.tasks.process_download_job.delay') as dispatch:
+            for client_id in ('a', 'b', 'c'):
+                res = APIClient().get(f'/api/download/{self.content.id}/', {'client_id': client_id})
+                self.assertEqual(res.status_code, 200)
+        self.assertEqual(dispatch.call_count, 2)
+
+        scheduler = RedisDownloadScheduler(client=self.redis)
+        self.assertEqual((scheduler.active_count(), scheduler.queued_count()), (2, 1))
+
+
+@override_settings(DOWNLOAD_SCHEDULER='redis', DOWNLOAD_CONCURRENCY_LIMIT=4)
+class ContinuousDispatchTests(MediaTestCase):
+    """
+    Celery 대신 deque 로 태스크 전달을 흉내 내 완료 → 재충전 흐름을 검증
+    """
+    def setUp(self):
+        super().setUp()
+        self.redis = fake_redis(self)
+        patcher = mock.patch('content.utils.scheduler.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with mock.patch('content.signals.convert_content.delay'):
+            self.content = self.upload_original(data=b'x' * 2048)
+
+        self.tasks = deque()
+        self.dispatched = []
+        for target, name in ((process_download_job, 'process'), (schedule_downloads, 'schedule')):
+            patcher = mock.patch.object(target, 'delay', side_effect=lambda *a, name=name: self.tasks.append((name, a)))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(get_broadcaster(), 'publish')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def drain(self):
+        peak = 0
+        while self.tasks:
+            in_flight = sum(1 for name, _ in self.tasks if name == 'process')
+            peak = max(peak, in_flight)
+            name, args = self.tasks.popleft()
+            if name == 'process':
+                self.dispatched.append(args[0])
+                process_download_job(*args)
+            else:
+                schedule_downloads()
+        return peak
+
+    def test_completions_drain_backlog_without_new_requests(self):
+        jobs = DownloadJob.objects.bulk_create(
+            DownloadJob(content=self.content, client_id=f'client-{i}', priority=i % 3) for i in range(1000)
+        )
+        schedule_downloads.delay()  # 최초 1회만 트리거, 이후는 완료 이벤트로만 채움
+
+        peak = self.drain()
+
+        self.assertEqual(
+            DownloadJob.objects.filter(status=DownloadJob.STATUS_SUCCESS).count(), len(jobs)
+        )
+        self.assertEqual(len(self.dispatched), len(jobs))
+        self.assertLessEqual(peak, 4)
+        # 높은 우선순위가 먼저 처리됨
+        priorities = dict(DownloadJob.objects.values_list('id', 'priority'))
+        order = [priorities[job_id] for job_id in self.dispatched]
+        self.assertEqual(order, sorted(order, reverse=True))
+
+    def test_failed_job_is_requeued_until_retries_exhausted(self):
+        job = DownloadJob.objects.create(content=self.content, client_id='client-1')
+        schedule_downloads.delay()
+        with mock.patch('content.utils.stats.record_download') as recorded, \
+                mock.patch.object(type(self.content.file), 'open', side_effect=OSError('disk')), \
+                self.assertLogs('content.tasks', 'ERROR') as logs:
+            self.drain()
+        self.assertEqual(len(logs.records), 4)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (DownloadJob.STATUS_FAILED, 4))
+        self.assertEqual(self.dispatched, [job.id] * 4)
+        self.assertEqual(recorded.call_count, 4)
+        scheduler = RedisDownloadScheduler(client=self.redis)
+        self.assertEqual((scheduler.active_count(), scheduler.queued_count()), (0, 0))
+
+    def test_failed_job_waits_before_retry(self):
+        job = DownloadJob.objects.create(content=self.content, client_id='client-1')
+        schedule_downloads.delay()
+        with mock.patch.object(type(self.content.file), 'open', side_effect=OSError('disk')), \
+                mock.patch('content.tasks.requeue_download.apply_async') as requeue, \
+                self.assertLogs('content.tasks', 'ERROR'):
+            self.drain()
+            # 대기 중에는 sync_pending 으로도 다시 들어가지 않음
+            schedule_downloads()
+            self.drain()
+
+        self.assertEqual(self.dispatched, [job.id])
+        requeue.assert_called_once_with((job.id,), countdown=10)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (DownloadJob.STATUS_PENDING, 1))
+        self.assertGreater(job.not_before, timezone.now() + timedelta(seconds=9))
+        scheduler = RedisDownloadScheduler(client=self.redis)
+        self.assertEqual((scheduler.active_count(), scheduler.queued_count()), (0, 0))
+
+        # 대기가 끝나면(countdown 후 실행) 다시 처리
+        requeue_download(job.id)
+        self.drain()
+        self.assertEqual(self.dispatched, [job.id, job.id])
+        job.refresh_from_db()
+        self.assertEqual(job.status, DownloadJob.STATUS_SUCCESS)
+
+    @override_settings(DOWNLOAD_SCHEDULER='db')
+    def test_db_scheduler_skips_jobs_waiting_for_retry(self):
+        waiting = DownloadJob.objects.create(
+            content=self.content, client_id='client-1', not_before=timezone.now() + timedelta(seconds=30),
+        )
+        ready = DownloadJob.objects.create(content=self.content, client_id='client-2')
+        schedule_downloads()
+        self.assertEqual([args[0] for name, args in self.tasks if name == 'process'], [ready.id])
+        self.assertNotIn(waiting.id, self.dispatched)
+
+    def test_reconcile_recovers_slot_leaked_by_dead_worker(self):
+        leaked = DownloadJob.objects.create(content=self.content, client_id='client-1')
+        waiting = DownloadJob.objects.create(content=self.content, client_id='client-2')
+        scheduler = RedisDownloadScheduler(client=self.redis, limit=1)
+        scheduler.enqueue(leaked)
+        self.assertEqual(scheduler.reserve(), [leaked.id])
+        # 워커가 슬롯 반환 전에 죽은 상황
+        DownloadJob.objects.filter(pk=leaked.pk).update(status=DownloadJob.STATUS_SUCCESS)
+
+        with override_settings(DOWNLOAD_CONCURRENCY_LIMIT=1):
+            reconcile_downloads()
+            self.drain()
+
+        self.assertEqual(self.dispatched, [waiting.id])
+
+    @override_settings(DOWNLOAD_CONCURRENCY_LIMIT=1, DOWNLOAD_RESERVE_GRACE_SECONDS=60)
+    def test_reconcile_requeues_job_whose_dispatch_was_lost(self):
+        lost = DownloadJob.objects.create(content=self.content, client_id='client-1')
+        waiting = DownloadJob.objects.create(content=self.content, client_id='client-2')
+        scheduler = RedisDownloadScheduler(client=self.redis)
+        scheduler.sync_pending()
+        # 예약은 됐지만 process_download_job 메시지가 유실 → 행은 pending 인 채로 슬롯 점유
+        self.assertEqual(scheduler.reserve(), [lost.id])
+
+        # 유예 시간 안에서는 claim 대기 중으로 보고 건드리지 않음
+        reconcile_downloads()
+        reap_stale_downloads()
+        self.drain()
+        self.assertEqual(self.dispatched, [])
+
+        with mock.patch('content.utils.scheduler.time.time', return_value=time.time() + 61):
+            reconcile_downloads()
+            self.drain()
+        self.assertEqual(self.dispatched, [lost.id, waiting.id])
+        for job in (lost, waiting):
+            job.refresh_from_db()
+            self.assertEqual(job.status, DownloadJob.STATUS_SUCCESS)
+        self.assertEqual((scheduler.active_count(), scheduler.queued_count()), (0, 0))
+
+
+@override_settings(DOWNLOAD_LEASE_SECONDS=60)
+class DownloadLeaseTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        with mock.patch('content.signals.convert_content.delay'):
+            self.content = self.upload_original(data=b'x' * 4096)
+        patcher = mock.patch('content.tasks.schedule_downloads.delay')
+        self.refill = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_running(self, client_id, expires_in, attempts=0):
+        return DownloadJob.objects.create(
+            content=self.content, client_id=client_id, status=DownloadJob.STATUS_INPROGRESS,
+            attempts=attempts, percent=40, worker_id='dead-worker', started_at=timezone.now(),
+            lease_expires_at=timezone.now() + timedelta(seconds=expires_in),
+        )
+
+    def test_reaper_returns_expired_jobs_to_pending(self):
+        expired = self.make_running('a', expires_in=-1)
+        exhausted = self.make_running('b', expires_in=-1, attempts=3)
+        alive = self.make_running('c', expires_in=30)
+
+        with self.assertLogs('content.tasks', 'WARNING'):
+            self.assertEqual(reap_stale_downloads(), 2)
+
+        expired.refresh_from_db()
+        self.assertEqual(
+            (expired.status, expired.attempts, expired.worker_id, expired.lease_expires_at, expired.percent),
+            (DownloadJob.STATUS_PENDING, 1, '', None, 0),
+        )
+        exhausted.refresh_from_db()
+        self.assertEqual((exhausted.status, exhausted.attempts), (DownloadJob.STATUS_FAILED, 4))
+        alive.refresh_from_db()
+        self.assertEqual(alive.status, DownloadJob.STATUS_INPROGRESS)
+        self.refill.assert_called_once()
+
+        res = APIClient().get('/api/download-metrics/')
+        self.assertEqual(res.data['counters']['reclaimed_slots'], 2)
+        self.assertEqual(res.data['jobs'][DownloadJob.STATUS_PENDING], 1)
+
+    def test_worker_holds_and_clears_lease(self):
+        job = DownloadJob.objects.create(content=self.content, client_id='client-1')
+        leases = []
+        broadcaster = get_broadcaster()
+        with mock.patch.object(
+            broadcaster, 'publish',
+            side_effect=lambda *a, **kw: leases.append(
+                DownloadJob.objects.values_list('worker_id', 'lease_expires_at').get(pk=job.pk)
+            ),
+        ):
+            process_download_job(job.id)
+
+        worker_id, expires_at = leases[0]
+        self.assertTrue(worker_id)
+        self.assertGreater(expires_at, timezone.now())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.lease_expires_at), (DownloadJob.STATUS_SUCCESS, None))
+
+    @override_settings(DOWNLOAD_RETRY_DELAY=0)
+    def test_missing_file_is_recorded_as_failure(self):
+        job = DownloadJob.objects.create(content=self.content, client_id='client-1')
+        os.remove(self.content.file.path)
+
+        with mock.patch('content.tasks.release_download') as released, \
+                mock.patch('content.tasks.enqueue_download') as requeued, \
+                self.assertLogs('content.tasks', 'ERROR'):
+            process_download_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(
+            (job.status, job.attempts, job.worker_id, job.lease_expires_at),
+            (DownloadJob.STATUS_PENDING, 1, '', None),
+        )
+        self.assertFalse(DownloadHistory.objects.get(content=self.content).success)
+        released.assert_called_once_with(job.id)
+        requeued.assert_called_once()
+        self.refill.assert_called_once()
+
+    @override_settings(DOWNLOAD_READ_CHUNK_SIZE=1024, DOWNLOAD_PROGRESS_INTERVAL=3600)
+    def test_worker_stops_after_losing_lease(self):
+        job = DownloadJob.objects.create(content=self.content, client_id='client-1')
+
+        def reclaimed_elsewhere(*args, **kwargs):
+            # 첫 heartbeat 이후 reaper 회수 + 다른 워커가 다시 가져간 상황
+            DownloadJob.objects.filter(pk=job.pk).update(worker_id='other-worker')
+
+        broadcaster = get_broadcaster()
+        with mock.patch.object(broadcaster, 'publish', side_effect=reclaimed_elsewhere) as sent, \
+                mock.patch.object(broadcaster, 'flush') as flushed, \
+                self.assertLogs('content.tasks', 'WARNING'):
+            process_download_job(job.id)
+
+        self.assertEqual(sent.call_count, 1)
+        flushed.assert_called_once()  # 버퍼에 남은 이벤트는 중단 시에도 전송
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker_id), (DownloadJob.STATUS_INPROGRESS, 'other-worker'))
+        self.assertFalse(DownloadHistory.objects.exists())
+        self.refill.assert_not_called()
+
+
+class DownloadDirectRangeTests(MediaTestCase):
+    DATA = bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        with mock.patch('content.signals.convert_content.delay'):
+            self.content = self.upload_original(data=self.DATA)
+        self.url = f'/api/download-direct/{self.content.id}/'
+        self.client = APIClient()
+
+    def get(self, **headers):
+        res = self.client.get(self.url, **headers)
+        body = b''.join(res.streaming_content) if res.streaming else res.content
+        return res, body
+
+    def test_full_download_advertises_ranges_and_validators(self):
+        res, body = self.get()
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(body, self.DATA)
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertTrue(res['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', res)
+
+        res, _ = self.get(HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, 304)
+
+    def test_single_range_resumes_from_offset(self):
+        for header, start, end in (('bytes=10-19', 10, 19), ('bytes=1000-', 1000, 1023), ('bytes=-4', 1020, 1023)):
+            res, body = self.get(HTTP_RANGE=header)
+            self.assertEqual(res.status_code, 206)
+            self.assertEqual(res['Content-Range'], f'bytes {start}-{end}/1024')
+            self.assertEqual(body, self.DATA[start:end + 1])
+            self.assertEqual(int(res['Content-Length']), len(body))
+
+    def test_multiple_ranges_return_multipart(self):
+        res, body = self.get(HTTP_RANGE='bytes=0-3, 100-103, 2-5')
+        self.assertEqual(res.status_code, 206)
+        self.assertTrue(res['Content-Type'].startswith('multipart/byteranges; boundary='))
+        self.assertEqual(int(res['Content-Length']), len(body))
+        # 겹치는 0-3, 2-5 는 하나로 병합
+        self.assertIn(b'Content-Range: bytes 0-5/1024\r\n\r\n' + self.DATA[0:6], body)
+        self.assertIn(b'Content-Range: bytes 100-103/1024\r\n\r\n' + self.DATA[100:104], body)
+
+    def test_unsatisfiable_and_stale_if_range(self):
+        res, _ = self.get(HTTP_RANGE='bytes=5000-')
+        self.assertEqual((res.status_code, res['Content-Range']), (416, 'bytes */1024'))
+
+        res, body = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual((res.status_code, body), (200, self.DATA))
+
+    @override_settings(DOWNLOAD_X_ACCEL_REDIRECT=True)
+    def test_offloads_to_nginx(self):
+        res, body = self.get(HTTP_RANGE='bytes=0-9')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(body, b'')
+        self.assertEqual(res['X-Accel-Redirect'], f'/protected/{self.content.file.name}')
+        self.assertIn('ETag', res)
+
+
+class SignedDownloadUrlTests(TestCase):
+    def setUp(self):
+        self.content = make_content()
+        self.client = APIClient()
+        self.job = DownloadJob.objects.create(
+            content=self.content, client_id='client-1', status=DownloadJob.STATUS_SUCCESS,
+        )
+
+    def test_token_is_verified_without_db_access(self):
+        url = signed_download_url(self.content, self.job.id, 'client-1')
+        with self.assertNumQueries(0):
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['X-Accel-Redirect'], f'/protected/{self.content.file.name}')
+
+    def test_rejects_tampered_foreign_and_expired_tokens(self):
+        url = signed_download_url(self.content, self.job.id, 'client-1')
+        self.assertEqual(self.client.get(url[:-2] + 'xx').status_code, 403)
+
+        other = make_content(name='other')
+        token = url.split('token=')[1]
+        self.assertEqual(
+            self.client.get(f'/api/download/secure/{other.id}?job_id={self.job.id}&token={token}').status_code, 403,
+        )
+
+        expired = signed_download_url(self.content, self.job.id, 'client-1', ttl=-1)
+        self.assertEqual(self.client.get(expired).status_code, 410)
+
+    def test_checks_job_claim(self):
+        url = signed_download_url(self.content, self.job.id, 'client-1')
+        # 다른 job 의 URL 에 토큰만 붙여 쓰기
+        self.assertEqual(self.client.get(url.replace(f'job_id={self.job.id}', 'job_id=999')).status_code, 403)
+
+    def test_link_is_issued_only_after_permission_and_success(self):
+        with mock.patch('content.tasks.schedule_downloads.delay'):
+            res = self.client.get(f'/api/download/{self.content.id}/', {'client_id': 'client-1'})
+        self.assertNotIn('signed_download_url', res.data)
+        link_url = res.data['download_link_url']
+
+        # 아직 pending → 425, 익명 → 403
+        self.assertEqual(self.client.get(link_url).status_code, 425)
+        self.assertEqual(self.client.get(f'/api/download/{self.content.id}/link/', {'job_id': self.job.id}).status_code, 403)
+
+        user = User.objects.create_user('player')
+        job = DownloadJob.objects.create(
+            content=self.content, client_id=str(user.id), status=DownloadJob.STATUS_SUCCESS,
+        )
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get(f'/api/download/{self.content.id}/link/', {'job_id': self.job.id}).status_code, 403)
+        res = self.client.get(f'/api/download/{self.content.id}/link/', {'job_id': job.id})
+        self.assertEqual(res.status_code, 200)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(res.data['signed_download_url']).status_code, 200)
+
+    def test_refuses_placeholder_secret(self):
+        for secret in ('change-me', 'django-insecure-abc'):
+            with override_settings(DOWNLOAD_LINK_SECRET=secret, DEBUG=False), \
+                    self.assertRaises(ImproperlyConfigured):
+                signed_download_url(self.content, self.job.id, 'client-1')
+
+    @override_settings(DOWNLOAD_LINK_SECRET='s3cret')
+    def test_nginx_secure_link_matches_secure_link_md5(self):
+        url = nginx_secure_link('uploads/ab/game file.bin', 7, 'client 1', 2000000000)
+        # secure_link_md5 "$secure_link_expires$uri$arg_j$arg_c $download_link_secret"
+        expected = base64.urlsafe_b64encode(
+            hashlib.md5(b'2000000000/signed/uploads/ab/game file.bin7client%201 s3cret').digest()
+        ).rstrip(b'=').decode()
+        self.assertEqual(
+            url, f'/signed/uploads/ab/game%20file.bin?md5={expected}&e=2000000000&j=7&c=client%201'
+        )
+
+        # dedup 링크는 blob 경로로 서명 (gzip_static 이 blob 기준 사이드카를 찾도록), 파일명은 n
+        digest = 'ab' * 32
+        Content.objects.filter(id=self.content.id).update(file=f'uploads/{digest}/game file.bin')
+        self.content.refresh_from_db()
+        with override_settings(DOWNLOAD_SIGNED_URL_NGINX=True):
+            url = signed_download_url(self.content, self.job.id, 'client-1')
+        self.assertTrue(url.startswith(f'/signed/blobs/ab/{digest}?'), url)
+        self.assertTrue(url.endswith('&n=game%20file.bin'), url)
+
+
+@override_settings(MANIFEST_CHUNK_SIZE=100)
+class ChunkManifestTests(MediaTestCase):
+    DATA = os.urandom(450)
+
+    def upload(self, data):
+        with mock.patch('content.signals.convert_content.delay'), \
+                self.captureOnCommitCallbacks(execute=True):
+            resp = APIClient().post('/api/upload-content/', {
+                'name': 'asset', 'version': '1.0.0', 'file': SimpleUploadedFile('asset.bin', data),
+            }, format='multipart')
+        return Content.objects.get(pk=resp.data['id'])
+
+    def test_manifest_built_on_upload_and_chunks_verify_against_ranges(self):
+        content = self.upload(self.DATA)
+        sidecar = content.file.storage.path(manifest_name(content.file.name))
+        self.assertTrue(os.path.exists(sidecar))
+
+        client = APIClient()
+        res = client.get(f'/api/download/{content.id}/manifest/')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual((res.data['size'], res.data['chunk_size']), (450, 100))
+        self.assertEqual(res.data['sha256'], hashlib.sha256(self.DATA).hexdigest())
+        self.assertEqual([c['length'] for c in res.data['chunks']], [100, 100, 100, 100, 50])
+
+        for chunk in res.data['chunks']:
+            part = client.get(
+                res.data['download_url'],
+                HTTP_RANGE=f"bytes={chunk['offset']}-{chunk['offset'] + chunk['length'] - 1}",
+                HTTP_IF_RANGE=res.data['etag'],
+            )
+            self.assertEqual(part.status_code, 206)
+            self.assertEqual(hashlib.sha256(b''.join(part.streaming_content)).hexdigest(), chunk['sha256'])
+
+        self.assertEqual(
+            client.get(f'/api/download/{content.id}/manifest/', HTTP_IF_NONE_MATCH=res['ETag']).status_code, 304
+        )
+
+    def test_manifest_shared_by_links_to_same_blob(self):
+        with mock.patch('content.utils.manifest.build_manifest', wraps=manifest_module.build_manifest) as build, \
+                self.captureOnCommitCallbacks(execute=True):
+            orig = self.upload_original(data=self.DATA)
+        family = list(Content.objects.filter(name=orig.name))
+        self.assertEqual(len(family), 4)
+        # 원본/variant 4개 링크가 blob 옆 manifest 하나를 공유 → 해시는 한 번
+        self.assertEqual({manifest_name(c.file.name) for c in family}, {manifest_name(orig.file.name)})
+        self.assertTrue(manifest_name(orig.file.name).startswith('blobs/'))
+        self.assertEqual(build.call_count, 1)
+
+        variant = orig.variants.get(type='high')
+        res = APIClient().get(f'/api/download/{variant.id}/manifest/')
+        self.assertEqual(res.data['file'], variant.file.name)
+        self.assertEqual(res.data['sha256'], hashlib.sha256(self.DATA).hexdigest())
+
+        # 마지막 링크가 지워질 때 blob 과 함께 정리
+        sidecar = orig.file.storage.path(manifest_name(orig.file.name))
+        orig.delete()
+        self.assertTrue(os.path.exists(sidecar))
+        Content.objects.filter(name=orig.name).delete()
+        self.assertFalse(os.path.exists(sidecar))
+
+    def test_manifest_rebuilt_when_file_changes(self):
+        content = self.upload(self.DATA)
+        old_sidecar = content.file.storage.path(manifest_name(content.file.name))
+
+        content = self.upload(b'new-bytes' * 30)
+        self.assertFalse(os.path.exists(old_sidecar))
+        manifest = load_manifest(content.file.name)
+        self.assertEqual(manifest['sha256'], hashlib.sha256(b'new-bytes' * 30).hexdigest())
+
+        # chunk 크기가 바뀌면 요청 시 다시 생성
+        with override_settings(MANIFEST_CHUNK_SIZE=64):
+            self.assertIsNone(load_manifest(content.file.name))
+            res = APIClient().get(f'/api/download/{content.id}/manifest/')
+        self.assertEqual(len(res.data['chunks']), 5)
+
+
+class DeltaUpdateTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        rng = random.Random(3)
+        self.v1 = rng.randbytes(200_000)
+        # 앞쪽 삽입(이후 전부 밀림) + 중간 교체 + 뒤쪽 추가
+        self.v2 = b'header' + self.v1[:50_000] + rng.randbytes(3_000) + self.v1[53_000:] + b'tail' * 100
+
+    def _write(self, data):
+        path = os.path.join(self.media_root, f"raw-{len(os.listdir(self.media_root))}")
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def _overwrite(self, version, data):
+        resp = APIClient().post('/api/upload-content/', {
+            'name': 'asset', 'version': version, 'file': SimpleUploadedFile('asset.bin', data),
+            'chipset': 'snapdragon888', 'min_memory': 4, 'resolution': '1080p',
+        }, format='multipart')
+        self.assertEqual(resp.status_code, 200)
+        return Content.objects.get(pk=resp.data['id'])
+
+    def test_patch_round_trip_and_verification(self):
+        old, new = self._write(self.v1), self._write(self.v2)
+        patch = io.BytesIO()
+        stats = make_patch(old, new, patch)
+        self.assertLess(len(patch.getvalue()), len(self.v2) // 10)
+        self.assertEqual(stats['target_sha256'], hashlib.sha256(self.v2).hexdigest())
+
+        out = io.BytesIO()
+        patch.seek(0)
+        apply_patch(old, patch, out)
+        self.assertEqual(out.getvalue(), self.v2)
+
+        # 다른 파일에 적용하면 결과 해시가 맞지 않아 실패
+        patch.seek(0)
+        with self.assertRaises(ValueError):
+            apply_patch(self._write(bytes(reversed(self.v1))), patch, io.BytesIO())
+
+    def test_overwrite_builds_patch_served_by_get_content(self):
+        orig = self.upload_original(data=self.v1)
+        self._overwrite('2.0.0', self.v2)
+
+        self.assertEqual(ContentVersion.objects.filter(version='1.0.0').count(), 4)  # 원본 + variant 3개
+        self.assertEqual(ContentDelta.objects.filter(from_version='1.0.0', to_version='2.0.0').count(), 4)
+        self.assertEqual(orig.variants.count(), 3)
+
+        client = APIClient()
+        body = {'device_info': DEVICE, 'requested_content': 'asset', 'client_id': 'dev-1'}
+        res = client.post('/api/get-content/', {**body, 'installed_version': '1.0.0'}, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data['version'], '2.0.0')
+        self.assertEqual(res.data['patch_from_version'], '1.0.0')
+        self.assertLess(res.data['patch_size'], len(self.v2) // 10)
+
+        patch = client.get(res.data['patch_url'])
+        self.assertEqual(patch.status_code, 200)
+        out = io.BytesIO()
+        apply_patch(self._write(self.v1), io.BytesIO(b''.join(patch.streaming_content)), out)
+        self.assertEqual(out.getvalue(), self.v2)
+        self.assertEqual(hashlib.sha256(out.getvalue()).hexdigest(), res.data['patch_target_sha256'])
+
+        # 설치 버전이 없거나 최신이면 patch 없음
+        for extra in ({}, {'installed_version': '2.0.0'}):
+            res = client.post('/api/get-content/', {**body, **extra}, format='json')
+            self.assertNotIn('patch_url', res.data)
+
+        res = client.post('/api/get-contents/', {
+            'device_info': DEVICE, 'requested_contents': ['asset'], 'installed_versions': {'asset': '1.0.0'},
+        }, format='json')
+        self.assertIn('patch_url', res.data['results'][0]['data'])
+
+    def test_reupload_of_same_version_rebuilds_patches(self):
+        self.upload_original(data=self.v1)
+        self._overwrite('2.0.0', self.v2)
+        v3 = self.v2[:100_000] + b'rebuilt' + self.v2[100_000:]
+        self._overwrite('2.0.0', v3)
+
+        expected = hashlib.sha256(v3).hexdigest()
+        deltas = ContentDelta.objects.filter(from_version='1.0.0', to_version='2.0.0')
+        self.assertEqual(deltas.count(), 4)
+        self.assertEqual(set(deltas.values_list('target_sha256', flat=True)), {expected})
+
+        res = APIClient().post('/api/get-content/', {
+            'device_info': DEVICE, 'requested_content': 'asset', 'installed_version': '1.0.0',
+        }, format='json')
+        self.assertEqual(res.data['patch_target_sha256'], expected)
+
+    @override_settings(DELTA_KEEP_VERSIONS=2)
+    def test_only_recent_versions_are_kept(self):
+        orig = self.upload_original(data=self.v1)
+        first_file = orig.file.path
+        for i, version in enumerate(['2.0.0', '3.0.0', '4.0.0']):
+            self._overwrite(version, self.v2 + bytes([i]) * 1000)
+
+        self.assertEqual(
+            sorted(orig.versions.values_list('version', flat=True)), ['2.0.0', '3.0.0'],
+        )
+        self.assertFalse(os.path.exists(first_file))
+        self.assertEqual(
+            sorted(orig.deltas.values_list('from_version', 'to_version')),
+            [('2.0.0', '4.0.0'), ('3.0.0', '4.0.0')],
+        )
+
+        # content 가 삭제되면 보관 버전/patch 파일도 함께 정리
+        paths = [v.file.path for v in orig.versions.all()] + [d.file.path for d in orig.deltas.all()]
+        orig.delete()
+        self.assertFalse(any(os.path.exists(p) for p in paths))
+
+
+class PrecompressTests(MediaTestCase):
+    TEXT = b''.join(b'{"id": %d, "name": "entity", "hp": 100},\n' % i for i in range(5000))
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def _variant(self, data, filename='level.json'):
+        orig = self.upload_original(data=data, filename=filename)
+        return orig.variants.get(type='high')
+
+    def test_negotiation(self):
+        encodings = {'gzip': 300, 'br': 200}
+        self.assertEqual(negotiate('gzip, deflate, br', encodings), 'br')
+        self.assertEqual(negotiate('gzip, br;q=0', encodings), 'gzip')
+        self.assertEqual(negotiate('*', encodings), 'br')
+        self.assertIsNone(negotiate('identity', encodings))
+        self.assertIsNone(negotiate('gzip;q=0, *;q=0', encodings))
+        self.assertIsNone(negotiate('', encodings))
+
+    def test_conversion_precompresses_only_compressible_files(self):
+        with mock.patch('content.utils.precompress._compress_file', wraps=precompress_module._compress_file) as compress:
+            variant = self._variant(self.TEXT)
+        self.assertLess(variant.encodings['gzip'], len(self.TEXT) // 5)
+        sidecar = encoded_name(variant.file.name, 'gzip')
+        with open(variant.file.storage.path(sidecar), 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), self.TEXT)
+        # 원본과 variant 3개가 같은 blob → 압축은 encoding 별 한 번, 기록은 모두에게
+        self.assertTrue(sidecar.startswith('blobs/'))
+        self.assertEqual(compress.call_count, len(available_encodings()))
+        family = Content.objects.filter(name=variant.name)
+        self.assertEqual(family.count(), 4)
+        self.assertEqual({tuple(sorted(c.encodings.items())) for c in family}, {tuple(sorted(variant.encodings.items()))})
+
+        self.assertEqual(self._variant(os.urandom(50_000), filename='noise.bin').encodings, {})
+        self.assertEqual(self._variant(self.TEXT, filename='photo.png').encodings, {})
+
+    def test_download_direct_serves_negotiated_encoding(self):
+        variant = self._variant(self.TEXT)
+        url = f'/api/download-direct/{variant.id}/'
+
+        res = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res['Vary'])
+        self.assertEqual(gzip.decompress(b''.join(res.streaming_content)), self.TEXT)
+        self.assertEqual(self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=res['ETag']).status_code, 304)
+
+        plain = self.client.get(url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertNotEqual(plain['ETag'], res['ETag'])
+
+        # Range 는 원본 bytes 기준, 압축본 ETag 로 이어받을 때만 압축본
+        part = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_RANGE='bytes=0-9')
+        self.assertFalse(part.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(part.streaming_content), self.TEXT[:10])
+        resumed = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_RANGE='bytes=10-', HTTP_IF_RANGE=res['ETag'])
+        self.assertEqual(resumed.status_code, 206)
+        self.assertEqual(resumed['Content-Encoding'], 'gzip')
+
+    def test_x_accel_hands_encoding_to_nginx(self):
+        variant = self._variant(self.TEXT)
+        sibling = encoded_name(variant.file.name, 'gzip')
+        with override_settings(DOWNLOAD_X_ACCEL_REDIRECT=True):
+            res = self.client.get(f'/api/download-direct/{variant.id}/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(res['X-Accel-Redirect'], f'/protected-gzip/{sibling}')
+
+        job = DownloadJob.objects.create(content=variant, client_id='client-1', status=DownloadJob.STATUS_SUCCESS)
+        url = signed_download_url(variant, job.id, 'client-1')
+        with self.assertNumQueries(0):
+            res = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(res['X-Accel-Redirect'], f'/protected-gzip/{sibling}')
+        self.assertEqual(self.client.get(url)['X-Accel-Redirect'], f'/protected/{variant.file.name}')
+
+        # 사이드카는 blob 기준 — 같은 blob 을 가리키는 원본이 남아 있으면 유지, 마지막 링크와 함께 삭제
+        path = variant.file.storage.path(sibling)
+        variant.delete()
+        self.assertTrue(os.path.exists(path))
+        Content.objects.filter(name=variant.name).delete()
+        self.assertFalse(os.path.exists(path))
+
+
+class DependencyResolverTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # game → engine → runtime, game → textures → runtime
+        self.game = make_content(name='game')
+        self.engine = make_content(name='engine')
+        self.textures = make_content(name='textures')
+        self.runtime = make_content(name='runtime')
+        for content, required in (
+            (self.game, self.engine), (self.game, self.textures),
+            (self.engine, self.runtime), (self.textures, self.runtime),
+        ):
+            ContentDependency.objects.create(content=content, required=required)
+
+    def test_transitive_install_order_is_cached(self):
+        order = get_dependent_contents(self.game)
+        self.assertEqual(order, [self.runtime.id, self.engine.id, self.textures.id])
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                resolve_dependencies([self.game.id, self.engine.id, self.runtime.id]),
+                {self.game.id: order, self.engine.id: [self.runtime.id]},
+            )
+
+        extra = make_content(name='shader')
+        with self.captureOnCommitCallbacks(execute=True):
+            ContentDependency.objects.create(content=self.runtime, required=extra)
+        self.assertEqual(get_dependent_contents(self.game)[0], extra.id)
+
+    def test_closure_cached_per_content(self):
+        # 의존성 없는 콘텐츠만 조회하면 그 콘텐츠의 직접 의존성만 읽음 (그래프 전체를 읽지 않음)
+        lone = make_content(name='lone')
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(resolve_dependencies([lone.id]), {})
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn(str(lone.id), ctx.captured_queries[0]['sql'])
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_dependencies([lone.id]), {})
+
+        # 깊이마다 쿼리 1번, 함께 읽힌 engine/textures 의 폐쇄도 저장
+        with self.assertNumQueries(3):
+            resolve_dependencies([self.game.id])
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_dependencies([self.textures.id]), {self.textures.id: [self.runtime.id]})
+
+    def test_cycles_rejected_at_write_time(self):
+        with self.assertRaises(DependencyCycleError):
+            ContentDependency.objects.create(content=self.runtime, required=self.game)
+        with self.assertRaises(DependencyCycleError):
+            ContentDependency(content=self.engine, required=self.engine).clean()
+        self.assertEqual(ContentDependency.objects.count(), 4)
+
+    def test_bulk_create_checks_cycles(self):
+        shader = make_content(name='shader')
+        with self.assertRaises(DependencyCycleError):
+            # 각각은 기존 그래프와 사이클이 없지만 함께 넣으면 runtime → shader → game → ... → runtime
+            ContentDependency.objects.bulk_create([
+                ContentDependency(content=self.runtime, required=shader),
+                ContentDependency(content=shader, required=self.game),
+            ])
+        self.assertEqual(ContentDependency.objects.count(), 4)
+
+        resolve_dependencies([self.runtime.id])  # 폐쇄 캐시 적재
+        with self.captureOnCommitCallbacks(execute=True):
+            ContentDependency.objects.bulk_create([ContentDependency(content=self.runtime, required=shader)])
+        self.assertEqual(resolve_dependencies([self.runtime.id]), {self.runtime.id: [shader.id]})
+
+    @override_settings(DEPENDENCY_LOCK_TIMEOUT=0)
+    def test_writes_wait_for_dependency_lock(self):
+        shader = make_content(name='shader')
+        cache.set(DEPENDENCY_LOCK_KEY, 'other-writer', 10)  # 다른 요청이 검사~INSERT 중
+        with self.assertRaises(TimeoutError):
+            ContentDependency.objects.create(content=self.runtime, required=shader)
+        self.assertEqual(cache.get(DEPENDENCY_LOCK_KEY), 'other-writer')
+        cache.delete(DEPENDENCY_LOCK_KEY)
+        ContentDependency.objects.create(content=self.runtime, required=shader)
+        self.assertIsNone(cache.get(DEPENDENCY_LOCK_KEY))
+
+    def test_missing_dependencies_in_one_query(self):
+        record_download(self.engine, 'client-1', success=True)
+        resolve_dependencies([self.game.id])  # 폐쇄 캐시 적재
+        with self.assertNumQueries(1):
+            missing = missing_dependencies([self.game.id], 'client-1')
+        self.assertEqual(missing, {self.game.id: [self.runtime.id, self.textures.id]})
+
+    def test_fallback_requires_indirect_dependencies(self):
+        failed = make_content(name='game', type='low')
+        scored = [(10, failed), (9, self.game)]
+        for content in (self.engine, self.textures):
+            record_download(content, 'client-1', success=True)
+        self.assertIsNone(get_fallback_content(scored, failed.id, 'client-1', 'game'))
+
+        record_download(self.runtime, 'client-1', success=True)
+        self.assertEqual(get_fallback_content(scored, failed.id, 'client-1', 'game'), self.game)
+
+    def test_get_content_returns_install_order(self):
+        record_download(self.runtime, 'client-1', success=True)
+        res = APIClient().post('/api/get-content/', {
+            'device_info': DEVICE, 'requested_content': 'game', 'client_id': 'client-1',
+        }, format='json')
+        self.assertEqual(res.data['dependencies'], [self.runtime.id, self.engine.id, self.textures.id])
+        self.assertEqual(res.data['missing_dependencies'], [self.engine.id, self.textures.id])
+
+
+class FallbackChainTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.best = make_content(name='game', type='high')
+        self.second = make_content(name='game', type='normal', min_memory=8)
+        self.flaky = make_content(name='game', type='low', min_memory=8)
+        self.needs_dep = make_content(name='game', type='low', resolution='720p')
+        self.last = make_content(name='game', type='low', required_chipset='exynos2100', resolution='720p')
+        ContentDependency.objects.create(content=self.needs_dep, required=make_content(name='runtime'))
+        record_download(self.flaky, 'client-1', success=False)
+
+    def _post(self, **extra):
+        return self.client.post('/api/get-content/', {
+            'device_info': DEVICE, 'requested_content': 'game', 'client_id': 'client-1', **extra,
+        }, format='json')
+
+    def test_ranked_chain_applies_failure_and_dependency_rules(self):
+        res = self._post(include_fallbacks=True)
+        self.assertEqual(res.data['id'], self.best.id)
+        chain = [item['id'] for item in res.data['fallbacks']]
+        self.assertEqual(chain, [self.second.id, self.last.id])
+        self.assertTrue(res.data['fallbacks'][0]['download_url'].endswith(f'/api/download-direct/{self.second.id}/'))
+
+        # 첫 번째 fallback 은 실패 후 재요청했을 때의 응답과 같음
+        retry = self._post(failed_content_id=self.best.id, include_fallbacks=True)
+        self.assertEqual(retry.data['id'], chain[0])
+        self.assertEqual([item['id'] for item in retry.data['fallbacks']], chain[1:])
+
+        self.assertNotIn('fallbacks', self._post().data)
+
+    def test_chain_adds_no_per_candidate_queries(self):
+        self._post(include_fallbacks=True)  # 후보/의존성 캐시 적재 (의존성 폐쇄는 콘텐츠별이므로 fallback 후보까지)
+        with CaptureQueriesContext(connection) as plain:
+            self._post()
+        with CaptureQueriesContext(connection) as chained:
+            self._post(include_fallbacks=True)
+        # 의존성이 있는 후보 보유 여부 조회 1번만 추가
+        self.assertEqual(len(chained.captured_queries), len(plain.captured_queries) + 1)
+
+    def test_batch_matches_single(self):
+        res = self.client.post('/api/get-contents/', {
+            'device_info': DEVICE, 'requested_contents': ['game'], 'client_id': 'client-1',
+            'include_fallbacks': True,
+        }, format='json')
+        self.assertEqual(res.json()['results'][0]['data'], self._post(include_fallbacks=True).json())
+
+
+class ScoreMemoTests(TestCase):
+    DEVICES = [
+        DEVICE,
+        {'chipset': 'exynos2100', 'memory': 4, 'resolution': '720p'},
+        {'chipset': 'snapdragon865', 'memory': 6.0, 'resolution': '1080p'},
+    ]
+
+    def setUp(self):
+        cache.clear()
+        clear_memo()
+        self.contents = [
+            make_content(name='game', type='high'),
+            make_content(name='game', type='normal', min_memory=6, resolution='720p'),
+            make_content(name='game', type='low', required_chipset='exynos2100', min_memory=2),
+        ]
+        record_download(self.contents[0], 'client-1', success=False)
+
+    def _rank(self, device, client_id='client-1', name='game'):
+        candidates = get_candidates(name)
+        counts = get_download_counts([c.id for c in candidates], client_id)
+        return rank_many({name: candidates}, device, counts)[name], rank_contents(candidates, device, counts)
+
+    def test_profile_ignores_key_order_and_extra_fields(self):
+        self.assertEqual(
+            device_profile({'resolution': '1080p', 'memory': 8.0, 'chipset': 'snapdragon888', 'os': 'android'}),
+            device_profile(DEVICE),
+        )
+        self.assertNotEqual(device_profile(DEVICE), device_profile({**DEVICE, 'memory': 6}))
+
+    def test_memoized_ranking_matches_direct_scoring(self):
+        for _ in range(2):  # miss 후 hit 도 같은 결과
+            for device in self.DEVICES:
+                for client_id in ('client-1', 'client-2'):
+                    memoized, direct = self._rank(device, client_id)
+                    self.assertEqual([(s, c.id) for s, c in memoized], [(s, c.id) for s, c in direct])
+        self.assertEqual(get_counters(SCORING_COUNTERS), {'score_cache_hits': 9, 'score_cache_misses': 3})
+
+    def test_vector_path_matches(self):
+        for i in range(70):
+            make_content(name='big', type='low', version=f'1.0.{i}', min_memory=i % 10)
+        for _ in range(2):
+            memoized, direct = self._rank(DEVICE, name='big')
+            self.assertEqual([(s, c.id) for s, c in memoized], [(s, c.id) for s, c in direct])
+
+    def test_catalog_change_invalidates(self):
+        self._rank(DEVICE)
+        added = make_content(name='game', type='low', version='2.0.0')
+        memoized, _ = self._rank(DEVICE)
+        self.assertIn(added.id, [c.id for _, c in memoized])
+        self.assertEqual(get_counters(SCORING_COUNTERS)['score_cache_misses'], 2)
+
+        res = APIClient().get('/api/scoring-metrics/')
+        self.assertEqual(res.data['counters']['score_cache_misses'], 2)
+        self.assertEqual(res.data['memo']['profiles'], 1)
+
+
+class CapabilityColumnTests(TestCase):
+    DEVICES = [
+        DEVICE,
+        {'chipset': 'exynos2100', 'memory': 4, 'resolution': '720p'},
+        {'chipset': 'snapdragon865', 'memory': 6.5, 'resolution': '2560x1440'},
+        {'chipset': 'dimensity9000', 'memory': 2, 'resolution': '1080p'},
+    ]
+
+    def setUp(self):
+        cache.clear()
+        clear_memo()
+
+    def _catalog(self, name='huge', count=120):
+        rng = random.Random(5)
+        chipsets = ['snapdragon888', 'snapdragon865', 'exynos2100', 'dimensity9000', 'tensor']
+        resolutions = ['1080p', '720p', '2560x1440', '480p']
+        contents = [
+            make_content(
+                name=name, type=rng.choice(['high', 'normal', 'low']), version=f'1.0.{i}',
+                required_chipset=rng.choice(chipsets), min_memory=rng.choice([1, 2, 4, 6, 8]),
+                resolution=rng.choice(resolutions),
+            )
+            for i in range(count)
+        ]
+        for content in rng.sample(contents, 30):
+            record_download(content, 'client-1', success=rng.random() < 0.7)
+        return contents
+
+    def test_columns_follow_meta_info(self):
+        content = make_content(required_chipset='exynos2100', min_memory=6, resolution='2560x1440')
+        self.assertEqual(
+            (content.chipset_family, content.min_memory, content.resolution_height), ('exynos2100', 6.0, 1440),
+        )
+        content.meta_info = {'required_chipset': 'snapdragon865'}
+        content.save()
+        content.refresh_from_db()
+        self.assertEqual(
+            (content.chipset_family, content.min_memory, content.resolution_height), ('snapdragon', 0.0, None),
+        )
+        self.assertEqual(Content.objects.filter(chipset_family='snapdragon', min_memory__lte=4).count(), 1)
+
+    def test_backfill_migration(self):
+        content = make_content(min_memory=3, resolution='720p')
+        Content.objects.filter(id=content.id).update(chipset_family='', min_memory=0, resolution_height=None)
+
+        migration = importlib.import_module('content.migrations.0015_backfill_content_capabilities')
+        migration.backfill(apps, None)
+        content.refresh_from_db()
+        self.assertEqual(
+            (content.chipset_family, content.min_memory, content.resolution_height), ('snapdragon', 3.0, 720),
+        )
+        self.assertEqual(migration._capabilities(content.meta_info), extract_capabilities(content.meta_info))
+
+    def test_prefilter_keeps_best_choice(self):
+        self._catalog()
+        full = get_candidates('huge')
+        for device in self.DEVICES:
+            for client_id in ('client-1', 'client-2'):
+                narrowed = prefilter_candidates('huge', device)
+                self.assertLess(len(narrowed), len(full))
+                expected = select_best_content(rank_contents(full, device, get_download_counts(
+                    [c.id for c in full], client_id)))
+                chosen = select_best_content(rank_contents(narrowed, device, get_download_counts(
+                    [c.id for c in narrowed], client_id)))
+                self.assertEqual(chosen.id, expected.id)
+
+        self.assertIsNone(prefilter_candidates('huge', {**DEVICE, 'memory': '8'}))
+
+        # 칩셋 미입력 업로드(None) 는 family 일치가 아님 — 하한을 부풀려 실제 최선(4.5)을 버리면 안 됨
+        winner = make_content(name='nochip', type='low', required_chipset='tensor', min_memory=4, resolution='720p')
+        failing = make_content(name='nochip', type='high', required_chipset=None, min_memory=4)
+        record_download(failing, 'client-1', success=False)  # 6 × 0.6 = 3.6
+        self.assertIsNone(failing.chipset_family)
+        self.assertEqual(self._assert_same_choice('nochip', DEVICE).id, winner.id)
+
+        # 콘텐츠/디바이스 모두 resolution None 이면 일치(10) — 상한을 0 으로 잡아 버리면 안 됨
+        device = {'chipset': 'snapdragon888', 'memory': 8, 'resolution': None}
+        winner = make_content(name='nores', type='low', required_chipset='tensor', resolution=None)
+        failing = make_content(name='nores', type='high')
+        record_download(failing, 'client-1', success=False)  # 7 × 0.6 = 4.2
+        self.assertEqual(self._assert_same_choice('nores', device).id, winner.id)
+
+    def _assert_same_choice(self, name, device, client_id='client-1'):
+        full = get_candidates(name)
+        narrowed = prefilter_candidates(name, device)
+        expected = select_best_content(rank_contents(full, device, get_download_counts([c.id for c in full], client_id)))
+        chosen = select_best_content(rank_contents(
+            narrowed, device, get_download_counts([c.id for c in narrowed], client_id),
+        ))
+        self.assertEqual(chosen.id, expected.id)
+        return expected
+
+    @override_settings(CANDIDATE_CACHE_MAX_ROWS=50)
+    def test_large_catalog_is_prefiltered_in_sql(self):
+        self._catalog()
+        small = make_content(name='small')
+        self.assertEqual(len(get_candidates('huge')), 120)
+        self.assertTrue(cache.get(_large_key('huge')))
+        # fallback/배치 경로용 전체 목록은 그대로 캐시
+        self.assertEqual(len(cache.get(_cache_key('huge'))), 120)
+        with self.assertNumQueries(0):
+            get_candidates('huge')
+        self.assertEqual(get_scoring_candidates('small', DEVICE), [Candidate(
+            small.id, 'small', 'high', '1.0.0', small.meta_info, small.file.name,
+        )])
+
+        with CaptureQueriesContext(connection) as ctx:
+            narrowed = get_scoring_candidates('huge', DEVICE)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertLess(len(narrowed), 120)
+
+        client = APIClient()
+        best = client.post('/api/get-content/', {
+            'device_info': DEVICE, 'requested_content': 'huge', 'client_id': 'client-1',
+        }, format='json')
+        self.assertEqual(best.status_code, 200)
+        self.assertIn(best.data['id'], {c.id for c in narrowed})
+
+        # fallback 목록은 전체 후보 기준
+        chain = client.post('/api/get-content/', {
+            'device_info': DEVICE, 'requested_content': 'huge', 'client_id': 'client-1', 'include_fallbacks': True,
+        }, format='json')
+        self.assertEqual(chain.data['id'], best.data['id'])
+        self.assertGreater(len(chain.data['fallbacks']), len(narrowed) - 1)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN 형식은 SQLite 기준')
+class QueryBudgetTests(TestCase):
+    """
+    대량 데이터에서 API/스케줄러별 쿼리 수 상한과 인덱스 사용(EXPLAIN QUERY PLAN) 확인 — 캐시가 빈 상태 기준
+    """
+    NAMES = 300
+    CLIENTS = 200
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(3)
+        base = {'required_chipset': 'snapdragon888', 'min_memory': 4, 'resolution': '1080p'}
+        originals = Content.objects.bulk_create(
+            Content(name=f'asset-{i}', type='original', meta_info=base, file=f'uploads/{i}/asset.bin',
+                    conversion_status=Content.ConversionStatus.SUCCESS, **extract_capabilities(base))
+            for i in range(cls.NAMES)
+        )
+        variants = []
+        for original in originals:
+            for variant_type in ('high', 'normal', 'low'):
+                meta = {
+                    'required_chipset': rng.choice(['snapdragon888', 'snapdragon865', 'exynos2100']),
+                    'min_memory': rng.choice([2, 4, 6]), 'resolution': rng.choice(['1080p', '720p']),
+                }
+                variants.append(Content(
+                    name=original.name, type=variant_type, meta_info=meta, parent=original,
+                    file=f'uploads/{original.id}/{variant_type}.bin', **extract_capabilities(meta),
+                ))
+        cls.variants = Content.objects.bulk_create(variants)
+
+        clients = [f'client-{i}' for i in range(cls.CLIENTS)]
+        DownloadHistory.objects.bulk_create(
+            DownloadHistory(content=rng.choice(cls.variants), client_id=rng.choice(clients), success=rng.random() < 0.8)
+            for _ in range(20_000)
+        )
+        statuses = [DownloadJob.STATUS_SUCCESS] * 8 + [DownloadJob.STATUS_PENDING, DownloadJob.STATUS_FAILED]
+        DownloadJob.objects.bulk_create(
+            DownloadJob(content=rng.choice(cls.variants), client_id=rng.choice(clients),
+                        priority=rng.randint(0, 2), status=rng.choice(statuses))
+            for _ in range(5_000)
+        )
+        rebuild_download_stats()
+
+    def setUp(self):
+        cache.clear()
+        clear_memo()
+        self.client = APIClient()
+
+    def _plans(self, queries):
+        # SELECT 별 EXPLAIN QUERY PLAN 상세 문자열 목록
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                if query['sql'].startswith('SELECT'):
+                    cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                    plans.append(' | '.join(row[-1] for row in cursor.fetchall()))
+        return plans
+
+    def assertBudget(self, budget, call):
+        with CaptureQueriesContext(connection) as ctx:
+            result = call()
+        self.assertLessEqual(len(ctx.captured_queries), budget, [q['sql'] for q in ctx.captured_queries])
+        return result, self._plans(ctx.captured_queries)
+
+    def assertUsesIndex(self, plans, index):
+        self.assertTrue(any(f'INDEX {index}' in plan for plan in plans), plans)
+
+    def test_get_content(self):
+        res, plans = self.assertBudget(3, lambda: self.client.post('/api/get-content/', {
+            'device_info': DEVICE, 'requested_content': 'asset-7', 'client_id': 'client-1', 'include_fallbacks': True,
+        }, format='json'))
+        self.assertEqual(res.status_code, 200)
+        self.assertUsesIndex(plans, 'content_name_type_idx')
+
+    def test_get_content_without_fallbacks(self):
+        res, plans = self.assertBudget(3, lambda: self.client.post('/api/get-content/', {
+            'device_info': DEVICE, 'requested_content': 'asset-7', 'client_id': 'client-1',
+        }, format='json'))
+        self.assertEqual(res.status_code, 200)
+        self.assertUsesIndex(plans, 'content_name_type_idx')
+
+    @override_settings(CANDIDATE_CACHE_MAX_ROWS=2)
+    def test_get_content_prefilters_large_catalog(self):
+        get_candidates('asset-7')  # 대형 카탈로그 표시만 남기고 SQL 사전 필터 경로 측정
+        cache.delete(_cache_key('asset-7'))
+        with mock.patch('content.utils.capabilities.prefilter_candidates', wraps=prefilter_candidates) as prefilter:
+            res, plans = self.assertBudget(3, lambda: self.client.post('/api/get-content/', {
+                'device_info': DEVICE, 'requested_content': 'asset-7', 'client_id': 'client-1',
+            }, format='json'))
+        self.assertEqual(res.status_code, 200)
+        prefilter.assert_called_once()
+        self.assertUsesIndex(plans, 'content_name_type_idx')
+
+    def test_get_contents_is_constant_in_batch_size(self):
+        for size in (5, 50):
+            res, plans = self.assertBudget(3, lambda: self.client.post('/api/get-contents/', {
+                'device_info': DEVICE, 'requested_contents': [f'asset-{i}' for i in range(size)],
+                'client_id': 'client-1',
+            }, format='json'))
+            self.assertEqual(len(res.data['results']), size)
+            self.assertUsesIndex(plans, 'content_name_type_idx')
+            cache.clear()
+
+    def test_catalog(self):
+        res, _ = self.assertBudget(3, lambda: self.client.get('/api/contents/', {'limit': 50}))
+        self.assertEqual(res.status_code, 200)
+
+    def test_download_history(self):
+        res, plans = self.assertBudget(1, lambda: self.client.get('/api/download-history/client-3/'))
+        self.assertEqual(len(res.data), 20)
+        self.assertUsesIndex(plans, 'history_client_time_idx')
+        self.assertNotIn('TEMP B-TREE', plans[0])  # 인덱스 순서로 최근 20개만 읽음
+
+    def test_download_job(self):
+        content = self.variants[0]
+        with mock.patch('content.tasks.schedule_downloads.delay'):
+            self.assertBudget(3, lambda: self.client.get(f'/api/download/{content.id}/', {'client_id': 'new-client'}))
+            self.assertBudget(2, lambda: self.client.get(f'/api/download/{content.id}/', {'client_id': 'new-client'}))
+
+    def test_download_metrics(self):
+        _, plans = self.assertBudget(2, lambda: self.client.get('/api/download-metrics/'))
+        self.assertTrue(all('downloadjob_queue_idx' in plan for plan in plans), plans)
+
+    def test_scheduler(self):
+        with mock.patch('content.tasks.process_download_job.delay') as dispatch:
+            _, plans = self.assertBudget(2, schedule_downloads)
+        self.assertEqual(dispatch.call_count, 3)
+        self.assertTrue(all('downloadjob_queue_idx' in plan for plan in plans), plans)
+        self.assertNotIn('TEMP B-TREE', plans[1])  # 우선순위/요청 순서를 인덱스가 그대로 제공
+
+    def test_history_rollup_uses_index(self):
+        with CaptureQueriesContext(connection) as ctx:
+            rebuild_download_stats()
+        rollup = [q for q in ctx.captured_queries if 'GROUP BY' in q['sql'] and 'downloadhistory' in q['sql']]
+        plans = self._plans(rollup)
+        self.assertEqual(len(plans), 1, plans)
+        # (content, client_id) 순서 그대로 인덱스만 읽어 집계 — 테이블 접근/임시 정렬 없음
+        self.assertIn('COVERING INDEX history_content_client_idx', plans[0])
+        self.assertNotIn('TEMP B-TREE', plans[0])
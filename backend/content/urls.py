@@ -1,14 +1,23 @@
 from django.urls import path
-from .views import get_best_content, upload_content, list_all_contents, download_job, get_download_history, download_direct, download_secure
+from .views import get_best_content, get_best_contents, upload_content, create_upload, upload_chunk, complete_upload, list_all_contents, download_job, download_manifest, get_download_history, download_metrics, scoring_metrics, download_direct, download_patch, download_link, download_secure
 from django.conf import settings
 from django.conf.urls.static import static
 
 urlpatterns = [
     path('get-content/', get_best_content),
+    path('get-contents/', get_best_contents),
     path('upload-content/', upload_content),
+    path('uploads/', create_upload),
+    path('uploads/<uuid:upload_id>/', upload_chunk, name='upload_chunk'),
+    path('uploads/<uuid:upload_id>/complete/', complete_upload),
     path('contents/', list_all_contents),
     path('download/<int:content_id>/', download_job),
+    path('download/<int:content_id>/manifest/', download_manifest),
     path('download-history/<str:client_id>/', get_download_history),
+    path('download-metrics/', download_metrics),
+    path('scoring-metrics/', scoring_metrics),
     path('download-direct/<int:content_id>/', download_direct, name='download_direct'),
+    path('download-patch/<int:delta_id>/', download_patch, name='download_patch'),
+    path('download/<int:content_id>/link/', download_link, name='download_link'),
     path("download/secure/<int:content_id>", download_secure, name="download_secure"),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -1,42 +1,132 @@
+import asyncio
+import threading
+import time
+from collections import defaultdict
+
 from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 from django.conf import settings
-from ..models import Content
 from django.urls import reverse
 
-def broadcast_download(request_id, content_name, client_id, progress, content_id=None):
-    channel_layer = get_channel_layer()
-    group_name = f"downloads_{client_id}"
-
-    # 파일 다운로드 URL 생성
-    download_url = None
-    download_url = None
-    if content_id:
-        try:
-            content = Content.objects.get(id=content_id)
-
-            print(f"[broadcast] file name: {content.file.name}")
-            print(f"[broadcast] file url: {content.file.url}")
-            print(f"[broadcast] full url: {settings.SITE_DOMAIN}{content.file.url}")
-
-            if content.file:
-                # download_url = f"{settings.SITE_DOMAIN}{content.file.url}" / 기존: f"{settings.SITE_DOMAIN}/api/download-direct/{content.id}/"
-                download_url = reverse("download_direct", args=[content.id])
-            else:
-                print(f"[broadcast] Content({content_id}) 파일이 없음.")
-        except Content.DoesNotExist:
-            print(f"[broadcast] Content({content_id}) 존재하지 않음.")
-            pass
-    async_to_sync(channel_layer.group_send)(
-        group_name,
-        {
+from .score_cache import LRUCache
+
+
+class DownloadBroadcaster:
+    """
+    워커 프로세스 수명 동안 재사용하는 다운로드 진행률 브로드캐스터
+    - 다운로드 URL 은 콘텐츠당 한 번만 계산 (DB 조회 없이 job.content 사용, 최근 콘텐츠만 LRU 로 보관)
+    - 전용 이벤트 루프 하나로 group_send → 채널 레이어(Redis) 연결 재사용
+    - 같은 client 그룹의 이벤트는 모아서 group_send 한 번(download.progress_batch)으로 전송
+    - 그룹별 상태는 보낼 이벤트가 없는 그룹을 flush 할 때 버림 — 워커 수명 동안 client 수만큼 쌓이지 않도록
+    """
+
+    def __init__(self, channel_layer=None, max_batch=None, flush_interval=None):
+        self.channel_layer = channel_layer or get_channel_layer()
+        self.max_batch = max_batch or getattr(settings, 'DOWNLOAD_BROADCAST_MAX_BATCH', 20)
+        self.flush_interval = (
+            getattr(settings, 'DOWNLOAD_BROADCAST_FLUSH_INTERVAL', 0.5)
+            if flush_interval is None else flush_interval
+        )
+        self._loop = None
+        self._lock = threading.RLock()
+        self._pending = defaultdict(list)
+        self._last_flush = {}
+        self._urls = LRUCache(getattr(settings, 'DOWNLOAD_BROADCAST_URL_CACHE_SIZE', 10_000))
+
+    def download_url(self, content):
+        url = self._urls.get(content.id)
+        if url is None and content.file:
+            # 기존: f"{settings.SITE_DOMAIN}/api/download-direct/{content.id}/"
+            url = reverse("download_direct", args=[content.id])
+            self._urls.set(content.id, url)
+        return url
+
+    def publish(self, request_id, content, client_id, progress, status=None, flush=False, download_url=None):
+        """
+        이벤트를 그룹 버퍼에 넣고, 완료(100%)/flush 요청/배치 가득 참/시간 경과 시 전송
+        download_url 을 주면 기본(download_direct) 대신 사용 (클라이언트별 서명 URL 등)
+        """
+        group_name = f"downloads_{client_id}"
+        event = {
             "type":         "download.progress",
             "job_id":       request_id,
-            "status":       "in_progress" if progress < 100 else "success",
+            "status":       status or ("in_progress" if progress < 100 else "success"),
             "percent":      progress,
-            "content_name": content_name,
+            "content_name": content.name,
             "client_id":    client_id,
-            "content_id":   content_id,
-            "download_url": download_url,
+            "content_id":   content.id,
+            "download_url": download_url or self.download_url(content),
         }
-    )
\ No newline at end of file
+        with self._lock:
+            events = self._pending[group_name]
+            events.append(event)
+            last = self._last_flush.setdefault(group_name, time.monotonic())
+            if (
+                flush
+                or progress >= 100
+                or len(events) >= self.max_batch
+                or time.monotonic() - last >= self.flush_interval
+            ):
+                self._flush_group(group_name)
+
+    def flush(self):
+        # 이벤트가 남은 그룹은 전송, 이미 다 보낸(유휴) 그룹은 상태 정리
+        with self._lock:
+            for group_name in {*self._pending, *self._last_flush}:
+                self._flush_group(group_name)
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            if self._loop is not None:
+                self._loop.close()
+                self._loop = None
+
+    def _flush_group(self, group_name):
+        events = self._pending.pop(group_name, [])
+        if not events:
+            self._last_flush.pop(group_name, None)
+            return
+        self._last_flush[group_name] = time.monotonic()
+        if len(events) == 1:
+            message = events[0]
+        else:
+            message = {"type": "download.progress_batch", "events": events}
+        self._run(self.channel_layer.group_send(group_name, message))
+
+    def _run(self, coro):
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coro)
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster():
+    global _broadcaster
+    with _broadcaster_lock:
+        if _broadcaster is None:
+            _broadcaster = DownloadBroadcaster()
+        return _broadcaster
+
+
+def reset_broadcaster():
+    # 채널 레이어 설정이 바뀐 경우(테스트 등) 다음 호출 때 새로 만들도록
+    global _broadcaster
+    with _broadcaster_lock:
+        if _broadcaster is not None:
+            _broadcaster.close()
+        _broadcaster = None
+
+
+def broadcast_download(request_id, content_name, client_id, progress, content_id=None):
+    """
+    단발성 전송용 (기존 호출 호환) — 태스크에서는 get_broadcaster().publish() 사용
+    """
+    from ..models import Content
+
+    content = Content.objects.filter(id=content_id).first() if content_id else None
+    if content is None:
+        content = Content(id=content_id, name=content_name)
+    get_broadcaster().publish(request_id, content, client_id, progress, flush=True)
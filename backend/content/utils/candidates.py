@@ -0,0 +1,124 @@
+import uuid
+from dataclasses import dataclass
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+
+@dataclass(frozen=True)
+class Candidate:
+    """
+    get_best_content 점수 계산에 필요한 필드만 담은 Content 요약본 (캐시 저장용)
+    """
+    id: int
+    name: str
+    type: str
+    version: str
+    meta_info: dict
+    file_name: str
+
+    @property
+    def file_url(self):
+        return default_storage.url(self.file_name)
+
+
+def _cache_key(name):
+    # 이름에 공백/한글이 들어가도 안전한 키를 쓰기 위해 해시 사용
+    return f"content:candidates:{md5(name.encode()).hexdigest()}"
+
+
+def _exclude_originals(candidates):
+    # high/normal/low 타입이 있으면 original 제외
+    if any(c.type != 'original' for c in candidates):
+        return [c for c in candidates if c.type != 'original']
+    return candidates
+
+
+def load_candidates(names):
+    """
+    DB 에서 여러 name 의 후보 목록을 쿼리 1번으로 생성: {name: [Candidate, ...]}
+    """
+    from content.models import Content
+
+    rows = (
+        Content.objects
+        .filter(name__in=names)
+        .exclude(file='')  # 변환 중이라 아직 파일이 없는 variant 제외
+        .order_by('id')
+        .values_list('id', 'name', 'type', 'version', 'meta_info', 'file')
+    )
+    grouped = {name: [] for name in names}
+    for row in rows:
+        grouped[row[1]].append(Candidate(*row))
+    return {name: _exclude_originals(candidates) for name, candidates in grouped.items()}
+
+
+def _large_key(name):
+    # 후보가 CANDIDATE_CACHE_MAX_ROWS 보다 많은 이름 표시 (목록 캐시와 같은 수명)
+    return f"content:candidates:large:{md5(name.encode()).hexdigest()}"
+
+
+def get_candidates_many(names):
+    """
+    캐시에 있는 이름은 그대로, 없는 이름만 모아서 한 번에 DB 조회 후 캐시에 저장
+    후보가 CANDIDATE_CACHE_MAX_ROWS 보다 많은 이름은 대형 카탈로그 표시도 함께 저장 (get_scoring_candidates 용)
+    """
+    keys = {_cache_key(name): name for name in names}
+    cached = cache.get_many(keys)
+    result = {keys[key]: candidates for key, candidates in cached.items()}
+
+    missing = [name for name in names if name not in result]
+    if missing:
+        loaded = load_candidates(missing)
+        max_rows = getattr(settings, 'CANDIDATE_CACHE_MAX_ROWS', 500)
+        entries = {_cache_key(name): candidates for name, candidates in loaded.items()}
+        entries.update({
+            _large_key(name): True for name, candidates in loaded.items() if len(candidates) > max_rows
+        })
+        cache.set_many(entries, getattr(settings, 'CANDIDATE_CACHE_TIMEOUT', 300))
+        result.update(loaded)
+    return result
+
+
+def get_candidates(name):
+    return get_candidates_many([name])[name]
+
+
+def get_scoring_candidates(name, device_info):
+    """
+    fallback 없이 최선 1개만 고를 때의 후보 — 보통은 캐시된 전체 목록,
+    대형 카탈로그면 큰 목록을 읽고 전부 점수 계산하는 대신 이 디바이스에서 선택될 수 있는 후보만 SQL 로 조회
+    (fallback/배치 경로는 계속 캐시된 전체 목록 사용)
+    """
+    from .capabilities import prefilter_candidates
+
+    if cache.get(_large_key(name)):
+        candidates = prefilter_candidates(name, device_info)
+        if candidates is not None:
+            return candidates
+    return get_candidates(name)
+
+
+def _epoch_key(name):
+    return f"content:epoch:{md5(name.encode()).hexdigest()}"
+
+
+def get_catalog_epochs(names):
+    """
+    이름별 카탈로그 epoch — 해당 이름의 콘텐츠가 바뀔 때마다 새 값 (점수 메모이제이션 키)
+    카운터가 아닌 임의 토큰이라 캐시가 비워져도 이전 epoch 와 겹치지 않음
+    """
+    keys = {_epoch_key(name): name for name in names}
+    epochs = {keys[key]: epoch for key, epoch in cache.get_many(keys).items()}
+    for key, name in keys.items():
+        if name not in epochs:
+            token = uuid.uuid4().hex
+            epochs[name] = token if cache.add(key, token, timeout=None) else cache.get(key, token)
+    return epochs
+
+
+def invalidate_candidates(name):
+    # 후보 캐시와 함께 epoch 도 폐기 → 이 이름의 메모이즈된 점수는 더 이상 조회되지 않음
+    cache.delete_many([_cache_key(name), _large_key(name), _epoch_key(name)])
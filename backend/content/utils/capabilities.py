@@ -0,0 +1,117 @@
+"""
+meta_info(JSONField) 의 호환성 필드를 타입 있는 인덱스 컬럼으로 — 대형 카탈로그는 점수 계산 전에 SQL 로 후보를 줄임
+
+- chipset_family: required_chipset 의 '8' 앞부분 (compute_compatibility_score 의 family 비교와 같은 값)
+  required_chipset 이 문자열이 아니면(업로드 시 칩셋 미입력 → None) None — family 비교 대상 아님 (키가 없으면 '')
+- min_memory: 최소 메모리 (숫자)
+- resolution_height: resolution 문자열의 마지막 숫자 ('1080p' → 1080, '2560x1440' → 1440), 없으면 None
+"""
+import re
+from numbers import Real
+
+from django.db.models import Case, Exists, F, FloatField, Max, OuterRef, Q, Value, When, Window
+from django.db.models.functions import StrIndex
+
+from .score import PENALTY_FLOOR
+
+CAPABILITY_FIELDS = ['chipset_family', 'min_memory', 'resolution_height']
+BOUND_SLACK = 1e-9  # SQL/파이썬 부동소수 차이로 동점 후보가 빠지지 않도록
+DIGITS_RE = re.compile(r'\d+')
+
+
+def resolution_height(resolution):
+    if not isinstance(resolution, str):
+        return None
+    numbers = DIGITS_RE.findall(resolution)
+    return int(numbers[-1]) if numbers else None
+
+
+def extract_capabilities(meta_info):
+    meta = meta_info or {}
+    chipset = meta.get('required_chipset', '')
+    min_memory = meta.get('min_memory', 0)
+    return {
+        'chipset_family': chipset.split('8')[0] if isinstance(chipset, str) else None,
+        'min_memory': float(min_memory) if isinstance(min_memory, Real) else 0.0,
+        'resolution_height': resolution_height(meta.get('resolution')),
+    }
+
+
+def apply_capabilities(content):
+    for field, value in extract_capabilities(content.meta_info).items():
+        setattr(content, field, value)
+
+
+def _score_bounds(device_info):
+    """
+    타입 컬럼(+ meta_info 문자열 일치)으로 계산한 기본 점수의 (하한, 상한) SQL 식 — 실제 점수는 항상 그 사이
+    - chipset: 정확히 일치 10, family 포함 5, 아니면 0 (정확히 계산 — chipset_family 가 NULL 이면 family 불일치)
+    - memory: 컬럼만으로 정확히 계산
+    - resolution: 문자열이 같으면 10, 그 외에는 1080 디바이스만 최대 5 ('720' 포함 여부는 하한에서 무시)
+    디바이스 chipset/resolution 이 문자열이 아니면 (None == None 일치 등 SQL 로 비교하지 않고) 해당 항목은 0 ~ 10
+    """
+    chipset = device_info.get('chipset')
+    memory = device_info.get('memory', 0)
+    resolution = device_info.get('resolution')
+
+    if isinstance(chipset, str):
+        chipset_low = chipset_high = Case(
+            When(Q(meta_info__required_chipset=chipset), then=Value(10.0)),
+            When(Q(family_position__gt=0), then=Value(5.0)),
+            default=Value(0.0), output_field=FloatField(),
+        )
+    else:
+        chipset_low, chipset_high = Value(0.0), Value(10.0)
+    memory_score = Case(
+        When(min_memory__lte=memory - 2, then=Value(10.0)),
+        When(min_memory__lte=memory, then=Value(5.0)),
+        default=Value(0.0), output_field=FloatField(),
+    )
+    if isinstance(resolution, str):
+        same_resolution = Q(meta_info__resolution=resolution)
+        resolution_low = Case(When(same_resolution, then=Value(10.0)), default=Value(0.0), output_field=FloatField())
+        resolution_high = Case(
+            When(same_resolution, then=Value(10.0)),
+            default=Value(5.0 if '1080' in resolution else 0.0),
+            output_field=FloatField(),
+        )
+    else:
+        resolution_low, resolution_high = Value(0.0), Value(10.0)
+    memory_part = memory_score * Value(0.3)
+    return (
+        chipset_low * Value(0.4) + memory_part + resolution_low * Value(0.3),
+        chipset_high * Value(0.4) + memory_part + resolution_high * Value(0.3),
+    )
+
+
+def prefilter_candidates(name, device_info):
+    """
+    이 디바이스에서 최선이 될 수 있는 후보만 SQL 로 조회 (Candidate 목록, id 순)
+    penalty 는 PENALTY_FLOOR ~ 1 이므로 상한이 (하한 최댓값 × PENALTY_FLOOR) 보다 작은 후보는 절대 선택되지 않음
+    → select_best_content 결과는 전체 후보로 계산한 것과 같음 (fallback 목록에는 쓰지 않음)
+    디바이스 memory 가 숫자가 아니면 None (전체 후보 경로 사용)
+    """
+    from content.models import Content
+    from .candidates import Candidate
+
+    memory = device_info.get('memory', 0)
+    if not isinstance(memory, Real) or isinstance(memory, bool):
+        return None
+
+    low, high = _score_bounds(device_info)
+    has_variants = Exists(
+        Content.objects.filter(name=OuterRef('name')).exclude(type='original').exclude(file='')
+    )
+    rows = (
+        Content.objects
+        .filter(name=name)
+        .exclude(file='')
+        # high/normal/low 타입이 있으면 original 제외 (get_candidates 와 같은 규칙)
+        .filter(~Q(type='original') | ~has_variants)
+        .annotate(family_position=StrIndex(Value(device_info.get('chipset') or ''), F('chipset_family')))
+        .annotate(score_high=high, best_low=Window(Max(low)))
+        .filter(score_high__gte=F('best_low') * PENALTY_FLOOR - BOUND_SLACK)
+        .order_by('id')
+        .values_list('id', 'name', 'type', 'version', 'meta_info', 'file')
+    )
+    return [Candidate(*row) for row in rows]
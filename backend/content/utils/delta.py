@@ -0,0 +1,234 @@
+"""
+rsync 방식 바이너리 delta (이전 버전 → 새 버전 patch)
+
+- 이전 파일을 block_size 단위로 나눠 block 별 (weak rolling checksum, strong hash) 서명 생성
+- 새 파일을 1 byte 씩 밀며 weak checksum 비교 → 후보 위치만 strong hash 확인 → 일치하면 COPY, 아니면 literal
+  (weak checksum 은 numpy 누적합으로 구간 단위 일괄 계산, Python 루프는 후보 위치에서만 돔)
+- patch 형식 (zlib 압축 스트림):
+    header: MAGIC | source_size(Q) | target_size(Q) | block_size(I) | target sha256(32B)
+    ops:    b'C' start_block(I) block_count(I)   — 이전 파일의 block 복사
+            b'D' length(I) bytes                 — 새 데이터
+"""
+import hashlib
+import math
+import mmap
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b'CMSDELTA1'
+HEADER = struct.Struct('>QQI32s')
+COPY = struct.Struct('>cII')
+DATA = struct.Struct('>cI')
+
+# weak checksum 을 한 번에 계산하는 새 파일 구간 크기 (int64 배열 몇 개 → 구간 * 수십 bytes 메모리)
+SEGMENT_SIZE = 1024 * 1024
+MAX_LITERAL = 1024 * 1024
+
+
+def pick_block_size(source_size):
+    # rsync 처럼 파일 크기의 제곱근 근처, 1KB ~ 64KB
+    return min(max(int(math.isqrt(max(source_size, 1))) // 64 * 64, 1024), 64 * 1024)
+
+
+def _strong(block):
+    return hashlib.blake2b(block, digest_size=16).digest()
+
+
+def _weak_sums(window, block_size):
+    """
+    window 안의 모든 시작 위치 k 에 대해 rsync weak checksum (a + b << 16)
+    a = sum(x[k:k+B]), b = sum((B - i) * x[k+i])  (각각 mod 2^16)
+    """
+    x = window.astype(np.int64)
+    s1 = np.concatenate(([0], np.cumsum(x)))
+    s2 = np.concatenate(([0], np.cumsum(x * np.arange(len(x), dtype=np.int64))))
+    k = np.arange(len(x) - block_size + 1, dtype=np.int64)
+    a = s1[k + block_size] - s1[k]
+    b = (k + block_size) * a - (s2[k + block_size] - s2[k])
+    return (a & 0xffff) | ((b & 0xffff) << 16)
+
+
+def _map(f):
+    """
+    파일 전체를 메모리에 올리지 않고 numpy 로 보기 (빈 파일은 mmap 불가)
+    """
+    try:
+        return np.frombuffer(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), dtype=np.uint8)
+    except ValueError:
+        return np.zeros(0, dtype=np.uint8)
+
+
+def signature(source, block_size):
+    """
+    이전 파일의 block 서명: {(weak, strong): block index}, weak 값 배열(후보 필터용)
+    """
+    blocks = len(source) // block_size
+    index = {}
+    weaks = []
+    step = max(SEGMENT_SIZE // block_size, 1)
+    for first in range(0, blocks, step):
+        count = min(step, blocks - first)
+        rows = source[first * block_size:(first + count) * block_size].reshape(count, block_size).astype(np.int64)
+        a = rows.sum(axis=1)
+        b = (rows * np.arange(block_size, 0, -1, dtype=np.int64)).sum(axis=1)
+        weak = (a & 0xffff) | ((b & 0xffff) << 16)
+        weaks.append(weak)
+        for i, w in enumerate(weak.tolist()):
+            start = (first + i) * block_size
+            index.setdefault((w, _strong(source[start:start + block_size].tobytes())), first + i)
+    return index, (np.unique(np.concatenate(weaks)) if weaks else np.zeros(0, dtype=np.int64))
+
+
+class _PatchWriter:
+    def __init__(self, out):
+        self.out = out
+        self.compressor = zlib.compressobj(6)
+        self.pending_copy = None  # (start_block, count) — 연속된 block 복사는 하나로 합침
+
+    def write(self, data):
+        self.out.write(self.compressor.compress(data))
+
+    def copy(self, block):
+        if self.pending_copy and self.pending_copy[0] + self.pending_copy[1] == block:
+            self.pending_copy[1] += 1
+            return
+        self._flush_copy()
+        self.pending_copy = [block, 1]
+
+    def literal(self, data):
+        if not len(data):
+            return
+        self._flush_copy()
+        for start in range(0, len(data), MAX_LITERAL):
+            piece = data[start:start + MAX_LITERAL].tobytes()
+            self.write(DATA.pack(b'D', len(piece)))
+            self.write(piece)
+
+    def _flush_copy(self):
+        if self.pending_copy:
+            self.write(COPY.pack(b'C', *self.pending_copy))
+            self.pending_copy = None
+
+    def close(self):
+        self._flush_copy()
+        self.out.write(self.compressor.flush())
+
+
+def make_patch(source_path, target_path, out, block_size=None):
+    """
+    source → target patch 를 out(바이너리 파일 객체)에 기록. 반환: 통계 dict
+    """
+    with open(source_path, 'rb') as sf, open(target_path, 'rb') as tf:
+        source, target = _map(sf), _map(tf)
+        block_size = block_size or pick_block_size(len(source))
+        index, source_weaks = signature(source, block_size)
+
+        out.write(MAGIC)
+        writer = _PatchWriter(out)
+        target_sha256 = hashlib.sha256(target)
+        writer.write(HEADER.pack(len(source), len(target), block_size, target_sha256.digest()))
+
+        pos = literal_start = 0
+        copied = 0
+        last_start = len(target) - block_size  # block 이 온전히 들어가는 마지막 시작 위치
+        if source_weaks.size:
+            for seg_start in range(0, last_start + 1, SEGMENT_SIZE):
+                seg_end = min(seg_start + SEGMENT_SIZE, last_start + 1)
+                if seg_end <= pos:
+                    continue
+                weak = _weak_sums(target[seg_start:seg_end + block_size - 1], block_size)
+                for q in (np.flatnonzero(np.isin(weak, source_weaks)) + seg_start).tolist():
+                    if q < pos:
+                        continue
+                    block = index.get((int(weak[q - seg_start]), _strong(target[q:q + block_size].tobytes())))
+                    if block is None:
+                        continue
+                    writer.literal(target[literal_start:q])
+                    writer.copy(block)
+                    copied += block_size
+                    pos = literal_start = q + block_size
+        writer.literal(target[literal_start:])
+        writer.close()
+
+    return {
+        'source_size': len(source),
+        'target_size': len(target),
+        'block_size': block_size,
+        'copied_bytes': copied,
+        'literal_bytes': len(target) - copied,
+        'target_sha256': target_sha256.hexdigest(),
+    }
+
+
+class _Reader:
+    def __init__(self, f):
+        self.f = f
+        self.decompressor = zlib.decompressobj()
+        self.buffer = bytearray()
+
+    def read(self, size):
+        while len(self.buffer) < size:
+            chunk = self.f.read(64 * 1024)
+            if not chunk:
+                self.buffer += self.decompressor.flush()
+                break
+            self.buffer += self.decompressor.decompress(chunk)
+        if len(self.buffer) < size:
+            raise ValueError('truncated patch')
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def at_end(self):
+        if self.buffer:
+            return False
+        try:
+            self.read(1)
+        except ValueError:
+            return True
+        raise ValueError('trailing data in patch')
+
+
+def apply_patch(source_path, patch, out):
+    """
+    patch(파일 객체)를 source 에 적용해 out 에 기록, target sha256 검증 (불일치/손상 시 ValueError)
+    """
+    if patch.read(len(MAGIC)) != MAGIC:
+        raise ValueError('not a delta patch')
+    reader = _Reader(patch)
+    source_size, target_size, block_size, expected = HEADER.unpack(reader.read(HEADER.size))
+    digest = hashlib.sha256()
+    written = 0
+
+    with open(source_path, 'rb') as source:
+        source.seek(0, 2)
+        if source.tell() != source_size:
+            raise ValueError('source size mismatch')
+        while written < target_size:
+            op = reader.read(1)
+            if op == b'C':
+                start, count = struct.unpack('>II', reader.read(8))
+                source.seek(start * block_size)
+                remaining = count * block_size
+                while remaining:
+                    data = source.read(min(remaining, MAX_LITERAL))
+                    if not data:
+                        raise ValueError('copy beyond source')
+                    remaining -= len(data)
+                    digest.update(data)
+                    out.write(data)
+                    written += len(data)
+            elif op == b'D':
+                (length,) = struct.unpack('>I', reader.read(4))
+                data = reader.read(length)
+                digest.update(data)
+                out.write(data)
+                written += length
+            else:
+                raise ValueError('corrupt patch')
+
+    if written != target_size or not reader.at_end() or digest.digest() != expected:
+        raise ValueError('patch result mismatch')
+    return written
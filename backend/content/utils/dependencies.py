@@ -0,0 +1,175 @@
+"""
+ContentDependency 전이 폐쇄(transitive closure) + 설치 순서
+
+- 콘텐츠별 폐쇄를 캐시에 보관: content:deps:<epoch>:<id> → [필요한 content id, ...] (의존성 없으면 [])
+  간접 의존성까지, 먼저 설치해야 하는 것부터(위상 정렬) — 캐시에 없는 콘텐츠만 도달 가능한 부분 그래프를 읽어 계산
+- 의존성이 바뀌면(ContentDependency 저장/삭제 시그널) epoch 를 폐기 → 이전 epoch 의 항목은 더 이상 조회되지 않고 만료
+- 사이클은 저장 시점(check_dependency)에 막으므로 조회 쪽은 DAG 라고 가정
+  검사~INSERT 는 전역 잠금(dependency_lock) 안에서 — 동시에 A→B, B→A 가 각각 검사를 통과해 둘 다 저장되지 않도록
+"""
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+
+EPOCH_KEY = 'content:dependencies:epoch'
+LOCK_KEY = 'content:dependencies:lock'
+LOCK_POLL_INTERVAL = 0.05
+
+
+class DependencyCycleError(ValidationError):
+    pass
+
+
+def load_graph():
+    """
+    직접 의존성 전체를 쿼리 1번으로: {content_id: [required_id, ...]}
+    """
+    from content.models import ContentDependency
+
+    graph = {}
+    rows = ContentDependency.objects.order_by('id').values_list('content_id', 'required_id')
+    for content_id, required_id in rows:
+        graph.setdefault(content_id, []).append(required_id)
+    return graph
+
+
+def load_subgraph(content_ids):
+    """
+    content_ids 에서 도달 가능한 직접 의존성만: {content_id: [required_id, ...]} — 깊이마다 쿼리 1번
+    """
+    from content.models import ContentDependency
+
+    graph, frontier, seen = {}, set(content_ids), set(content_ids)
+    while frontier:
+        rows = (
+            ContentDependency.objects.filter(content_id__in=frontier)
+            .order_by('id').values_list('content_id', 'required_id')
+        )
+        frontier = set()
+        for content_id, required_id in rows:
+            graph.setdefault(content_id, []).append(required_id)
+            if required_id not in seen:
+                seen.add(required_id)
+                frontier.add(required_id)
+    return graph, seen
+
+
+def install_order(graph, root):
+    """
+    root 가 (간접적으로) 의존하는 콘텐츠를 설치 순서대로 (의존되는 것이 먼저, root 제외)
+    재귀 대신 스택으로 후위 순회 — 깊은 체인에서도 안전
+    """
+    order, done, visiting = [], {root}, {root}
+    stack = [(root, iter(graph.get(root, ())))]
+    while stack:
+        node, children = stack[-1]
+        for child in children:
+            if child not in done and child not in visiting:
+                visiting.add(child)
+                stack.append((child, iter(graph.get(child, ()))))
+                break
+        else:
+            stack.pop()
+            visiting.discard(node)
+            done.add(node)
+            if node != root:
+                order.append(node)
+    return order
+
+
+def _epoch():
+    # 카운터가 아닌 임의 토큰 — 캐시가 비워져도 이전 epoch 와 겹치지 않음 (utils.candidates 와 같은 방식)
+    token = uuid.uuid4().hex
+    return token if cache.add(EPOCH_KEY, token, timeout=None) else cache.get(EPOCH_KEY, token)
+
+
+def _closure_key(epoch, content_id):
+    return f"content:deps:{epoch}:{content_id}"
+
+
+def get_closures(content_ids):
+    """
+    콘텐츠별 전이 폐쇄 {content_id: [required_id, ...]} (의존성 없으면 [])
+    캐시 조회는 get_many 한 번, 없는 콘텐츠만 부분 그래프를 읽어 계산 — 함께 읽힌 콘텐츠의 폐쇄도 저장
+    """
+    epoch = _epoch()
+    keys = {_closure_key(epoch, content_id): content_id for content_id in set(content_ids)}
+    closures = {keys[key]: ids for key, ids in cache.get_many(keys).items()}
+    missing = [content_id for content_id in keys.values() if content_id not in closures]
+    if missing:
+        graph, reachable = load_subgraph(missing)
+        computed = {content_id: install_order(graph, content_id) for content_id in reachable}
+        cache.set_many(
+            {_closure_key(epoch, content_id): ids for content_id, ids in computed.items()},
+            getattr(settings, 'DEPENDENCY_CACHE_TIMEOUT', 3600),
+        )
+        closures.update((content_id, computed[content_id]) for content_id in missing)
+    return closures
+
+
+def invalidate_closure():
+    cache.delete(EPOCH_KEY)
+
+
+def resolve_dependencies(content_ids):
+    """
+    여러 콘텐츠의 전이 의존성 (설치 순서): {content_id: [required_id, ...]} — 의존성 없는 콘텐츠는 제외
+    """
+    closures = get_closures(content_ids)
+    return {content_id: closures[content_id] for content_id in content_ids if closures[content_id]}
+
+
+def missing_dependencies(content_ids, client_id):
+    """
+    client 가 아직 받지 않은 (간접 포함) 의존성: {content_id: [missing_id, ...]} (설치 순서)
+    보유 여부는 필요한 id 전체에 대해 쿼리 1번
+    """
+    from content.utils.score import get_satisfied_ids
+
+    dependencies = resolve_dependencies(content_ids)
+    required = {req_id for ids in dependencies.values() for req_id in ids}
+    satisfied = get_satisfied_ids(required, client_id) if required else set()
+    return {
+        content_id: [req_id for req_id in ids if req_id not in satisfied]
+        for content_id, ids in dependencies.items()
+    }
+
+
+@contextmanager
+def dependency_lock():
+    """
+    의존성 쓰기 전역 잠금 (cache.add 는 원자적) — 사이클 검사와 INSERT 를 이 안에서 같은 트랜잭션으로
+    DEPENDENCY_LOCK_TIMEOUT 초 안에 못 잡으면 TimeoutError, 보유자가 죽어도 그 시간이 지나면 만료
+    """
+    timeout = getattr(settings, 'DEPENDENCY_LOCK_TIMEOUT', 10)
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + timeout
+    while not cache.add(LOCK_KEY, token, timeout):
+        if time.monotonic() >= deadline:
+            raise TimeoutError('의존성 잠금을 얻지 못했습니다.')
+        time.sleep(LOCK_POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        # 만료 후 다른 요청이 잡은 잠금은 지우지 않음
+        if cache.get(LOCK_KEY) == token:
+            cache.delete(LOCK_KEY)
+
+
+def check_dependency(content_id, required_id, graph=None):
+    """
+    content → required 의존성을 추가해도 사이클이 생기지 않는지 확인 (캐시가 아닌 DB 기준, graph 를 넘기면 그 그래프 기준)
+    required 가 (간접적으로) content 에 의존하고 있으면 DependencyCycleError
+    """
+    if content_id == required_id:
+        raise DependencyCycleError('콘텐츠는 자기 자신에 의존할 수 없습니다.', code='dependency_cycle')
+    if graph is None:
+        graph = load_graph()
+    if content_id in install_order(graph, required_id):
+        raise DependencyCycleError(
+            f'의존성 사이클: {required_id} 이(가) 이미 {content_id} 에 의존합니다.', code='dependency_cycle',
+        )
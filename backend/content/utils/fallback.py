@@ -1,17 +1,29 @@
-from content.models import DownloadHistory
+FAILURE_RATE_LIMIT = 0.5
 
-def get_fallback_content(scored_contents: list, failed_content_id: int, client_id: str, requested_name: str):
+
+def rank_fallbacks(scored_contents: list, client_id: str, requested_name: str, exclude_ids=(),
+                   counts=None, dependencies=None, satisfied=None):
     """
+    fallback 으로 쓸 수 있는 후보 전체를 점수순으로 — 클라이언트가 실패 시 서버 재요청 없이 다음 후보로 넘어갈 수 있도록
     - scored_contents: [(score, Content)] 점수순 정렬
-    - failed_content_id: 실패한 콘텐츠 ID
-    - client_id: 다운로드 요청한 클라이언트
-    - requested_name: 요청한 콘텐츠 이름
+    - exclude_ids: 제외할 콘텐츠 ID (실패한 콘텐츠, 이미 응답한 콘텐츠)
+    - counts / dependencies / satisfied: 미리 조회한 값 (없으면 여기서 한 번씩 조회)
     """
-    from content.utils.score import get_dependent_contents
+    from content.utils.score import get_dependency_map, get_download_counts, get_satisfied_ids
 
+    candidate_ids = [c.id for _, c in scored_contents]
+    if counts is None:
+        counts = get_download_counts(candidate_ids, client_id)
+    if dependencies is None:
+        dependencies = get_dependency_map(candidate_ids)
+    if satisfied is None:
+        required = {req_id for ids in dependencies.values() for req_id in ids}
+        satisfied = get_satisfied_ids(required, client_id) if required else set()
+
+    ranked = []
     for score, content in scored_contents:
         # 동일 콘텐츠는 제외
-        if content.id == failed_content_id:
+        if content.id in exclude_ids:
             continue
 
         # 요청한 name과 다른 콘텐츠는 제외 (안전성 보장)
@@ -19,20 +31,28 @@ def get_fallback_content(scored_contents: list, failed_content_id: int, client_i
             continue
 
         # 실패율 50% 이상이면 제외
-        total = DownloadHistory.objects.filter(content=content, client_id=client_id).count()
-        failed = DownloadHistory.objects.filter(content=content, client_id=client_id, success=False).count()
-        if total > 0 and failed / total >= 0.5:
+        total, failed = counts.get(content.id, (0, 0))
+        if total > 0 and failed / total >= FAILURE_RATE_LIMIT:
             continue
 
-        # 의존성 있는 경우 필수 콘텐츠 존재 여부 검사
-        required_ids = get_dependent_contents(content)
-        if required_ids:
-            for req_id in required_ids:
-                if not DownloadHistory.objects.filter(content_id=req_id, client_id=client_id, success=True).exists():
-                    break  # 의존 콘텐츠 미보유 → 이 콘텐츠도 사용 불가
-            else:
-                return content  # 의존성 만족 → fallback 성공
-        else:
-            return content  # 의존성 없음 → fallback 성공
-
-    return None  # 모든 후보 실패
\ No newline at end of file
+        # 의존성(간접 포함) 있는 경우 필수 콘텐츠 존재 여부 검사 (미보유 시 이 콘텐츠도 사용 불가)
+        if all(req_id in satisfied for req_id in dependencies.get(content.id, [])):
+            ranked.append(content)
+
+    return ranked
+
+
+def get_fallback_content(scored_contents: list, failed_content_id: int, client_id: str, requested_name: str,
+                         counts=None, dependencies=None, satisfied=None):
+    """
+    - scored_contents: [(score, Content)] 점수순 정렬
+    - failed_content_id: 실패한 콘텐츠 ID
+    - client_id: 다운로드 요청한 클라이언트
+    - requested_name: 요청한 콘텐츠 이름
+    - counts / dependencies / satisfied: 배치 처리 시 미리 조회한 값 (없으면 여기서 한 번씩 조회)
+    """
+    ranked = rank_fallbacks(
+        scored_contents, client_id, requested_name, exclude_ids={failed_content_id},
+        counts=counts, dependencies=dependencies, satisfied=satisfied,
+    )
+    return ranked[0] if ranked else None  # 없으면 모든 후보 실패
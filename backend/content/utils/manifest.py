@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .paths import sidecar_base
+from .ranges import file_etag
+
+MANIFEST_VERSION = 1
+# blob 옆에 저장되는 manifest 사이드카: blobs/<aa>/<sha>.manifest.json (dedup 이전 파일은 <파일명>.manifest.json)
+# — 같은 blob 을 가리키는 원본/variant 링크가 공유하므로 blob 당 한 번만 해시
+MANIFEST_SUFFIX = '.manifest.json'
+
+
+def manifest_name(file_name):
+    return f"{sidecar_base(file_name)}{MANIFEST_SUFFIX}"
+
+
+def _chunk_size(chunk_size=None):
+    return chunk_size or getattr(settings, 'MANIFEST_CHUNK_SIZE', 4 * 1024 * 1024)
+
+
+def build_manifest(file_name, storage=None, chunk_size=None):
+    """
+    고정 크기 chunk 별 offset/length/sha256 + 전체 sha256 계산 후 사이드카에 기록
+    chunk 단위로 읽어 메모리 사용량은 chunk_size 로 고정
+    """
+    storage = storage or default_storage
+    chunk_size = _chunk_size(chunk_size)
+    path = storage.path(file_name)
+    stat = os.stat(path)
+
+    chunks = []
+    whole = hashlib.sha256()
+    with open(path, 'rb') as f:
+        offset = 0
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            whole.update(data)
+            chunks.append({
+                'index': len(chunks),
+                'offset': offset,
+                'length': len(data),
+                'sha256': hashlib.sha256(data).hexdigest(),
+            })
+            offset += len(data)
+
+    # 링크마다 다른 파일 이름은 저장하지 않음 (get_manifest 가 붙임)
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'size': stat.st_size,
+        'mtime': int(stat.st_mtime),
+        'etag': file_etag(stat.st_size, stat.st_mtime),
+        'chunk_size': chunk_size,
+        'algorithm': 'sha256',
+        'sha256': whole.hexdigest(),
+        'chunks': chunks,
+    }
+
+    # 다른 워커가 읽는 중일 수 있으므로 임시 파일에 쓰고 교체
+    sidecar = storage.path(manifest_name(file_name))
+    tmp = f"{sidecar}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+    os.replace(tmp, sidecar)
+    return manifest
+
+
+def load_manifest(file_name, storage=None, chunk_size=None):
+    """
+    사이드카 manifest 가 현재 파일(크기/mtime)과 chunk 크기에 맞으면 반환, 없거나 오래됐으면 None
+    """
+    storage = storage or default_storage
+    try:
+        stat = os.stat(storage.path(file_name))
+        with open(storage.path(manifest_name(file_name))) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    fresh = (
+        manifest.get('version') == MANIFEST_VERSION
+        and manifest.get('size') == stat.st_size
+        and manifest.get('mtime') == int(stat.st_mtime)
+        and manifest.get('chunk_size') == _chunk_size(chunk_size)
+    )
+    return manifest if fresh else None
+
+
+def get_manifest(file_name, storage=None, chunk_size=None):
+    """
+    캐시된 manifest 반환, 없거나 파일이 바뀌었으면 다시 생성
+    """
+    manifest = (
+        load_manifest(file_name, storage, chunk_size)
+        or build_manifest(file_name, storage, chunk_size)
+    )
+    return {**manifest, 'file': file_name}
@@ -0,0 +1,24 @@
+from django.core.cache import cache
+
+KEY_PREFIX = 'metrics'
+
+# 다운로드 스케줄링 관련 누적 카운터
+DOWNLOAD_COUNTERS = ['reclaimed_slots', 'lease_lost']
+
+
+def _key(name):
+    return f"{KEY_PREFIX}:{name}"
+
+
+def incr(name, amount=1):
+    """
+    누적 카운터 증가 (cache 공유 → 워커/프로세스 합산). 증가 후 값 반환
+    """
+    key = _key(name)
+    cache.add(key, 0, timeout=None)
+    return cache.incr(key, amount)
+
+
+def get_counters(names):
+    values = cache.get_many([_key(name) for name in names])
+    return {name: values.get(_key(name), 0) for name in names}
@@ -1,6 +1,12 @@
-from django.conf import settings
+import posixpath
+import re
 from pathlib import Path
 
+from django.conf import settings
+
+BLOB_DIR = 'blobs'
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
 def rel_media_path(absolute_or_field_path: str) -> str:
     # FileField.name은 보통 'uploads/xxx.bin' 형태. 절대경로가 들어오면 MEDIA_ROOT 기준 상대경로로 환원.
     p = Path(absolute_or_field_path)
@@ -9,3 +15,24 @@ def rel_media_path(absolute_or_field_path: str) -> str:
         return str(rel).replace("\\", "/")
     except Exception:
         return str(absolute_or_field_path).replace("media/", "").lstrip("/").replace("\\", "/")
+
+
+def link_digest(name):
+    # dedup 링크(uploads/<sha256>/<파일명>) 의 sha256 — dedup 이전에 저장된 파일이면 None
+    parts = name.split('/')
+    if len(parts) >= 2 and DIGEST_RE.match(parts[-2]):
+        return parts[-2]
+    return None
+
+
+def blob_name(digest):
+    return posixpath.join(BLOB_DIR, digest[:2], digest)
+
+
+def sidecar_base(file_name):
+    """
+    파일에서 파생되는 사이드카(압축본 등)의 기준 이름 — dedup 링크면 blob(blobs/<aa>/<sha256>) 기준
+    같은 blob 을 가리키는 링크(원본과 바이트가 같은 variant 등)는 사이드카 하나를 공유 → blob 당 한 번만 생성
+    """
+    digest = link_digest(file_name)
+    return blob_name(digest) if digest else file_name
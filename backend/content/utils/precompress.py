@@ -0,0 +1,189 @@
+"""
+미리 압축해 둔 파일(사이드카) — 전송 시 Accept-Encoding 에 맞는 것을 골라 그대로 내보냄
+blob 기준 blobs/<aa>/<sha>.gz / .zst / .br (zstd/brotli 는 해당 패키지가 설치돼 있을 때만)
+— 같은 blob 을 가리키는 원본/variant 링크가 공유하므로 blob 당 한 번만 압축 (dedup 이전 파일은 <파일명>.gz 등)
+"""
+import mimetypes
+import os
+import uuid
+import zlib
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .paths import sidecar_base
+
+try:
+    import zstandard
+except ImportError:  # 선택 의존성
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # 선택 의존성
+    brotli = None
+
+SUFFIXES = {'gzip': '.gz', 'zstd': '.zst', 'br': '.br'}
+
+# 이미 압축된 형식 — 다시 압축해도 거의 줄지 않음
+INCOMPRESSIBLE_TYPES = (
+    'image/png', 'image/jpeg', 'image/gif', 'image/webp', 'image/avif',
+    'video/', 'audio/',
+    'application/zip', 'application/gzip', 'application/x-7z-compressed', 'application/x-rar-compressed',
+    'application/vnd.android.package-archive',
+)
+SAMPLE_SIZE = 256 * 1024
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def encoded_name(file_name, encoding):
+    return f"{sidecar_base(file_name)}{SUFFIXES[encoding]}"
+
+
+def sibling_names(file_name):
+    return [encoded_name(file_name, encoding) for encoding in SUFFIXES]
+
+
+class _Gzip:
+    def __init__(self):
+        self.compressor = zlib.compressobj(9, zlib.DEFLATED, 31)  # 31: gzip 헤더
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+
+class _Zstd:
+    def __init__(self):
+        self.compressor = zstandard.ZstdCompressor(level=19).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self.compressor = brotli.Compressor(quality=11)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+def available_encodings():
+    """
+    설정(PRECOMPRESS_ENCODINGS) 중 이 환경에서 만들 수 있는 encoding → 압축기 클래스
+    """
+    codecs = {'gzip': _Gzip, 'zstd': _Zstd if zstandard else None, 'br': _Brotli if brotli else None}
+    wanted = getattr(settings, 'PRECOMPRESS_ENCODINGS', ['gzip', 'zstd', 'br'])
+    return {encoding: codecs[encoding] for encoding in wanted if codecs.get(encoding)}
+
+
+def is_compressible(file_name, path):
+    """
+    확장자로 이미 압축된 형식을 거르고, 앞부분 샘플을 빠르게 압축해 봐서 줄어드는 경우만 True
+    """
+    content_type, _ = mimetypes.guess_type(file_name)
+    if content_type and content_type.startswith(INCOMPRESSIBLE_TYPES):
+        return False
+    with open(path, 'rb') as f:
+        sample = f.read(SAMPLE_SIZE)
+    if not sample:
+        return False
+    return len(zlib.compress(sample, 1)) < len(sample) * (1 - _min_saving())
+
+
+def _min_saving():
+    return getattr(settings, 'PRECOMPRESS_MIN_SAVING', 0.1)
+
+
+def _compress_file(path, out_path, codec):
+    """
+    chunk 단위로 압축해 임시 파일에 쓰고 교체 (읽는 중인 워커/Nginx 가 반쯤 쓴 파일을 보지 않도록)
+    """
+    tmp = f"{out_path}.{uuid.uuid4().hex}.tmp"
+    compressor = codec()
+    try:
+        with open(path, 'rb') as src, open(tmp, 'wb') as dst:
+            while True:
+                chunk = src.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                dst.write(compressor.compress(chunk))
+            dst.write(compressor.flush())
+        os.replace(tmp, out_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return os.path.getsize(out_path)
+
+
+def precompress(file_name, storage=None):
+    """
+    압축 가능한 파일이면 encoding 별 사이드카 생성. 반환: {encoding: 압축 크기}
+    원본보다 PRECOMPRESS_MIN_SAVING 이상 줄지 않은 사이드카는 지움
+    같은 blob 의 사이드카가 이미 있으면(다른 링크에서 만든 것) 다시 압축하지 않고 크기만 반환
+    """
+    storage = storage or default_storage
+    path = storage.path(file_name)
+    if not is_compressible(file_name, path):
+        return {}
+
+    size = os.path.getsize(path)
+    encodings = {}
+    for encoding, codec in available_encodings().items():
+        out_path = storage.path(encoded_name(file_name, encoding))
+        if os.path.exists(out_path) and sidecar_base(file_name) != file_name:
+            encodings[encoding] = os.path.getsize(out_path)  # 교체(os.replace)로만 생기므로 완성본
+            continue
+        compressed = _compress_file(path, out_path, codec)
+        if compressed < size * (1 - _min_saving()):
+            encodings[encoding] = compressed
+        else:
+            os.remove(out_path)
+    return encodings
+
+
+def _parse_accept_encoding(header):
+    """
+    Accept-Encoding → {coding: q}
+    """
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(header, encodings):
+    """
+    클라이언트가 받을 수 있는(q > 0) encoding 중 가장 작은 사이드카 선택, 없으면 None(원본 그대로)
+    encodings: {encoding: 압축 크기}
+    """
+    if not header or not encodings:
+        return None
+    accepted = _parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0)
+    candidates = [
+        (size, encoding) for encoding, size in encodings.items()
+        if encoding in SUFFIXES and accepted.get(encoding, wildcard) > 0
+    ]
+    return min(candidates)[1] if candidates else None
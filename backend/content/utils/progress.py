@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+
+
+class ProgressThrottle:
+    """
+    다운로드 진행률 저장/브로드캐스트 병합
+    - 정수 percent 가 바뀌었거나, 마지막 전송 후 interval 초가 지났을 때만 emit
+    - 100% 는 항상 emit (finish() 로 마지막에 보장)
+    - DOWNLOAD_PROGRESS_COALESCE = False 면 매 chunk 마다 emit (기존 동작)
+    """
+
+    def __init__(self, interval=None, coalesce=None, clock=time.monotonic):
+        self.interval = getattr(settings, 'DOWNLOAD_PROGRESS_INTERVAL', 1.0) if interval is None else interval
+        self.coalesce = getattr(settings, 'DOWNLOAD_PROGRESS_COALESCE', True) if coalesce is None else coalesce
+        self.clock = clock
+        self.last_percent = None
+        self.last_at = None
+
+    def should_emit(self, percent):
+        now = self.clock()
+        emit = (
+            not self.coalesce
+            or percent != self.last_percent
+            or now - self.last_at >= self.interval
+        )
+        if emit:
+            self.last_percent, self.last_at = percent, now
+        return emit
+
+    def finish(self):
+        """
+        100% 가 아직 전송되지 않았으면 True (호출 측에서 100% emit)
+        """
+        if self.last_percent == 100:
+            return False
+        self.last_percent, self.last_at = 100, self.clock()
+        return True
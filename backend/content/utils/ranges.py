@@ -0,0 +1,158 @@
+import os
+import re
+from uuid import uuid4
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+RANGE_SPEC_RE = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+
+# 한 요청에서 허용하는 range 개수 (너무 잘게 쪼갠 요청은 무시하고 전체 응답)
+MAX_RANGES = 16
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def file_etag(size, mtime):
+    """
+    size/mtime 기반 strong ETag — nginx 정적 파일 ETag 와 같은 형식이라
+    X-Accel-Redirect 로 넘겨도 클라이언트가 가진 validator(If-Range/If-None-Match)가 그대로 유효
+    """
+    return quote_etag(f"{int(mtime):x}-{size:x}")
+
+
+def parse_byte_ranges(header, size):
+    """
+    Range 헤더 → [(start, end)] (end 포함, 정렬 + 겹치거나 붙은 범위는 병합)
+    - 형식이 잘못됐거나 범위가 너무 많으면 None (Range 무시 → 전체 응답)
+    - 만족 가능한 범위가 하나도 없으면 RangeNotSatisfiable (416)
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+
+    ranges = []
+    for part in spec.split(','):
+        match = RANGE_SPEC_RE.match(part)
+        if not match or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+        if not first:
+            # suffix: 마지막 N bytes
+            length = int(last)
+            if length and size:
+                ranges.append((max(size - length, 0), size - 1))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        end = int(last) if last else size - 1
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiable
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    ranges.sort()
+    merged = [list(ranges[0])]
+    for start, end in ranges[1:]:
+        if start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+
+def _read_range(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _part_header(boundary, content_type, start, end, size):
+    return (
+        f"--{boundary}\r\nContent-Type: {content_type}\r\n"
+        f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+    ).encode()
+
+
+def _multipart(path, ranges, size, content_type, boundary):
+    for start, end in ranges:
+        yield _part_header(boundary, content_type, start, end, size)
+        yield from _read_range(path, start, end)
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+
+def _if_range_matches(request, etag, last_modified):
+    """
+    If-Range 가 없거나 현재 파일과 일치하면 True (불일치 → Range 무시하고 전체 전송)
+    """
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(last_modified)
+
+
+def ranged_file_response(request, path, content_type='application/octet-stream', etag=None, last_modified=None,
+                         size=None):
+    """
+    파일을 Range 요청에 맞게 응답
+    - Range 없음/무시: 200 + 전체 (FileResponse, wsgi.file_wrapper 사용 가능)
+    - range 1개: 206 + Content-Range
+    - range 여러 개: 206 multipart/byteranges
+    - 범위 밖: 416 + Content-Range: bytes */size
+    """
+    if size is None or last_modified is None:
+        stat = os.stat(path)
+        size, last_modified = stat.st_size, stat.st_mtime
+    etag = etag or file_etag(size, last_modified)
+
+    ranges = None
+    header = request.headers.get('Range')
+    if header and _if_range_matches(request, etag, last_modified):
+        try:
+            ranges = parse_byte_ranges(header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{size}"
+            response['Accept-Ranges'] = 'bytes'
+            return response
+
+    if ranges is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(_read_range(path, start, end), status=206, content_type=content_type)
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        boundary = uuid4().hex
+        length = sum(
+            len(_part_header(boundary, content_type, start, end, size)) + (end - start + 1) + 2
+            for start, end in ranges
+        ) + len(f"--{boundary}--\r\n")
+        response = StreamingHttpResponse(
+            _multipart(path, ranges, size, content_type, boundary),
+            status=206, content_type=f"multipart/byteranges; boundary={boundary}",
+        )
+        response['Content-Length'] = str(length)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
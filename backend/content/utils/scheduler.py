@@ -0,0 +1,230 @@
+import time
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+# 우선순위 tier 사이 간격(초) — 같은 tier 안에서는 requested_at 순
+TIER_SPAN = 10 ** 10
+
+# reserve 1회에 살펴보는 대기열 앞부분 길이 (예산에 막힌 대용량 job 뒤 backfill 범위)
+RESERVE_LOOKAHEAD = 128
+
+POLICY_FIFO = 'fifo'
+POLICY_WEIGHTED = 'weighted'
+
+# 대기열에 추가 + job 비용(bytes) 기록: 이미 슬롯을 점유(dispatch)한 job 은 다시 넣지 않음
+ENQUEUE_SCRIPT = """
+if redis.call('ZSCORE', KEYS[2], ARGV[1]) then
+  return 0
+end
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[3])
+return redis.call('ZADD', KEYS[1], 'NX', ARGV[2], ARGV[1])
+"""
+
+# 점수 낮은 순으로 꺼내 active 에 등록(score = 예약 시각 ARGV[4]) — 원자적으로 실행
+# 슬롯 수(ARGV[1]) 와 대용량 job 의 동시 진행 bytes 예산(ARGV[2], 0 이면 무제한) 을 함께 지킴
+# - 비용 0 인 작은 job 은 슬롯만 있으면 실행, 대용량 job 은 예산 안이거나 실행 중인 대용량 job 이 없을 때만
+# - 예산에 막힌 대용량 job 은 자리를 지키고, 그 뒤(ARGV[3] 개까지)의 작은 job 만 먼저 실행(backfill)
+#   → 대용량 job 끼리는 점수 순서 유지, 작은 job 은 대용량 job 뒤에 묶이지 않음
+RESERVE_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local budget = tonumber(ARGV[2])
+local running = redis.call('ZCARD', KEYS[2])
+local used = tonumber(redis.call('GET', KEYS[4]) or '0')
+local ids = {}
+if running >= limit then
+  return ids
+end
+local blocked = false
+for _, id in ipairs(redis.call('ZRANGE', KEYS[1], 0, tonumber(ARGV[3]) - 1)) do
+  local cost = tonumber(redis.call('HGET', KEYS[3], id) or '0')
+  local fits = cost == 0 or (not blocked and (budget <= 0 or used == 0 or used + cost <= budget))
+  if fits then
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('ZADD', KEYS[2], ARGV[4], id)
+    running = running + 1
+    used = used + cost
+    ids[#ids + 1] = id
+    if running >= limit then
+      break
+    end
+  else
+    blocked = true
+  end
+end
+redis.call('SET', KEYS[4], used)
+return ids
+"""
+
+# 슬롯 반환 + 사용 중 bytes 차감 (이미 반환된 job 이면 아무것도 안 함)
+RELEASE_SCRIPT = """
+if redis.call('ZREM', KEYS[2], ARGV[1]) == 0 then
+  return 0
+end
+local used = tonumber(redis.call('GET', KEYS[4]) or '0') - tonumber(redis.call('HGET', KEYS[3], ARGV[1]) or '0')
+redis.call('HDEL', KEYS[3], ARGV[1])
+redis.call('SET', KEYS[4], math.max(used, 0))
+return 1
+"""
+
+
+@lru_cache(maxsize=None)
+def _client(url):
+    return redis.Redis.from_url(url)
+
+
+def get_redis():
+    return _client(getattr(settings, 'DOWNLOAD_SCHEDULER_REDIS_URL', settings.REDIS_URL))
+
+
+def retry_ready():
+    # 재시도 대기(not_before) 가 끝났거나 대기 중이 아닌 job
+    return Q(not_before__isnull=True) | Q(not_before__lte=timezone.now())
+
+
+def job_score(priority, requested_at):
+    return -priority * TIER_SPAN + requested_at.timestamp()
+
+
+def weighted_job_score(priority, requested_at, size_bytes, aging=None, bytes_per_second=None):
+    """
+    weighted 정책 점수(낮을수록 먼저, 단위: 초)
+    - 우선순위 1단계 = aging 초 만큼 먼저 요청한 것과 같음 → 오래 기다린 free job 도 결국 premium 보다 앞섬
+    - 크기/bytes_per_second 초 만큼 뒤로 → 같은 tier 안에서는 짧은 job 우선
+    점수가 요청 시각 기준의 고정값이라 sorted set 에 그대로 저장 가능 (대기 시간에 따라 다시 계산할 필요 없음)
+    """
+    aging = getattr(settings, 'DOWNLOAD_AGING_SECONDS', 300) if aging is None else aging
+    if bytes_per_second is None:
+        bytes_per_second = getattr(settings, 'DOWNLOAD_SHORT_JOB_BYTES_PER_SECOND', 10 * 1024 * 1024)
+    return requested_at.timestamp() - priority * aging + size_bytes / bytes_per_second
+
+
+class RedisDownloadScheduler:
+    """
+    DownloadJob 디스패치용 Redis 스케줄러 (DB 행은 영속 기록, Redis 는 대기열/슬롯 관리)
+    - queue: sorted set, score 는 정책에 따라
+        fifo: (priority, requested_at) — 기존 순서, 개수 제한만
+        weighted: 우선순위 aging + 짧은 job 우선, 대용량 job 동시 진행 bytes 예산(DOWNLOAD_BYTE_BUDGET) 적용
+    - active: 슬롯을 점유한 job id (sorted set, score 는 예약 시각), reserve 는 Lua 로 원자 실행 → 초과 디스패치/중복 디스패치 없음
+    """
+
+    def __init__(self, client=None, limit=None, prefix='downloads', policy=None, byte_budget=None):
+        self.client = client or get_redis()
+        self.limit = limit or getattr(settings, 'DOWNLOAD_CONCURRENCY_LIMIT', 3)
+        self.policy = policy or getattr(settings, 'DOWNLOAD_SCHEDULING_POLICY', POLICY_FIFO)
+        if self.policy not in (POLICY_FIFO, POLICY_WEIGHTED):
+            raise ValueError(f"unknown download scheduling policy: {self.policy}")
+        if byte_budget is None:
+            byte_budget = getattr(settings, 'DOWNLOAD_BYTE_BUDGET', 0)
+        self.byte_budget = byte_budget if self.policy == POLICY_WEIGHTED else 0
+        self.queue_key = f"{prefix}:queue"
+        self.active_key = f"{prefix}:reserved"  # 이전 버전의 set 키(:active)와 타입이 달라 이름 변경
+        self.cost_key = f"{prefix}:cost"
+        self.bytes_key = f"{prefix}:active_bytes"
+        self._enqueue = self.client.register_script(ENQUEUE_SCRIPT)
+        self._reserve = self.client.register_script(RESERVE_SCRIPT)
+        self._release = self.client.register_script(RELEASE_SCRIPT)
+
+    @property
+    def keys(self):
+        return [self.queue_key, self.active_key, self.cost_key, self.bytes_key]
+
+    def score(self, job):
+        if self.policy == POLICY_WEIGHTED:
+            return weighted_job_score(job.priority, job.requested_at, job.size_bytes)
+        return job_score(job.priority, job.requested_at)
+
+    def cost(self, job):
+        """
+        bytes 예산에 잡히는 비용: 예산의 1/limit (공평한 몫) 을 넘는 대용량 job 만, 최대 예산만큼
+        작은 job 은 0 → 슬롯 수로만 제한
+        """
+        if not self.byte_budget or job.size_bytes <= self.byte_budget // self.limit:
+            return 0
+        return min(job.size_bytes, self.byte_budget)
+
+    def enqueue(self, job):
+        return bool(self._enqueue(keys=self.keys, args=[job.id, self.score(job), self.cost(job)]))
+
+    def reserve(self):
+        """
+        빈 슬롯(과 bytes 예산) 만큼 job id 를 꺼내 반환 (꺼낸 job 은 release 전까지 슬롯 점유)
+        """
+        return [int(job_id) for job_id in self._reserve(
+            keys=self.keys, args=[self.limit, self.byte_budget, RESERVE_LOOKAHEAD, time.time()],
+        )]
+
+    def release(self, job_id):
+        return bool(self._release(keys=self.keys, args=[job_id]))
+
+    def active_bytes(self):
+        return int(self.client.get(self.bytes_key) or 0)
+
+    def active_count(self):
+        return self.client.zcard(self.active_key)
+
+    def queued_count(self):
+        return self.client.zcard(self.queue_key)
+
+    def sync_pending(self):
+        """
+        DB 의 pending job 을 대기열에 다시 채움 (Redis 초기화/유실 대비). 새로 넣은 수 반환
+        재시도 대기(not_before) 중인 job 은 대기가 끝난 뒤에 채움
+        """
+        from content.models import DownloadJob
+
+        pending = (
+            DownloadJob.objects
+            .filter(status=DownloadJob.STATUS_PENDING)
+            .filter(retry_ready())
+            .only('id', 'priority', 'requested_at', 'size_bytes')
+        )
+        return sum(self.enqueue(job) for job in pending.iterator())
+
+    def reconcile(self):
+        """
+        이미 끝난(성공/실패/삭제된) job 이 점유 중인 슬롯을 회수하고 pending 을 다시 채움. 회수한 슬롯 수 반환
+        reserve 직후 아직 claim 전인 job(pending)은 DOWNLOAD_RESERVE_GRACE_SECONDS 동안만 기다림
+        — 그 뒤에도 pending 이면 디스패치 메시지가 유실된 것으로 보고 슬롯 반환 후 대기열에 다시 넣음
+        """
+        from content.models import DownloadJob
+
+        grace = getattr(settings, 'DOWNLOAD_RESERVE_GRACE_SECONDS', 300)
+        reserved = {
+            int(job_id): since for job_id, since in self.client.zrange(self.active_key, 0, -1, withscores=True)
+        }
+        live = dict(
+            DownloadJob.objects
+            .filter(id__in=reserved, status__in=[DownloadJob.STATUS_PENDING, DownloadJob.STATUS_INPROGRESS])
+            .values_list('id', 'status')
+        )
+        expired = time.time() - grace
+        stale = [
+            job_id for job_id, since in reserved.items()
+            if job_id not in live or (live[job_id] == DownloadJob.STATUS_PENDING and since < expired)
+        ]
+        for job_id in stale:
+            self.release(job_id)
+        self.sync_pending()
+        return len(stale)
+
+
+def use_redis_scheduler():
+    return getattr(settings, 'DOWNLOAD_SCHEDULER', 'db') == 'redis'
+
+
+def get_scheduler():
+    return RedisDownloadScheduler()
+
+
+def enqueue_download(job):
+    if use_redis_scheduler():
+        get_scheduler().enqueue(job)
+
+
+def release_download(job_id):
+    if use_redis_scheduler():
+        get_scheduler().release(job_id)
@@ -1,16 +1,24 @@
+# 후보가 이 개수 이상이면 NumPy 벡터 경로로 점수 계산 (작은 목록은 스칼라가 더 빠름)
+VECTOR_SCORING_THRESHOLD = 64
+PENALTY_FLOOR = 0.6
+
 # 기본 점수
 def compute_compatibility_score(device, content_meta):
-    
+    # 값이 None 인 필드(칩셋/해상도 미입력 업로드)는 비교 불가 → 해당 부분 점수 0 (vector_score 와 같은 규칙)
+    required = content_meta.get('required_chipset', '')
+    min_memory = content_meta.get('min_memory', 0) or 0
+    resolution = content_meta.get('resolution', '')
+
     chipset_score = 10 if content_meta.get('required_chipset') == device.get('chipset') else (
-        5 if content_meta.get('required_chipset', '').split('8')[0] in device.get('chipset', '') else 0
+        5 if isinstance(required, str) and required.split('8')[0] in (device.get('chipset', '') or '') else 0
     )
 
-    memory_score = 10 if device.get('memory', 0) >= content_meta.get('min_memory', 0) + 2 else (
-        5 if device.get('memory', 0) >= content_meta.get('min_memory', 0) else 0
+    memory_score = 10 if device.get('memory', 0) >= min_memory + 2 else (
+        5 if device.get('memory', 0) >= min_memory else 0
     )
 
     resolution_score = 10 if content_meta.get('resolution') == device.get('resolution') else (
-        5 if '720' in content_meta.get('resolution', '') and '1080' in device.get('resolution', '') else 0
+        5 if isinstance(resolution, str) and '720' in resolution and '1080' in (device.get('resolution', '') or '') else 0
     )
 
     return {
@@ -19,26 +27,96 @@ def compute_compatibility_score(device, content_meta):
         'resolution': resolution_score
     }
 
-def apply_success_penalty(content, client_id):
-    from content.models import DownloadHistory
-    total = DownloadHistory.objects.filter(content=content, client_id=client_id).count()
-    failed = DownloadHistory.objects.filter(content=content, client_id=client_id, success=False).count()
+def penalty_from_counts(total, failed):
     if total == 0:
         return 1.0
     rate = 1 - (failed / total)
-    return max(rate, 0.6)  # 너무 낮으면 무시
+    return max(rate, PENALTY_FLOOR)  # 너무 낮으면 무시
 
-def get_final_score(content, device_info, client_id):
-    scores = compute_compatibility_score(device_info, content.meta_info)
-    penalty = apply_success_penalty(content, client_id)
+def apply_success_penalty(content, client_id):
+    from content.models import DownloadStats
+    row = (
+        DownloadStats.objects
+        .filter(content=content, client_id=client_id)
+        .values_list('total', 'failed')
+        .first()
+    )
+    return penalty_from_counts(*(row or (0, 0)))
+
+def get_download_counts(content_ids, client_id):
+    """
+    후보 전체의 (total, failed) 다운로드 횟수를 DownloadStats 롤업에서 한 번에 조회
+    반환: {content_id: (total, failed)} — 기록 없는 콘텐츠는 포함되지 않음
+    """
+    from content.models import DownloadStats
+
+    rows = (
+        DownloadStats.objects
+        .filter(content_id__in=content_ids, client_id=client_id)
+        .values_list('content_id', 'total', 'failed')
+    )
+    return {content_id: (total, failed) for content_id, total, failed in rows}
 
-    final_score = (
+def weighted_score(scores, penalty):
+    return (
         scores['chipset'] * 0.4 +
         scores['memory'] * 0.3 +
         scores['resolution'] * 0.3
     ) * penalty
 
-    return final_score
+def get_final_score(content, device_info, client_id):
+    scores = compute_compatibility_score(device_info, content.meta_info)
+    penalty = apply_success_penalty(content, client_id)
+    return weighted_score(scores, penalty)
+
+def get_final_scores(contents, device_info, client_id):
+    """
+    get_final_score 의 배치 버전: 후보 수와 무관하게 집계 쿼리 1번
+    반환: [(score, Content)] 점수 내림차순 정렬
+    """
+    contents = list(contents)
+    counts = get_download_counts([c.id for c in contents], client_id)
+    return rank_contents(contents, device_info, counts)
+
+def rank_contents(contents, device_info, counts):
+    """
+    이미 조회한 counts({content_id: (total, failed)})로 점수 계산 — DB 접근 없음
+    """
+    if len(contents) >= VECTOR_SCORING_THRESHOLD:
+        from content.utils.score_cache import compiled_catalog
+        return compiled_catalog(contents).rank(device_info, counts, contents)
+
+    scored = []
+    for content in contents:
+        scores = compute_compatibility_score(device_info, content.meta_info)
+        penalty = penalty_from_counts(*counts.get(content.id, (0, 0)))
+        scored.append((weighted_score(scores, penalty), content))
+
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return scored
 
 def get_dependent_contents(main_content):
-    return list(main_content.dependencies.values_list('required', flat=True))
+    """
+    main_content 가 (간접 포함) 의존하는 콘텐츠 id — 설치 순서
+    """
+    from content.utils.dependencies import resolve_dependencies
+    return resolve_dependencies([main_content.id]).get(main_content.id, [])
+
+def get_dependency_map(content_ids):
+    """
+    여러 콘텐츠의 전이 의존성(설치 순서)을 캐시된 폐쇄에서 조회: {content_id: [required_id, ...]}
+    """
+    from content.utils.dependencies import resolve_dependencies
+    return resolve_dependencies(content_ids)
+
+def get_satisfied_ids(content_ids, client_id):
+    """
+    content_ids 중 client 가 한 번이라도 다운로드에 성공한 콘텐츠 id 집합
+    """
+    from content.models import DownloadStats
+
+    return set(
+        DownloadStats.objects
+        .filter(content_id__in=content_ids, client_id=client_id, last_success_at__isnull=False)
+        .values_list('content_id', flat=True)
+    )
@@ -0,0 +1,170 @@
+"""
+디바이스 프로파일 단위 점수 메모이제이션
+
+- 같은 (chipset, memory, resolution) 을 보내는 디바이스가 대부분 → 프로파일을 정규화해 짧은 해시 키로 intern
+- 호환성 기본 점수(penalty 적용 전)는 (프로파일, 콘텐츠 이름, 카탈로그 epoch) 별로 프로세스 LRU 에 보관
+- 요청마다 계산하는 것은 클라이언트별 성공률 penalty 곱과 정렬뿐 — 결과는 rank_contents 와 동일
+- 벡터 경로의 CompiledCatalog 도 (이름, epoch, 후보 id) 별로 보관 → 새 프로파일이 와도 meta_info 는 다시 컴파일하지 않음
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from numbers import Real
+
+from django.conf import settings
+
+from .candidates import get_catalog_epochs
+from .metrics import incr
+from .score import (
+    VECTOR_SCORING_THRESHOLD, compute_compatibility_score, penalty_from_counts, weighted_score,
+)
+
+SCORING_COUNTERS = ['score_cache_hits', 'score_cache_misses']
+
+
+class LRUCache:
+    """
+    크기 제한 LRU (스레드 안전) — 가장 오래 안 쓴 항목부터 밀려남
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            return self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_profiles = LRUCache(getattr(settings, 'DEVICE_PROFILE_CACHE_SIZE', 10_000))
+_base_scores = LRUCache(getattr(settings, 'SCORE_MEMO_SIZE', 50_000))
+_compiled = LRUCache(getattr(settings, 'COMPILED_CATALOG_CACHE_SIZE', 1_000))
+
+
+def device_profile(device_info):
+    """
+    점수 계산에 쓰이는 필드만 뽑은 정규화 프로파일의 해시 키 (다른 키/순서는 무시)
+    memory 는 숫자면 float 로 맞춤 (8 과 8.0 은 같은 점수) — 문자열 비교 규칙은 그대로 두기 위해 다른 값은 변환하지 않음
+    """
+    memory = device_info.get('memory', 0)
+    if isinstance(memory, Real) and not isinstance(memory, bool):
+        memory = float(memory)
+    profile = (device_info.get('chipset'), memory, device_info.get('resolution'))
+
+    key = _profiles.get(profile)
+    if key is None:
+        key = hashlib.blake2b(repr(profile).encode(), digest_size=8).hexdigest()
+        _profiles.set(profile, key)
+    return key
+
+
+def compiled_catalog(contents, epoch=None):
+    """
+    contents 의 CompiledCatalog — 한 이름의 후보면 (이름, 카탈로그 epoch, 후보 id 목록) 별로 재사용
+    epoch 는 그 이름의 콘텐츠가 바뀔 때마다 새 값이라 따로 무효화하지 않음 (여러 이름이 섞이면 매번 컴파일)
+    """
+    from .vector_score import CompiledCatalog
+
+    names = {c.name for c in contents}
+    if len(names) != 1:
+        return CompiledCatalog(contents)
+    name = names.pop()
+    if epoch is None:
+        epoch = get_catalog_epochs([name])[name]
+    key = (name, epoch, tuple(c.id for c in contents))
+    catalog = _compiled.get(key)
+    if catalog is None:
+        catalog = CompiledCatalog(contents)
+        _compiled.set(key, catalog)
+    return catalog
+
+
+def base_scores(contents, device_info, epoch=None):
+    """
+    penalty 적용 전 호환성 점수: {content_id: score}
+    """
+    if len(contents) >= VECTOR_SCORING_THRESHOLD:
+        scores = compiled_catalog(contents, epoch).base_scores(device_info).tolist()
+        return {c.id: score for c, score in zip(contents, scores)}
+    return {
+        c.id: weighted_score(compute_compatibility_score(device_info, c.meta_info), 1.0)
+        for c in contents
+    }
+
+
+def rank_many(candidates, device_info, counts):
+    """
+    {name: [Candidate]} → {name: [(score, Candidate)]} (점수 내림차순, 동점은 입력 순서)
+    기본 점수는 메모에서, penalty 는 counts({content_id: (total, failed)})로 매번 적용
+    """
+    profile = device_profile(device_info)
+    epochs = get_catalog_epochs([name for name, contents in candidates.items() if contents])
+    hits = misses = 0
+
+    ranked = {}
+    for name, contents in candidates.items():
+        if not contents:
+            ranked[name] = []
+            continue
+        key = (profile, name, epochs[name])
+        base = _base_scores.get(key)
+        if base is None or any(c.id not in base for c in contents):
+            base = base_scores(contents, device_info, epochs[name])
+            _base_scores.set(key, base)
+            misses += 1
+        else:
+            hits += 1
+
+        scored = [
+            (base[c.id] * penalty_from_counts(*counts.get(c.id, (0, 0))), c)
+            for c in contents
+        ]
+        scored.sort(key=lambda x: x[0], reverse=True)
+        ranked[name] = scored
+
+    # 공유 카운터는 요청당 최대 2번만 갱신
+    if hits:
+        incr('score_cache_hits', hits)
+    if misses:
+        incr('score_cache_misses', misses)
+    return ranked
+
+
+def memo_stats():
+    """
+    이 프로세스의 메모 크기 (카운터는 get_counters(SCORING_COUNTERS) 로 전체 합산)
+    """
+    return {
+        'profiles': len(_profiles),
+        'entries': len(_base_scores),
+        'max_entries': _base_scores.max_size,
+        'compiled_catalogs': len(_compiled),
+    }
+
+
+def clear_memo():
+    _profiles.clear()
+    _base_scores.clear()
+    _compiled.clear()
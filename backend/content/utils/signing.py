@@ -0,0 +1,90 @@
+import posixpath
+import time
+from base64 import urlsafe_b64encode
+from hashlib import md5
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import reverse
+
+from .paths import sidecar_base
+
+SALT = 'content.download'
+# 예시/기본값으로 알려진 비밀키 — 이 값으로 서명하면 누구나 URL/토큰을 위조할 수 있음
+PLACEHOLDER_SECRETS = {'', 'change-me', 'changeme', 'secret', 'please-change-me'}
+
+
+class DownloadTokenExpired(signing.BadSignature):
+    pass
+
+
+def _secret():
+    secret = getattr(settings, 'DOWNLOAD_LINK_SECRET', None) or settings.SECRET_KEY
+    if secret.lower() in PLACEHOLDER_SECRETS or (secret.startswith('django-insecure-') and not settings.DEBUG):
+        raise ImproperlyConfigured('DOWNLOAD_LINK_SECRET 를 알려지지 않은 임의의 값으로 설정하세요.')
+    return secret
+
+
+def _expires(ttl=None):
+    return int(time.time()) + (getattr(settings, 'DOWNLOAD_LINK_TTL', 300) if ttl is None else ttl)
+
+
+def make_download_token(content, job_id, client_id, expires):
+    """
+    content/job/client/만료 시각 + 파일 경로 + 압축 사이드카 크기를 담은 HMAC(SHA-256) 서명 토큰
+    경로까지 들어 있어 검증 쪽은 DB 조회 없이 바로 (Accept-Encoding 협상 후) X-Accel-Redirect 가능
+    """
+    payload = {'c': content.id, 'j': job_id, 'u': client_id, 'e': expires, 'p': content.file.name}
+    if content.encodings:
+        payload['z'] = content.encodings
+    return signing.dumps(payload, key=_secret(), salt=SALT, compress=True)
+
+
+def verify_download_token(token, content_id, job_id):
+    """
+    서명/대상 content·job/만료 검증 후 payload 반환 — DB 조회 없음 (job 상태/소유자는 발급 시 download_link 가 확인)
+    위조·다른 content/job 용 토큰이면 BadSignature, 만료면 DownloadTokenExpired
+    """
+    payload = signing.loads(token, key=_secret(), salt=SALT)
+    if payload.get('c') != content_id:
+        raise signing.BadSignature('token does not match content')
+    if str(payload.get('j')) != str(job_id):
+        raise signing.BadSignature('token does not match job')
+    if payload['e'] < time.time():
+        raise DownloadTokenExpired('token expired')
+    return payload
+
+
+def nginx_secure_link(path, job_id, client_id, expires, filename=None):
+    """
+    Nginx secure_link 모듈용 URL — Django 를 거치지 않고 Nginx 가 직접 검증/전송
+    secure_link_md5 "$secure_link_expires$uri$arg_j$arg_c $download_link_secret" 와 같은 순서로 서명
+    ($uri 는 디코딩된 경로, $arg_* 는 인코딩된 그대로)
+    filename: 저장 파일명(n, Content-Disposition 용 — 서명 대상 아님)
+    """
+    uri = f"/signed/{path}"
+    client = quote(str(client_id), safe='')
+    digest = md5(f"{expires}{uri}{job_id}{client} {_secret()}".encode()).digest()
+    token = urlsafe_b64encode(digest).rstrip(b'=').decode()
+    url = f"/signed/{quote(path)}?md5={token}&e={expires}&j={job_id}&c={client}"
+    if filename:
+        url += f"&n={quote(filename, safe='')}"
+    return url
+
+
+def signed_download_url(content, job_id, client_id, ttl=None):
+    """
+    만료되는 다운로드 URL (상대 경로). DOWNLOAD_SIGNED_URL_NGINX 면 Nginx secure_link 용,
+    아니면 download_secure + HMAC 토큰
+    권한 확인(can_download)과 job 성공을 확인한 뒤에만 발급할 것 (download_link)
+    """
+    expires = _expires(ttl)
+    if getattr(settings, 'DOWNLOAD_SIGNED_URL_NGINX', False):
+        # blob 경로로 서명 → gzip_static 이 blob 기준 압축 사이드카(<blob>.gz)를 찾음, 파일명은 n 으로
+        return nginx_secure_link(
+            sidecar_base(content.file.name), job_id, client_id, expires, posixpath.basename(content.file.name),
+        )
+    token = make_download_token(content, job_id, client_id, expires)
+    return f"{reverse('download_secure', args=[content.id])}?{urlencode({'job_id': job_id, 'token': token})}"
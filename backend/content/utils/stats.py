@@ -0,0 +1,60 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from content.models import DownloadHistory, DownloadStats
+
+
+def record_download(content, client_id, success):
+    """
+    DownloadHistory 기록 + DownloadStats 롤업 갱신을 한 트랜잭션으로 처리
+    """
+    ts = timezone.now()
+    with transaction.atomic():
+        DownloadHistory.objects.create(content=content, client_id=client_id, success=success)
+
+        changes = {
+            'total': F('total') + 1,
+            'failed': F('failed') + (0 if success else 1),
+        }
+        if success:
+            changes['last_success_at'] = ts
+
+        stats = DownloadStats.objects.filter(content=content, client_id=client_id)
+        if stats.update(**changes):
+            return
+        try:
+            # 첫 기록: 동시에 다른 워커가 만들었으면 update 로 재시도
+            with transaction.atomic():
+                DownloadStats.objects.create(
+                    content=content,
+                    client_id=client_id,
+                    total=1,
+                    failed=0 if success else 1,
+                    last_success_at=ts if success else None,
+                )
+        except IntegrityError:
+            stats.update(**changes)
+
+
+def rebuild_download_stats():
+    """
+    DownloadHistory 원본으로부터 DownloadStats 전체 재생성. 생성한 행 수 반환
+    """
+    rows = (
+        DownloadHistory.objects
+        .values('content_id', 'client_id')
+        .annotate(
+            total=Count('id'),
+            failed=Count('id', filter=Q(success=False)),
+            last_success_at=Max('timestamp', filter=Q(success=True)),
+        )
+        .order_by()
+    )
+    with transaction.atomic():
+        DownloadStats.objects.all().delete()
+        created = DownloadStats.objects.bulk_create(
+            (DownloadStats(**row) for row in rows.iterator()),
+            batch_size=1000,
+        )
+    return len(created)
@@ -0,0 +1,103 @@
+import numpy as np
+
+from .score import PENALTY_FLOOR
+
+
+class CompiledCatalog:
+    """
+    후보들의 meta_info 를 한 번만 숫자 배열로 컴파일해 두고,
+    디바이스마다 compute_compatibility_score + 가중합을 NumPy 한 번으로 계산
+
+    - chipset: required_chipset 전체 문자열 id + '8' 앞부분(family) id
+    - memory: min_memory 배열
+    - resolution: resolution 문자열 id + '720' 포함 여부
+    결과는 score.py 의 스칼라 경로와 비트 단위로 동일 (같은 연산 순서의 float64)
+    """
+
+    def __init__(self, candidates):
+        self.candidates = list(candidates)
+        self._chipset_index = {}
+        self._family_index = {}
+        self._resolution_index = {}
+
+        chipset_ids, family_ids, min_memory, resolution_ids, has_720 = [], [], [], [], []
+        for c in self.candidates:
+            meta = c.meta_info or {}
+            required = meta.get('required_chipset')
+            family = meta.get('required_chipset', '')
+            resolution = meta.get('resolution')
+
+            chipset_ids.append(self._chipset_index.setdefault(required, len(self._chipset_index)))
+            # 키가 없으면 '' family (항상 포함), 값이 None 이면 family 비교 불가 → -1
+            family_ids.append(
+                self._family_index.setdefault(family.split('8')[0], len(self._family_index))
+                if isinstance(family, str) else -1
+            )
+            min_memory.append(meta.get('min_memory', 0) or 0)
+            resolution_ids.append(self._resolution_index.setdefault(resolution, len(self._resolution_index)))
+            has_720.append(isinstance(resolution, str) and '720' in resolution)
+
+        self._position = {c.id: i for i, c in enumerate(self.candidates)}
+        self.chipset_ids = np.array(chipset_ids, dtype=np.int64)
+        self.family_ids = np.array(family_ids, dtype=np.int64)
+        self.min_memory = np.array(min_memory, dtype=np.float64)
+        self.resolution_ids = np.array(resolution_ids, dtype=np.int64)
+        self.has_720 = np.array(has_720, dtype=bool)
+        self._families = list(self._family_index)
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def base_scores(self, device):
+        chipset = device.get('chipset')
+        device_chipset = device.get('chipset', '') or ''
+        memory = device.get('memory', 0)
+        resolution = device.get('resolution')
+        device_resolution = device.get('resolution', '') or ''
+
+        # family 포함 여부는 고유 family 수만큼만 문자열 비교, 마지막 칸은 family 없음(-1)
+        family_match = np.array([f in device_chipset for f in self._families] + [False], dtype=bool)
+        chipset_exact = self.chipset_ids == self._chipset_index.get(chipset, -1)
+        chipset_score = np.where(chipset_exact, 10, np.where(family_match[self.family_ids], 5, 0))
+
+        memory_score = np.where(
+            memory >= self.min_memory + 2, 10, np.where(memory >= self.min_memory, 5, 0)
+        )
+
+        resolution_exact = self.resolution_ids == self._resolution_index.get(resolution, -1)
+        resolution_score = np.where(
+            resolution_exact, 10, np.where(self.has_720 & ('1080' in device_resolution), 5, 0)
+        )
+
+        return chipset_score * 0.4 + memory_score * 0.3 + resolution_score * 0.3
+
+    def penalties(self, counts):
+        """
+        counts: {content_id: (total, failed)} → 후보 순서의 penalty 배열
+        """
+        total = np.zeros(len(self.candidates), dtype=np.float64)
+        failed = np.zeros(len(self.candidates), dtype=np.float64)
+        # 기록이 있는 후보만 채움 (counts 는 보통 후보 수보다 훨씬 작음)
+        for content_id, (t, f) in counts.items():
+            i = self._position.get(content_id)
+            if i is not None:
+                total[i], failed[i] = t, f
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate = np.maximum(1 - failed / total, PENALTY_FLOOR)
+        return np.where(total == 0, 1.0, rate)
+
+    def scores(self, device, counts):
+        """
+        후보 순서의 최종 점수 배열 (get_final_score 와 동일한 값)
+        """
+        return self.base_scores(device) * self.penalties(counts)
+
+    def rank(self, device, counts, candidates=None):
+        """
+        [(score, candidate)] 점수 내림차순 — 동점은 입력 순서 유지 (list.sort 와 동일)
+        candidates: 결과에 담을 객체 (컴파일에 쓴 것과 같은 id 순서, 캐시된 카탈로그를 다른 요청의 객체로 쓸 때)
+        """
+        scores = self.scores(device, counts)
+        order = np.argsort(-scores, kind='stable')
+        candidates = self.candidates if candidates is None else candidates
+        return list(zip(scores[order].tolist(), [candidates[i] for i in order.tolist()]))
@@ -0,0 +1,101 @@
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import File
+from django.db import IntegrityError, transaction
+from django.utils.text import get_valid_filename
+
+from ..models import ContentDelta, ContentVersion
+from .delta import make_patch
+
+
+def _keep_versions():
+    return getattr(settings, 'DELTA_KEEP_VERSIONS', 3)
+
+
+def archive_version(content, version, file_name):
+    """
+    덮어써진 이전 파일(링크)을 ContentVersion 으로 보관 — 이후 build_deltas 가 patch 의 기준으로 사용
+    같은 버전으로 덮어썼거나 보관하지 않도록 설정했으면 이전처럼 링크만 삭제
+    파일이 바뀌었으므로 현재 버전으로 가는 기존 patch 는 (같은 버전 재업로드라도) 모두 무효 → 삭제
+    """
+    content.deltas.filter(to_version=content.version).delete()
+    storage = content.file.storage
+    keep = _keep_versions()
+    if not keep or version == content.version:
+        storage.delete(file_name)
+        return None
+
+    archived, created = ContentVersion.objects.get_or_create(
+        content=content, version=version, defaults={'file': file_name},
+    )
+    if not created and archived.file.name != file_name:
+        # 같은 버전을 다시 보관(재업로드 후 덮어쓰기) → 새 파일로 교체, 이전 파일 기준 patch 는 무효
+        old_file = archived.file.name
+        archived.file = file_name
+        archived.save(update_fields=['file'])
+        storage.delete(old_file)
+        ContentDelta.objects.filter(content=content, from_version=version).delete()
+
+    prune_versions(content, keep)
+    return archived
+
+
+def prune_versions(content, keep=None):
+    """
+    최근 keep 개만 남기고 오래된 보관 버전과 그 버전 기준 patch 삭제 (파일은 post_delete 시그널이 정리)
+    """
+    keep = _keep_versions() if keep is None else keep
+    stale = list(content.versions.order_by('-created_at', '-id')[keep:])
+    if not stale:
+        return 0
+    versions = [v.version for v in stale]
+    ContentDelta.objects.filter(content=content, from_version__in=versions).delete()
+    ContentVersion.objects.filter(id__in=[v.id for v in stale]).delete()
+    return len(stale)
+
+
+def build_deltas(content):
+    """
+    보관된 각 버전 → 현재 버전 patch 생성 (이미 있으면 건너뜀), 현재 버전이 아닌 patch 는 정리
+    patch 가 새 파일 대비 DELTA_MAX_RATIO 이상이면 통째로 받는 것과 차이가 없으므로 만들지 않음
+    반환: 새로 만든 ContentDelta 목록
+    """
+    content.deltas.exclude(to_version=content.version).delete()
+    if not content.file:
+        return []
+
+    storage = content.file.storage
+    target = storage.path(content.file.name)
+    max_ratio = getattr(settings, 'DELTA_MAX_RATIO', 0.8)
+    existing = set(content.deltas.values_list('from_version', flat=True))
+    created = []
+
+    for archived in content.versions.exclude(version__in=existing | {content.version}):
+        with tempfile.TemporaryFile() as patch:
+            stats = make_patch(storage.path(archived.file.name), target, patch)
+            size = patch.tell()
+            if size >= stats['target_size'] * max_ratio:
+                continue
+            patch.seek(0)
+            name = storage.save(
+                f"deltas/{content.id}/{get_valid_filename(f'{archived.version}-{content.version}')}.patch",
+                File(patch),
+            )
+        try:
+            with transaction.atomic():
+                delta = ContentDelta.objects.create(
+                    content=content,
+                    from_version=archived.version,
+                    to_version=content.version,
+                    file=name,
+                    size=size,
+                    target_size=stats['target_size'],
+                    target_sha256=stats['target_sha256'],
+                )
+        except IntegrityError:
+            # 다른 워커가 같은 patch 를 먼저 만듦
+            storage.delete(name)
+            continue
+        created.append(delta)
+    return created
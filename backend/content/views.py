@@ -1,19 +1,157 @@
+import logging
 import os
+import re
+import uuid
+import binascii
+import hashlib
+from datetime import timedelta
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from hashlib import md5
+from urllib.parse import urlencode, urljoin
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max, Prefetch, Q
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view, parser_classes
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
-from .models import Content, DownloadJob, DownloadHistory
-from .utils.score import get_final_score
-from .utils.fallback import get_fallback_content
+from .storage import file_sha256
+from .models import Content, ContentDelta, DownloadJob, DownloadHistory, UploadSession
+from .utils.candidates import get_candidates, get_candidates_many, get_scoring_candidates
+from .utils.score import (
+    get_dependency_map, get_download_counts, get_satisfied_ids,
+)
+from .utils.dependencies import missing_dependencies, resolve_dependencies
+from .utils.fallback import rank_fallbacks
 from .utils.load_balancer import select_best_content
-from django.http import FileResponse, HttpResponse, HttpResponseForbidden, Http404
+from django.http import HttpResponse, HttpResponseForbidden, Http404
 from django.utils.timezone import now
 from django.utils import timezone
 from urllib.parse import quote as urlquote
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
 from .permissions import can_download
+from .utils.manifest import get_manifest
 from .utils.paths import rel_media_path
+from .utils.precompress import encoded_name, negotiate
+from .utils.ranges import file_etag, ranged_file_response
+from .utils.score_cache import SCORING_COUNTERS, LRUCache, memo_stats, rank_many
+from .utils.metrics import DOWNLOAD_COUNTERS, get_counters
+from .utils.scheduler import enqueue_download
+from .utils.signing import DownloadTokenExpired, signed_download_url, verify_download_token
+from .utils.versions import archive_version
+from .tasks import convert_content
+
+logger = logging.getLogger(__name__)
+
+def _resolve_content(request, requested_name, scored_contents, failed_content_id, fallback_client_id,
+                     include_fallbacks=False, **fallback_data):
+    """
+    점수 계산이 끝난 후보로 최종 응답(payload, status) 결정 — 단건/배치 공용
+    include_fallbacks: 실패 시 넘어갈 후보 목록(fallbacks)도 함께 — 실패율/의존성 규칙을 이미 적용한 점수순
+    """
+    # fallback 요청인 경우
+    if failed_content_id:
+        ranked = rank_fallbacks(
+            scored_contents,
+            fallback_client_id,
+            requested_name,
+            exclude_ids={int(failed_content_id)},
+            **fallback_data
+        )
+        if not ranked:
+            return {'error': 'No fallback available'}, 404
+
+        fallback = ranked[0]
+        payload = {
+            'fallback': True,
+            'id': fallback.id,
+            'download_url': request.build_absolute_uri(fallback.file_url),
+            'type': fallback.type,
+            'version': fallback.version
+        }
+        if include_fallbacks:
+            payload['fallbacks'] = [_fallback_item(request, c) for c in ranked[1:]]
+        return payload, 200
+
+    # 최초 요청인 경우: 로드밸런싱 알고리즘 선택
+    best_content = select_best_content(scored_contents)
+
+    if not best_content:
+        return {'error': 'No content found'}, 404
+
+    payload = {
+        'fallback': False,
+        'id': best_content.id,
+        'download_url': request.build_absolute_uri(
+        reverse('download_direct', args=[best_content.id])
+        ),
+        'type': best_content.type,
+        'version': best_content.version
+    }
+    if include_fallbacks:
+        ranked = rank_fallbacks(
+            scored_contents, fallback_client_id, requested_name, exclude_ids={best_content.id}, **fallback_data
+        )
+        payload['fallbacks'] = [_fallback_item(request, c) for c in ranked]
+    return payload, 200
+
+def _fallback_item(request, content):
+    return {
+        'id': content.id,
+        'download_url': request.build_absolute_uri(reverse('download_direct', args=[content.id])),
+        'type': content.type,
+        'version': content.version,
+    }
+
+def _flag(value):
+    # JSON true 또는 폼/쿼리 문자열 "true"/"1"
+    return value is True or str(value).lower() in ('true', '1')
+
+def _attach_patches(request, items):
+    """
+    items: [(payload, 설치된 버전)] — 설치된 버전 → 응답 버전 patch 가 있으면 payload 에 patch 정보 추가 (쿼리 1번)
+    클라이언트는 patch 적용 결과를 patch_target_sha256 으로 검증하고, 실패하면 download_url 로 전체를 받음
+    """
+    wanted = {
+        (payload['id'], installed, payload['version']): payload
+        for payload, installed in items
+        if installed and 'id' in payload and not payload.get('fallback') and installed != payload['version']
+    }
+    if not wanted:
+        return
+    query = Q()
+    for content_id, from_version, to_version in wanted:
+        query |= Q(content_id=content_id, from_version=from_version, to_version=to_version)
+    for delta in ContentDelta.objects.filter(query).only(
+        'id', 'content_id', 'from_version', 'to_version', 'size', 'target_sha256',
+    ):
+        wanted[(delta.content_id, delta.from_version, delta.to_version)].update({
+            'patch_url': request.build_absolute_uri(reverse('download_patch', args=[delta.id])),
+            'patch_from_version': delta.from_version,
+            'patch_size': delta.size,
+            'patch_target_sha256': delta.target_sha256,
+        })
+
+def _attach_dependencies(payloads, client_id):
+    """
+    선택된 콘텐츠가 (간접 포함) 의존하는 콘텐츠 id 를 설치 순서대로 payload 에 추가
+    client_id 가 있으면 아직 받지 않은 것(missing_dependencies)도 — 보유 여부는 전체 쿼리 1번
+    """
+    ids = [payload['id'] for payload in payloads if 'id' in payload]
+    dependencies = resolve_dependencies(ids)
+    if not dependencies:
+        return
+    missing = missing_dependencies(ids, client_id) if client_id else {}
+    for payload in payloads:
+        if payload.get('id') in dependencies:
+            payload['dependencies'] = dependencies[payload['id']]
+            if client_id:
+                payload['missing_dependencies'] = missing[payload['id']]
 
 # 클라이언트 요청 시, 디바이스 기반으로 콘텐츠 매칭해서 다운로드 URL 반환
 @api_view(['POST'])
@@ -25,66 +163,158 @@ def get_best_content(request):
     if not device_info or not requested_name:
         return Response({'error': 'Invalid request'}, status=400)
 
-    # 콘텐츠 조회: original 포함한 전체
-    contents = Content.objects.filter(name=requested_name)
+    # 후보 조회 (이름별 캐시): high/normal/low 타입이 있으면 original 제외
+    include_fallbacks = _flag(request.data.get('include_fallbacks'))
+    if failed_content_id or include_fallbacks:
+        contents = get_candidates(requested_name)
+    else:
+        # 최선 1개만 필요 — 대형 카탈로그는 선택될 수 없는 후보를 SQL 에서 미리 제외
+        contents = get_scoring_candidates(requested_name, device_info)
 
-    # high/normal/low 타입이 있으면 original 제외
-    if contents.exclude(type='original').exists():
-        contents = contents.exclude(type='original')
+    # 점수 계산 (호환성 + 실패율 패널티 포함) — 다운로드 횟수는 fallback 판정에도 재사용
+    client_id = request.data.get('client_id') or request.META.get('REMOTE_ADDR', 'client-x')
+    fallback_client_id = request.data.get('client_id')
+    counts = get_download_counts([c.id for c in contents], client_id)
+    scored_contents = rank_many({requested_name: contents}, device_info, counts)[requested_name]
+
+    payload, status = _resolve_content(
+        request, requested_name, scored_contents, failed_content_id,
+        fallback_client_id=fallback_client_id,
+        include_fallbacks=include_fallbacks,
+        **({'counts': counts} if fallback_client_id == client_id else {})
+    )
+    # 설치된 버전을 알려주면 새 버전까지의 patch URL 도 함께 (없으면 전체 다운로드)
+    if status == 200:
+        _attach_dependencies([payload], request.data.get('client_id'))
+        _attach_patches(request, [(payload, request.data.get('installed_version'))])
+    return Response(payload, status=status)
+
+BATCH_MAX_CONTENTS = 100
+
+# 여러 콘텐츠를 한 번에 매칭 (앱 시작 시 에셋별 요청을 1회로) — 항목별 응답은 단건 API 와 동일
+@api_view(['POST'])
+def get_best_contents(request):
+    device_info = request.data.get('device_info')
+    requested_names = request.data.get('requested_contents')
+    failed_ids = request.data.get('failed_content_ids') or {}
+    installed_versions = request.data.get('installed_versions') or {}
+    include_fallbacks = _flag(request.data.get('include_fallbacks'))
+
+    if (
+        not device_info
+        or not isinstance(requested_names, list)
+        or not requested_names
+        or len(requested_names) > BATCH_MAX_CONTENTS
+        or not all(isinstance(name, str) and name for name in requested_names)
+        or not isinstance(failed_ids, dict)
+        or not isinstance(installed_versions, dict)
+    ):
+        return Response({'error': 'Invalid request'}, status=400)
 
-    # 점수 계산 (호환성 + 실패율 패널티 포함)
+    names = list(dict.fromkeys(requested_names))
     client_id = request.data.get('client_id') or request.META.get('REMOTE_ADDR', 'client-x')
-    scored_contents = [
-        (get_final_score(content, device_info, client_id), content)
-        for content in contents
+    fallback_client_id = request.data.get('client_id')
+
+    # 후보/실패율/의존성을 모든 이름에 대해 한 번씩만 조회
+    candidates = get_candidates_many(names)
+    all_ids = [c.id for contents in candidates.values() for c in contents]
+    counts = get_download_counts(all_ids, client_id)
+
+    fallback_data = {}
+    fallback_ids = [
+        c.id for name in names if include_fallbacks or failed_ids.get(name) for c in candidates[name]
     ]
-    scored_contents.sort(key=lambda x: x[0], reverse=True)
+    if fallback_ids:
+        fallback_counts = (
+            counts if fallback_client_id == client_id
+            else get_download_counts(fallback_ids, fallback_client_id)
+        )
+        dependencies = get_dependency_map(fallback_ids)
+        required = {req_id for ids in dependencies.values() for req_id in ids}
+        fallback_data = {
+            'counts': fallback_counts,
+            'dependencies': dependencies,
+            'satisfied': get_satisfied_ids(required, fallback_client_id) if required else set(),
+        }
 
-    # fallback 요청인 경우
-    if failed_content_id:
-        fallback = get_fallback_content(
-            scored_contents,
-            int(failed_content_id),
-            client_id=request.data.get('client_id'),
-            requested_name=requested_name
+    ranked = rank_many(candidates, device_info, counts)
+    results = []
+    for name in names:
+        payload, status = _resolve_content(
+            request, name, ranked[name], failed_ids.get(name),
+            fallback_client_id=fallback_client_id, include_fallbacks=include_fallbacks, **fallback_data
         )
+        results.append({'requested_content': name, 'status': status, 'data': payload})
 
-        if fallback:
-            return Response({
-                'fallback': True,
-                'id': fallback.id,
-                'download_url': request.build_absolute_uri(fallback.file.url),
-                'type': fallback.type,
-                'version': fallback.version
-            })
-        else:
-            return Response({'error': 'No fallback available'}, status=404)
+    resolved = [r for r in results if r['status'] == 200]
+    _attach_dependencies([r['data'] for r in resolved], fallback_client_id)
+    _attach_patches(request, [(r['data'], installed_versions.get(r['requested_content'])) for r in resolved])
+    return Response({'results': results})
 
-    # 최초 요청인 경우: 로드밸런싱 알고리즘 선택
-    best_content = select_best_content(scored_contents)
+CATALOG_PAGE_SIZE = 50
+CATALOG_MAX_PAGE_SIZE = 200
 
-    if not best_content:
-        return Response({'error': 'No content found'}, status=404)
+def _encode_cursor(content):
+    raw = f"{content.uploaded_at.isoformat()}|{content.id}"
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
 
-    return Response({
-        'fallback': False,
-        'id': best_content.id,
-        'download_url': request.build_absolute_uri(
-        reverse('download_direct', args=[best_content.id])
-        ),
-        'type': best_content.type,
-        'version': best_content.version
-    })
+def _decode_cursor(cursor):
+    raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    ts, pk = raw.rsplit('|', 1)
+    uploaded_at = parse_datetime(ts)
+    if uploaded_at is None:
+        raise ValueError(cursor)
+    return uploaded_at, int(pk)
 
+# 콘텐츠 목록: uploaded_at/id 기준 keyset 페이지네이션 + 조건부 GET(ETag/Last-Modified)
 @api_view(['GET'])
 def list_all_contents(request):
-    originals = Content.objects.filter(type='original').order_by('-uploaded_at')
-    data = []
-    for orig in originals:
-        # parent가 orig인 자식 레코드를 직접 쿼리
-        variants = Content.objects.filter(parent=orig)
-
-        data.append({
+    try:
+        limit = min(int(request.GET.get('limit', CATALOG_PAGE_SIZE)), CATALOG_MAX_PAGE_SIZE)
+        cursor = request.GET.get('cursor')
+        after = _decode_cursor(cursor) if cursor else None
+    except (TypeError, ValueError, UnicodeDecodeError, binascii.Error):
+        return Response({'error': 'Invalid cursor or limit'}, status=400)
+    if limit <= 0:
+        return Response({'error': 'Invalid cursor or limit'}, status=400)
+
+    # 카탈로그 변경 여부: 전체 행 수 + 최종 수정 시각 (삭제/변환 상태 변경까지 반영)
+    state = Content.objects.aggregate(count=Count('id'), last_modified=Max('updated_at'))
+    last_modified = state['last_modified']
+    etag = md5(
+        f"{state['count']}:{last_modified and last_modified.isoformat()}:{cursor}:{limit}".encode()
+    ).hexdigest()
+    not_modified = get_conditional_response(
+        request,
+        etag=quote_etag(etag),
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if not_modified is not None:
+        return not_modified
+
+    originals = (
+        Content.objects
+        .filter(type='original')
+        .order_by('-uploaded_at', '-id')
+        .prefetch_related(Prefetch(
+            'variants',
+            queryset=(
+                Content.objects
+                .only('id', 'type', 'version', 'file', 'parent_id', 'conversion_status')
+                .order_by('id')
+            ),
+        ))
+    )
+    if after:
+        uploaded_at, pk = after
+        originals = originals.filter(Q(uploaded_at__lt=uploaded_at) | Q(uploaded_at=uploaded_at, id__lt=pk))
+    page = list(originals[:limit + 1])
+    has_next = len(page) > limit
+    page = page[:limit]
+
+    base_url = request.build_absolute_uri('/')
+    data = [
+        {
             'id': orig.id,
             'name': orig.name,
             'type': orig.type,
@@ -96,39 +326,48 @@ def list_all_contents(request):
                     'id': v.id,
                     'type': v.type,
                     'version': v.version,
-                    'url': request.build_absolute_uri(v.file.url),
+                    'conversion_status': v.conversion_status,
+                    'url': urljoin(base_url, v.file.url) if v.file else None,
                 } for v in orig.variants.all()
             ]
-        })
-    return Response(data)
-
-# 콘텐츠 업로드
-@api_view(['POST'])
-@parser_classes([MultiPartParser, FormParser])
-def upload_content(request):
-    name = request.data.get('name')
-    version = request.data.get('version', '1.0.0')
-    content_type = request.data.get('type', 'original')
-    file = request.FILES.get('file')
-    meta_info = {
-        'required_chipset': request.POST.get('chipset'),
-        'min_memory': int(request.POST.get('min_memory', 0)),
-        'resolution': request.POST.get('resolution')
-    }
-
-    if not file or not name:
-        return Response({"error": "Missing required fields."}, status=400)
+        }
+        for orig in page
+    ]
 
+    response = Response(data)
+    response['ETag'] = quote_etag(etag)
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    if has_next:
+        next_url = request.build_absolute_uri(
+            f"{request.path}?{urlencode({'cursor': _encode_cursor(page[-1]), 'limit': limit})}"
+        )
+        response['Link'] = f'<{next_url}>; rel="next"'
+    return response
+
+def _save_content(name, version, content_type, file, meta_info):
+    """
+    업로드 공통 처리 (multipart/재개 업로드 모두): original 은 같은 이름이 있으면 덮어쓰기
+    file: UploadedFile 또는 이미 storage 에 저장된 파일 이름
+    """
     if content_type == 'original':
         existing = Content.objects.filter(name=name, type='original').first()
         if existing:
             # 기존 original에 최신업로드한 콘텐츠 덮어쓰기
+            old_file, old_version = existing.file.name, existing.version
             existing.version = version
             existing.file = file
             existing.meta_info = meta_info
+            existing.encodings = {}
             existing.uploaded_at = timezone.now()
             existing.save()
-            return Response({'message': f'"{name}" original 콘텐츠가 업데이트되었습니다.', 'id': existing.id})
+            if old_file and old_file != existing.file.name:
+                # 버전이 바뀌었으면 이전 파일은 delta patch 기준으로 보관, 같은 버전이면 링크 정리
+                # (같은 내용이면 blob 은 새 링크가 계속 참조)
+                archive_version(existing, old_version, old_file)
+                # variant 재생성 → 완료 후 이전 버전들 → 새 버전 patch 생성
+                convert_content.delay(existing.id)
+            return {'message': f'"{name}" original 콘텐츠가 업데이트되었습니다.', 'id': existing.id}
 
     content = Content.objects.create(
         name=name,
@@ -139,16 +378,219 @@ def upload_content(request):
         uploaded_at=now()
     )
 
-    return Response({
+    return {
         "message": "콘텐츠 업로드 완료",
         "id": content.id,
         "name": content.name,
         "type": content.type,
         "version": content.version
-    })
+    }
+
+# 콘텐츠 업로드
+@api_view(['POST'])
+@parser_classes([MultiPartParser, FormParser])
+def upload_content(request):
+    name = request.data.get('name')
+    version = request.data.get('version', '1.0.0')
+    content_type = request.data.get('type', 'original')
+    file = request.FILES.get('file')
+    meta_info = {
+        'required_chipset': request.POST.get('chipset'),
+        'min_memory': int(request.POST.get('min_memory', 0)),
+        'resolution': request.POST.get('resolution')
+    }
+
+    if not file or not name:
+        return Response({"error": "Missing required fields."}, status=400)
+
+    return Response(_save_content(name, version, content_type, file, meta_info))
+
+# 재개 가능한 업로드: 세션 생성 → PUT (Content-Range) 반복 → complete
+UPLOAD_WRITE_BUFFER = 1024 * 1024
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+def _upload_state(request, session):
+    return {
+        'upload_id': str(session.id),
+        'offset': session.offset,
+        'total_size': session.total_size,
+        'status': session.status,
+        'chunk_size': settings.UPLOAD_CHUNK_SIZE,
+        'upload_url': request.build_absolute_uri(reverse('upload_chunk', args=[session.id])),
+    }
+
+@api_view(['POST'])
+def create_upload(request):
+    name = request.data.get('name')
+    filename = os.path.basename(request.data.get('filename') or '')
+    try:
+        total_size = int(request.data.get('size'))
+        min_memory = int(request.data.get('min_memory', 0))
+    except (TypeError, ValueError):
+        return Response({"error": "Missing required fields."}, status=400)
+
+    if not name or not filename or total_size <= 0:
+        return Response({"error": "Missing required fields."}, status=400)
+
+    session = UploadSession.objects.create(
+        name=name,
+        version=request.data.get('version', '1.0.0'),
+        type=request.data.get('type', 'original'),
+        meta_info={
+            'required_chipset': request.data.get('chipset'),
+            'min_memory': min_memory,
+            'resolution': request.data.get('resolution')
+        },
+        filename=filename,
+        total_size=total_size,
+        sha256=(request.data.get('sha256') or '').lower(),
+    )
+    session.staging_path.parent.mkdir(parents=True, exist_ok=True)
+    session.staging_path.touch()
+    return Response(_upload_state(request, session), status=201)
+
+# upload_id → (받은 bytes, 전체 파일 sha256 진행 상태) — 프로세스 로컬, 없으면 complete 에서 다시 계산
+_upload_digests = LRUCache(1000)
+
+@api_view(['GET', 'PUT'])
+def upload_chunk(request, upload_id):
+    """
+    GET: 현재 offset 조회 (재개 위치)
+    PUT: Content-Range: bytes <start>-<end>/<total> — start 는 현재 offset 과 같아야 함
+         X-Chunk-SHA256 헤더가 있으면 기록하면서 계산한 해시와 비교
+    """
+    session = get_object_or_404(UploadSession, id=upload_id)
+    if request.method == 'GET':
+        return Response(_upload_state(request, session))
+
+    if session.status != UploadSession.Status.UPLOADING:
+        return Response({"error": "upload already completed"}, status=409)
+
+    match = CONTENT_RANGE_RE.match(request.headers.get('Content-Range', ''))
+    if not match:
+        return Response({"error": "Content-Range required"}, status=400)
+    start, end, total = (int(x) for x in match.groups())
+    length = end - start + 1
+    if total != session.total_size or end >= total or length <= 0:
+        return Response({"error": "invalid Content-Range"}, status=416)
+    if start != session.offset:
+        # 순서가 어긋난 chunk: 클라이언트는 offset 부터 다시 보냄
+        return Response(_upload_state(request, session), status=409)
+
+    # 기록 전에 offset 위치를 조건부 UPDATE 로 점유 — 같은 start 로 동시에 온 요청은 한 쪽만 기록
+    writer = uuid.uuid4()
+    now_ = timezone.now()
+    claimed = (
+        UploadSession.objects
+        .filter(id=session.id, offset=start, status=UploadSession.Status.UPLOADING)
+        .filter(Q(writer__isnull=True) | Q(writer_expires_at__lt=now_))
+        .update(writer=writer, writer_expires_at=now_ + timedelta(seconds=getattr(settings, 'UPLOAD_CHUNK_LOCK_SECONDS', 300)))
+    )
+    if not claimed:
+        session.refresh_from_db()
+        return Response(_upload_state(request, session), status=409)
+    owned = UploadSession.objects.filter(id=session.id, writer=writer)
+
+    # 전체 파일 해시를 이어서 계산 (이 프로세스가 앞 chunk 를 모두 받았을 때만 — 아니면 complete 에서 한 번 읽음)
+    running = _upload_digests.get(session.id)
+    file_digest = running[1].copy() if running and running[0] == start else None
+    if start == 0:
+        file_digest = hashlib.sha256()
+
+    digest = hashlib.sha256()
+    received = 0
+    with open(session.staging_path, 'r+b') as staging:
+        staging.seek(start)
+        while received < length:
+            chunk = request.stream.read(min(UPLOAD_WRITE_BUFFER, length - received)) if request.stream else b''
+            if not chunk:
+                break
+            digest.update(chunk)
+            if file_digest is not None:
+                file_digest.update(chunk)
+            staging.write(chunk)
+            received += len(chunk)
+        if received == length:
+            expected = request.headers.get('X-Chunk-SHA256')
+            if expected and expected.lower() != digest.hexdigest():
+                received = -1
+        if received != length:
+            # 잘린/손상된 chunk 는 버리고 offset 유지 (점유 중이라 다른 요청이 기록한 bytes 를 지우지 않음)
+            staging.truncate(start)
+            owned.update(writer=None, writer_expires_at=None)
+            return Response({**_upload_state(request, session), "error": "incomplete or corrupt chunk"}, status=400)
+        staging.truncate(end + 1)
+
+    # 점유를 풀면서 offset 전진 (점유가 만료돼 다른 요청에 넘어갔으면 반영하지 않음)
+    advanced = owned.update(offset=end + 1, writer=None, writer_expires_at=None, updated_at=timezone.now())
+    if advanced and file_digest is not None:
+        _upload_digests.set(session.id, (end + 1, file_digest))
+    session.refresh_from_db()
+    return Response(_upload_state(request, session), status=200 if advanced else 409)
+
+@api_view(['POST'])
+def complete_upload(request, upload_id):
+    session = get_object_or_404(UploadSession, id=upload_id)
+    if session.status != UploadSession.Status.UPLOADING:
+        return Response({"error": "upload already completed", "id": session.content_id}, status=409)
+    if session.offset != session.total_size:
+        return Response(_upload_state(request, session), status=409)
+
+    # 완료 처리는 조건부 UPDATE 로 한 요청만 (동시 complete 가 Content 를 두 번 만들지 않도록)
+    claimed = UploadSession.objects.filter(
+        id=session.id, status=UploadSession.Status.UPLOADING, offset=session.total_size,
+    ).update(status=UploadSession.Status.COMPLETING, updated_at=timezone.now())
+    if not claimed:
+        return Response({"error": "upload already completed", "id": session.content_id}, status=409)
+
+    try:
+        payload, status = _finish_upload(session)
+    except Exception:
+        UploadSession.objects.filter(id=session.id).update(status=UploadSession.Status.UPLOADING)
+        raise
+    _upload_digests.pop(session.id)
+    return Response(payload, status=status)
+
+def _finish_upload(session):
+    """
+    staging 파일을 Content 로 — dedup 저장소면 복사 없이 blob 으로 하드링크,
+    전체 해시는 chunk 를 받으면서 계산해 둔 값 사용 (다른 프로세스가 받았으면 여기서 한 번 읽음)
+    """
+    storage = Content._meta.get_field('file').storage
+    upload_to = Content._meta.get_field('file').generate_filename(None, session.filename)
+    if hasattr(storage, 'save_file'):
+        running = _upload_digests.get(session.id)
+        digest = running[1].hexdigest() if running and running[0] == session.total_size else None
+        digest = digest or file_sha256(session.staging_path)
+        if session.sha256 and session.sha256 != digest:
+            UploadSession.objects.filter(id=session.id).update(status=UploadSession.Status.UPLOADING)
+            return {"error": "sha256 mismatch", "expected": session.sha256, "actual": digest}, 400
+        stored_name = storage.save_file(upload_to, session.staging_path, digest)
+    else:
+        with open(session.staging_path, 'rb') as staging:
+            stored_name = storage.save(upload_to, File(staging))
+
+    payload = _save_content(session.name, session.version, session.type, stored_name, session.meta_info)
+    session.status = UploadSession.Status.COMPLETE
+    session.content_id = payload['id']
+    session.save(update_fields=['status', 'content', 'updated_at'])
+    session.staging_path.unlink(missing_ok=True)
+    return payload, 200
 
 CHUNK_SIZE = 8 * 1024  # 8KB
 
+def _dispatch_download(job):
+    """
+    대기열 등록 후 Celery 스케줄링 트리거
+    Redis(대기열/브로커) 장애여도 요청은 성공 — job 행은 pending 으로 남고 reconcile_downloads 가 다시 채움
+    """
+    from .tasks import schedule_downloads
+    try:
+        enqueue_download(job)
+        schedule_downloads.delay()
+    except Exception:
+        logger.exception("download job %s not dispatched; left for reconcile", job.id)
+
 @api_view(['GET'])
 def download_job(request, content_id):
 
@@ -170,13 +612,15 @@ def download_job(request, content_id):
 
     created = False
     if not job:
+        try:
+            size_bytes = content.file.size
+        except (OSError, ValueError):  # 파일 없음 → 크기 미상, 가장 작은 job 으로 취급
+            size_bytes = 0
         job = DownloadJob.objects.create(
-            content=content, client_id=client_id, priority=priority
+            content=content, client_id=client_id, priority=priority, size_bytes=size_bytes
         )
         created = True
-        # Celery 스케줄링 트리거
-        from .tasks import schedule_downloads
-        schedule_downloads.delay()
+        _dispatch_download(job)
 
     message = ("다운로드 작업이 큐에 등록되었습니다." if created else "이미 다운로드가 진행 중입니다.")
     return Response({
@@ -186,6 +630,10 @@ def download_job(request, content_id):
         "secure_download_url": request.build_absolute_uri(
             reverse('download_secure', args=[content.id])
         ) + f"?job_id={job.id}",
+        # 만료되는 서명 URL 은 job 완료 후 download_link 로 발급
+        "download_link_url": request.build_absolute_uri(
+            reverse('download_link', args=[content.id])
+        ) + f"?job_id={job.id}",
         "message": message
     })
 
@@ -194,6 +642,7 @@ def get_download_history(request, client_id):
     histories = (
         DownloadHistory.objects
         .filter(client_id=client_id)
+        .select_related('content')
         .order_by('-timestamp')[:20]  # 최근 20개만
     )
     data = [
@@ -208,44 +657,233 @@ def get_download_history(request, client_id):
     ]
     return Response(data)
 
-# 보안 다운로드(권한/상태 확인 → X-Accel-Redirect)
 @api_view(['GET'])
-def download_secure(request, content_id):
+def download_metrics(request):
+    """
+    다운로드 스케줄링 지표: 누적 카운터(회수한 슬롯 등) + 현재 상태별 job 수 / lease 만료 job 수
+    """
+    counts = dict(
+        DownloadJob.objects.order_by().values_list('status').annotate(n=Count('id')).values_list('status', 'n')
+    )
+    expired = DownloadJob.objects.filter(
+        status=DownloadJob.STATUS_INPROGRESS, lease_expires_at__lt=timezone.now()
+    ).count()
+    return Response({
+        "counters": get_counters(DOWNLOAD_COUNTERS),
+        "jobs": {status: counts.get(status, 0) for status, _ in DownloadJob.STATUS_CHOICES},
+        "expired_leases": expired,
+        "concurrency_limit": getattr(settings, 'DOWNLOAD_CONCURRENCY_LIMIT', 3),
+    })
+
+@api_view(['GET'])
+def scoring_metrics(request):
+    """
+    점수 메모이제이션 지표: 누적 hit/miss (전체 워커 합산) + 이 프로세스의 메모 크기
+    """
+    counters = get_counters(SCORING_COUNTERS)
+    lookups = counters['score_cache_hits'] + counters['score_cache_misses']
+    return Response({
+        "counters": counters,
+        "hit_rate": counters['score_cache_hits'] / lookups if lookups else None,
+        "memo": memo_stats(),
+    })
+
+@api_view(['GET'])
+def download_manifest(request, content_id):
+    """
+    분할(병렬 Range) 다운로드용 chunk manifest: chunk 별 offset/length/sha256
+    클라이언트는 download_url 에 Range + If-Range(etag) 로 chunk 를 받아 검증, 실패한 chunk 만 다시 요청
+    """
     content = get_object_or_404(Content, id=content_id)
-    job_id  = request.GET.get("job_id")
+    if not content.file:
+        raise Http404("file missing")
+    try:
+        manifest = get_manifest(content.file.name, content.file.storage)
+    except FileNotFoundError:
+        raise Http404("file missing")
 
-    # 준비 상태 확인
+    not_modified = get_conditional_response(request, etag=manifest['etag'], last_modified=manifest['mtime'])
+    if not_modified is not None:
+        return not_modified
+
+    response = Response({
+        'content_id': content.id,
+        'name': content.name,
+        'type': content.type,
+        'version': content.version,
+        'download_url': request.build_absolute_uri(reverse('download_direct', args=[content.id])),
+        **manifest,
+    })
+    response['ETag'] = manifest['etag']
+    response['Last-Modified'] = http_date(manifest['mtime'])
+    return response
+
+def _accel_redirect(rel, encoding=None):
+    """
+    MEDIA_ROOT 기준 상대 경로 파일을 Nginx(/protected/)가 전송하도록 넘기는 응답
+    encoding 이 있으면 압축 사이드카를 Content-Encoding 을 붙여 주는 /protected-<encoding>/ 로
+    """
+    resp = HttpResponse()
+    resp["Content-Type"] = "application/octet-stream"
+    resp["Content-Disposition"] = f"attachment; filename*=UTF-8''{urlquote(os.path.basename(rel))}"
+    if encoding:
+        resp["X-Accel-Redirect"] = f"/protected-{encoding}/{encoded_name(rel, encoding)}"
+    else:
+        resp["X-Accel-Redirect"] = f"/protected/{rel}"
+    return resp
+
+def _pick_encoding(request, file_name, encodings, storage=default_storage):
+    """
+    Accept-Encoding 에 맞는 압축 사이드카 선택 → (encoding, 경로, stat), 원본을 보내야 하면 None
+    Range 요청은 원본 bytes 기준(chunk manifest 등)이므로 If-Range 가 압축본 ETag 일 때(압축본 이어받기)만 압축본 유지
+    """
+    encoding = negotiate(request.headers.get('Accept-Encoding'), encodings)
+    if not encoding:
+        return None
+    path = storage.path(encoded_name(file_name, encoding))
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if 'Range' in request.headers and request.headers.get('If-Range', '').strip() != file_etag(stat.st_size, stat.st_mtime):
+        return None
+    return encoding, path, stat
+
+def _vary_on_encoding(response, encodings):
+    # 압축본이 있는 파일은 Accept-Encoding 에 따라 응답이 달라짐 (캐시가 섞지 않도록)
+    if encodings:
+        patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+def _check_download_job(request, content, job_id):
+    """
+    job 이 이 content 의 것이고 성공했으며 요청자에게 권한이 있는지 → (job, 에러 Response 또는 None)
+    """
+    job = None
     if job_id:
         job = DownloadJob.objects.filter(id=job_id, content=content).first()
         if not job:
-            return Response({"error": "invalid job"}, status=400)
+            return None, Response({"error": "invalid job"}, status=400)
         if job.status != DownloadJob.STATUS_SUCCESS:
-            return Response({"status": job.status}, status=425)  # Too Early
+            return job, Response({"status": job.status}, status=425)  # Too Early
 
     # 권한 판정
     if not can_download(request.user, content, job_id):
-        return HttpResponseForbidden("no permission")
+        return job, HttpResponseForbidden("no permission")
+    return job, None
 
-    # 실제 전송은 Nginx가
+# 만료되는 서명 다운로드 URL 발급 — 권한 확인 + job 완료 후에만 (재시도/이어받기는 이 URL 로)
+@api_view(['GET'])
+def download_link(request, content_id):
+    content = get_object_or_404(Content, id=content_id)
+    job_id = request.GET.get("job_id")
+    if not job_id:
+        return Response({"error": "job_id required"}, status=400)
+    job, error = _check_download_job(request, content, job_id)
+    if error is not None:
+        return error
     if not content.file:
         raise Http404("file missing")
 
-    rel = rel_media_path(content.file.path)
-    filename = urlquote(os.path.basename(content.file.name))
+    return Response({
+        "job_id": job.id,
+        "signed_download_url": request.build_absolute_uri(signed_download_url(content, job.id, job.client_id)),
+        "expires_in": getattr(settings, 'DOWNLOAD_LINK_TTL', 300),
+    })
 
-    resp = HttpResponse()
-    resp["Content-Type"] = "application/octet-stream"
-    resp["Content-Disposition"] = f"attachment; filename*=UTF-8''{filename}"
-    resp["X-Accel-Redirect"] = f"/protected/{rel}"
-    return resp
+# 보안 다운로드(권한/상태 확인 → X-Accel-Redirect)
+@api_view(['GET'])
+def download_secure(request, content_id):
+    # 서명 토큰(download_link 가 권한/성공 확인 후 발급): 서명/만료/job claim 만 확인하고 DB 조회 없이 바로 Nginx 로
+    # 발급 후 회수는 짧은 DOWNLOAD_LINK_TTL 로 (Nginx /signed/ 경로와 같은 기준)
+    token = request.GET.get("token")
+    if token:
+        try:
+            claims = verify_download_token(token, content_id, request.GET.get("job_id"))
+        except DownloadTokenExpired:
+            return Response({"error": "token expired"}, status=410)
+        except signing.BadSignature:
+            return HttpResponseForbidden("invalid token")
+        encodings = claims.get('z') or {}
+        picked = _pick_encoding(request, claims['p'], encodings)
+        return _vary_on_encoding(_accel_redirect(claims['p'], picked and picked[0]), encodings)
+
+    content = get_object_or_404(Content, id=content_id)
+    _, error = _check_download_job(request, content, request.GET.get("job_id"))
+    if error is not None:
+        return error
+
+    # 실제 전송은 Nginx가
+    if not content.file:
+        raise Http404("file missing")
+
+    picked = _pick_encoding(request, content.file.name, content.encodings, content.file.storage)
+    return _vary_on_encoding(
+        _accel_redirect(rel_media_path(content.file.path), picked and picked[0]), content.encodings,
+    )
 
 # 개발/내부 테스트용 - 기존 direct는 유지(공개 배포용으로는 비권장)
+# Range(단일/다중) + ETag/Last-Modified 지원 → 끊긴 다운로드 이어받기 가능
+# 압축 사이드카가 있으면 Accept-Encoding 에 맞춰 압축본 전송 (ETag 는 전송하는 파일 기준)
 @api_view(['GET'])
 def download_direct(request, content_id):
     content = get_object_or_404(Content, id=content_id)
-    file_path = content.file.path
-    filename = os.path.basename(file_path)
+    if not content.file:
+        raise Http404("file missing")
+    filename = urlquote(os.path.basename(content.file.name))
+    encoding, file_path, stat = _pick_encoding(
+        request, content.file.name, content.encodings, content.file.storage,
+    ) or (None, content.file.path, None)
+    if stat is None:
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            raise Http404("file missing")
+    etag = file_etag(stat.st_size, stat.st_mtime)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        return _vary_on_encoding(not_modified, content.encodings)
+
+    if getattr(settings, 'DOWNLOAD_X_ACCEL_REDIRECT', False):
+        # 실제 전송(Range/If-Range 포함)은 Nginx 가 sendfile 로 — 같은 형식의 ETag 를 Nginx 도 계산
+        response = _accel_redirect(rel_media_path(content.file.path), encoding)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        return _vary_on_encoding(response, content.encodings)
+
+    response = ranged_file_response(
+        request, file_path, etag=etag, last_modified=stat.st_mtime, size=stat.st_size,
+    )
+    response["Content-Disposition"] = f"attachment; filename*=UTF-8''{filename}"
+    if encoding:
+        response["Content-Encoding"] = encoding
+    return _vary_on_encoding(response, content.encodings)
 
-    response = FileResponse(open(file_path, 'rb'), content_type='application/octet-stream')
-    response["Content-Disposition"] = f"attachment; filename*=UTF-8''{urlquote(filename)}"
-    return response
\ No newline at end of file
+@api_view(['GET'])
+def download_patch(request, delta_id):
+    delta = get_object_or_404(ContentDelta, id=delta_id)
+    try:
+        stat = os.stat(delta.file.path)
+    except FileNotFoundError:
+        raise Http404("file missing")
+    etag = file_etag(stat.st_size, stat.st_mtime)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        return not_modified
+
+    if getattr(settings, 'DOWNLOAD_X_ACCEL_REDIRECT', False):
+        response = _accel_redirect(rel_media_path(delta.file.path))
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(stat.st_mtime)
+    else:
+        response = ranged_file_response(
+            request, delta.file.path, etag=etag, last_modified=stat.st_mtime, size=stat.st_size,
+        )
+        filename = urlquote(os.path.basename(delta.file.name))
+        response["Content-Disposition"] = f"attachment; filename*=UTF-8''{filename}"
+    response["X-Patch-From-Version"] = delta.from_version
+    response["X-Patch-To-Version"] = delta.to_version
+    response["X-Patch-Target-SHA256"] = delta.target_sha256
+    return response
@@ -17,7 +17,8 @@ export interface ContentItem {
     id: number;
     type: string;
     version: string;
-    url: string;
+    conversion_status?: "pending" | "in_progress" | "success" | "failed";
+    url: string | null;
   }>;
 }
 
@@ -58,10 +59,20 @@ export async function fetchBestContent(
   return res.json();
 }
 
+// 목록은 cursor 페이지 단위로 내려오므로 Link rel="next" 를 따라가며 모두 모음
+const nextPageUrl = (link: string | null) =>
+  link?.match(/<([^>]+)>;\s*rel="next"/)?.[1] ?? null;
+
 export async function fetchContents(): Promise<ContentItem[]> {
-  const res = await fetch(apiUrl("/contents/"), { credentials: "include" });
-  if (!res.ok) throw new Error("콘텐츠 목록 불러오기 실패");
-  return res.json();
+  const items: ContentItem[] = [];
+  let url: string | null = apiUrl("/contents/");
+  while (url) {
+    const res = await fetch(url, { credentials: "include" });
+    if (!res.ok) throw new Error("콘텐츠 목록 불러오기 실패");
+    items.push(...(await res.json()));
+    url = nextPageUrl(res.headers.get("Link"));
+  }
+  return items;
 }
 
 export async function fetchDownloadHistory(
@@ -13,7 +13,7 @@ interface ProgressEvent {
   content_name: string;
   client_id: string;
   content_id: number;
-  download_url: string; // 서버에서 /api/download-direct/<id>/ 형태로 내려오도록 구성
+  download_url: string; // 서버에서 /api/download-direct/<id>/ 형태로 내려옴 (만료되는 서명 URL 은 완료 후 /api/download/<id>/link/ 로 발급)
 }
 
 export default function useDownloadSocket(clientId: string) {
@@ -122,7 +122,7 @@ export default function DashboardPage() {
                   {orig.variants.map((v) => (
                     <Link
                       key={v.id}
-                      href={v.url}
+                      href={v.url ?? "#"}
                       target="_blank"
                       className="px-3 py-1 bg-blue-600 rounded text-white text-sm hover:bg-blue-500"
                     >